@@ -0,0 +1,49 @@
+"""
+Benchmarks reproduzíveis das otimizações do projeto.
+
+Cada módulo roda sozinho contra um banco de teste descartável (o mesmo que
+o ``manage.py test`` cria), com as mesmas variáveis de ambiente do
+``manage.py``::
+
+    python -m benchmarks.dice
+    python -m benchmarks.keyset_pagination --notes 1000000
+
+Os números dependem da máquina; o que importa é a comparação dentro de
+cada execução.
+"""
+import os
+import statistics
+import time
+
+
+def setup_django():
+    """Configura o Django e cria o banco de teste (apagado ao sair)"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rpg_api.settings')
+    import django
+    django.setup()
+
+    import atexit
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    atexit.register(connection.creation.destroy_test_db, old_name, verbosity=0)
+
+
+def measure(fn, repeat=5, number=1):
+    """Menor e mediana (segundos por chamada) de `repeat` rodadas de `number` chamadas"""
+    fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    return min(times), statistics.median(times)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
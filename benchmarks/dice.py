@@ -0,0 +1,37 @@
+"""
+Microbenchmark do motor de dados (rpg_api/dice.py): dados/s gerados em
+lote e rolagens/s de expressões comuns, sozinhas e com roll_batch, contra
+um laço com secrets.randbelow por dado.
+
+    python -m benchmarks.dice
+"""
+import secrets
+from collections import Counter
+
+from . import measure
+
+
+def main():
+    from rpg_api import dice
+
+    # Distribuição: cada face de um d6 perto de 1/6
+    faces = Counter(dice._generator.roll(6, 600000))
+    spread = max(abs(count / 600000 - 1 / 6) for count in faces.values())
+    print(f'd6 x 600000: desvio máximo de 1/6 = {spread:.4f}')
+
+    best, _ = measure(lambda: dice._generator.roll(6, 100000), repeat=5)
+    print(f'geração em lote (d6)       {100000 / best:12,.0f} dados/s')
+    best, _ = measure(lambda: [secrets.randbelow(6) + 1 for _ in range(100000)], repeat=3)
+    print(f'secrets.randbelow por dado {100000 / best:12,.0f} dados/s')
+
+    for expression in ('1d20+5', '8d6+4', '4d6kh3', 'adv+7', '3d6!'):
+        best, _ = measure(lambda: dice.roll(expression), repeat=5, number=2000)
+        batch, _ = measure(lambda: dice.roll_batch(expression, 1000), repeat=5)
+        print(
+            f'{expression:8} roll {1 / best:10,.0f} rolagens/s   '
+            f'roll_batch(1000) {1000 / batch:10,.0f} rolagens/s'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Fan-out do DiceConsumer: mensagens/s e latência (p50/p99) até o último
+socket da sala receber, para salas de 5, 50 e 500 conexões.
+
+Usa o CHANNEL_LAYERS dos settings: sem REDIS_URL é o InMemoryChannelLayer
+(um processo só); com REDIS_URL mede o channels_redis de verdade.
+
+    python -m benchmarks.dice_fanout [--messages 200] [--sizes 5,50,500]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from . import percentile, setup_django
+
+
+async def run_room(application, size, messages):
+    from channels.testing import WebsocketCommunicator
+
+    room = f'bench{size}'
+    sockets = []
+    for _ in range(size):
+        communicator = WebsocketCommunicator(application, f'/ws/session/{room}/')
+        connected, _ = await communicator.connect()
+        assert connected
+        await communicator.receive_from()  # snapshot inicial
+        sockets.append(communicator)
+
+    sender = sockets[0]
+    latencies = []
+    start = time.perf_counter()
+    for index in range(messages):
+        sent = time.perf_counter()
+        await sender.send_to(text_data=json.dumps({'action': 'chat', 'text': f'msg {index}'}))
+        await asyncio.gather(*(socket.receive_from(timeout=10) for socket in sockets))
+        latencies.append(time.perf_counter() - sent)
+    elapsed = time.perf_counter() - start
+
+    for socket in sockets:
+        await socket.disconnect()
+    return elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--sizes', default='5,50,500')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from channels.routing import URLRouter
+    from rpg_api.routing import websocket_urlpatterns
+
+    application = URLRouter(websocket_urlpatterns)
+    print('channel layer:', settings.CHANNEL_LAYERS['default']['BACKEND'])
+    for size in map(int, args.sizes.split(',')):
+        elapsed, latencies = asyncio.run(run_room(application, size, args.messages))
+        print(
+            f'sala com {size:4} sockets: {args.messages / elapsed:8.0f} msg/s enviadas, '
+            f'{args.messages * size / elapsed:9.0f} entregas/s, '
+            f'p50 {percentile(latencies, 0.5) * 1000:6.2f} ms, p99 {percentile(latencies, 0.99) * 1000:6.2f} ms'
+        )
+
+
+if __name__ == '__main__':
+    main()
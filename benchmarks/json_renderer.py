@@ -0,0 +1,75 @@
+"""
+UJSONRenderer/UJSONParser (core/renderers.py) contra o JSONRenderer e o
+JSONParser do DRF: tempo e pico de memória (tracemalloc) para codificar e
+ler o detalhe de uma sessão com muitos personagens.
+
+    python -m benchmarks.json_renderer [--characters 200] [--number 200]
+"""
+import argparse
+import io
+import tracemalloc
+from io import StringIO
+
+from . import measure, setup_django
+
+
+def seed(characters):
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from characters.models import Character
+    from session.models import Session, SessionCharacter, SessionMember
+
+    call_command('populate_rpg_systems', stdout=StringIO())
+    master = User.objects.create_user('mestre')
+    session = Session.objects.create(name='Mesa', master=master)
+    SessionMember.objects.create(session=session, user=master, role='MASTER')
+    for index in range(characters):
+        user = User.objects.create_user(f'jogador{index}')
+        character = Character.objects.create(user=user, player_name=f'Jogador {index} ção /')
+        character.sheet_data['notes']['backstory'] = 'x' * 400
+        character.save()
+        SessionCharacter.objects.create(session=session, user=user, character=character)
+    return master, session
+
+
+def peak_kib(fn):
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--characters', type=int, default=200)
+    parser.add_argument('--number', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.test import APIClient
+    from core.renderers import UJSONParser, UJSONRenderer
+
+    master, session = seed(args.characters)
+    client = APIClient()
+    client.force_authenticate(master)
+    data = client.get(f'/api/v1/session/sessions/{session.pk}/').data
+
+    drf_bytes = JSONRenderer().render(data)
+    print(f'detalhe da sessão: {len(drf_bytes):,} bytes, '
+          f'idêntico ao DRF: {UJSONRenderer().render(data) == drf_bytes}')
+
+    for name, renderer in (('DRF JSONRenderer', JSONRenderer()), ('UJSONRenderer', UJSONRenderer())):
+        _, median = measure(lambda: renderer.render(data), number=args.number)
+        kib = peak_kib(lambda: renderer.render(data))
+        print(f'{name:18} codifica {median * 1000:7.2f} ms   pico {kib:7.0f} KiB')
+    for name, json_parser in (('DRF JSONParser', JSONParser()), ('UJSONParser', UJSONParser())):
+        _, median = measure(lambda: json_parser.parse(io.BytesIO(drf_bytes)), number=args.number)
+        kib = peak_kib(lambda: json_parser.parse(io.BytesIO(drf_bytes)))
+        print(f'{name:18} lê       {median * 1000:7.2f} ms   pico {kib:7.0f} KiB')
+
+
+if __name__ == '__main__':
+    main()
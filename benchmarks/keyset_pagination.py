@@ -0,0 +1,87 @@
+"""
+Paginação por página (COUNT + OFFSET) x por cursor (keyset) na listagem de
+anotações: latência da página 1 e da página 10.000 com 1M de notas.
+
+    python -m benchmarks.keyset_pagination [--notes 1000000] [--page 10000]
+
+A página profunda por cursor é pedida com o cursor que a própria API
+devolveria ao chegar nela (posição = created_at da última nota anterior).
+"""
+import argparse
+import base64
+import time
+from urllib.parse import urlencode
+
+from . import measure, setup_django
+
+BATCH = 10000
+
+
+def seed(user, session, total):
+    from datetime import timedelta
+    from django.utils import timezone
+    from session.models import SessionNote
+
+    start = timezone.now() - timedelta(seconds=total)
+    created = 0
+    while created < total:
+        size = min(BATCH, total - created)
+        notes = SessionNote.objects.bulk_create(
+            SessionNote(session=session, user=user, title=f'Nota {created + i}', content='texto')
+            for i in range(size)
+        )
+        # created_at é auto_now_add: espalha as datas depois (um segundo por nota)
+        for i, note in enumerate(notes):
+            note.created_at = start + timedelta(seconds=created + i)
+        SessionNote.objects.bulk_update(notes, ['created_at'], batch_size=2000)
+        created += size
+
+
+def cursor_for(position):
+    query = urlencode({'p': position})
+    return base64.b64encode(query.encode('ascii')).decode('ascii')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--notes', type=int, default=1000000)
+    parser.add_argument('--page', type=int, default=10000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from rest_framework.settings import api_settings
+    from rest_framework.test import APIClient
+    from session.models import Session, SessionMember, SessionNote
+
+    user = User.objects.create_user('mestre')
+    session = Session.objects.create(master=user, name='Mesa')
+    SessionMember.objects.create(session=session, user=user, role='MASTER')
+    started = time.perf_counter()
+    seed(user, session, args.notes)
+    print(f'{args.notes:,} notas criadas em {time.perf_counter() - started:.0f} s')
+
+    client = APIClient()
+    client.force_authenticate(user)
+    url = '/api/v1/session/notes/'
+    offset = (args.page - 1) * api_settings.PAGE_SIZE
+    previous = SessionNote.objects.order_by('-created_at').values_list('created_at', flat=True)[offset - 1]
+
+    requests = {
+        'page=1': f'{url}?page=1',
+        f'page={args.page}': f'{url}?page={args.page}',
+        'cursor, página 1': f'{url}?pagination=cursor',
+        f'cursor, página {args.page}': f'{url}?cursor={cursor_for(previous.isoformat())}',
+    }
+    first = {}
+    for label, target in requests.items():
+        response = client.get(target)
+        assert response.status_code == 200, response.content[:200]
+        first[label] = response.json()['results'][0]['title']
+        _, median = measure(lambda: client.get(target), repeat=7)
+        print(f'{label:22} {median * 1000:9.2f} ms  (primeira nota: {first[label]})')
+    assert first[f'page={args.page}'] == first[f'cursor, página {args.page}']
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Listagens com LeanSerializer (core/lean.py, via .values()) contra o
+ModelSerializer que cada um substitui: linhas/s para serializar e renderizar
+1.000 e 10.000 linhas de personagens, itens, mapas e anotações. Confere
+antes que as duas saídas são idênticas.
+
+    python -m benchmarks.lean_serializers [--sizes 1000,10000]
+"""
+import argparse
+from io import StringIO
+
+from . import measure, setup_django
+
+
+def cases(master, session):
+    from characters.models import Character
+    from characters.serializers import CharacterLeanSerializer, CharacterSerializer
+    from items.models import Item
+    from items.serializers import ItemLeanSerializer, ItemSerializer
+    from maps.models import SessionMap
+    from maps.serializers import SessionMapLeanSerializer, SessionMapSerializer
+    from session.models import SessionNote
+    from session.serializers import NoteLeanSerializer, NoteSerializer
+
+    template = Character.objects.create(user=master, player_name='Modelo')
+    return (
+        (
+            'personagens', Character, CharacterSerializer, CharacterLeanSerializer,
+            lambda i: Character(
+                user=master, player_name=f'P{i}', rpg_system_id=template.rpg_system_id,
+                sheet_template_id=template.sheet_template_id,
+                sheet_overrides={'basic_info': {'level': i % 20}} if i % 2 else {},
+            ),
+            lambda: Character.objects.select_related('rpg_system', 'user').order_by('-created_at'),
+        ),
+        (
+            'itens', Item, ItemSerializer, ItemLeanSerializer,
+            lambda i: Item(
+                session=session, name=f'Item {i}', category='arma', durability_current=1,
+                durability_max=2, rarity='rara', effects={'dano': i},
+            ),
+            lambda: Item.objects.select_related('session'),
+        ),
+        (
+            'mapas', SessionMap, SessionMapSerializer, SessionMapLeanSerializer,
+            lambda i: SessionMap(session=session, name=f'Mapa {i}'),
+            lambda: SessionMap.objects.select_related('session', 'session__master'),
+        ),
+        (
+            'anotações', SessionNote, NoteSerializer, NoteLeanSerializer,
+            lambda i: SessionNote(session=session, user=master, title=f'Nota {i}', content='c' * 50),
+            lambda: SessionNote.objects.select_related('user'),
+        ),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.test import APIRequestFactory
+    from session.models import Session, SessionMember
+
+    call_command('populate_rpg_systems', stdout=StringIO())
+    master = User.objects.create_user('mestre', email='mestre@x.com', first_name='Ana')
+    session = Session.objects.create(name='Mesa', master=master)
+    SessionMember.objects.create(session=session, user=master, role='MASTER')
+    request = APIRequestFactory().get('/')
+    request.user = master
+    renderer = JSONRenderer()
+    benchmarks = cases(master, session)
+
+    for size in map(int, args.sizes.split(',')):
+        for label, model, serializer_class, lean_class, build, queryset in benchmarks:
+            missing = size - model.objects.count()
+            model.objects.bulk_create([build(i) for i in range(missing)], batch_size=1000)
+
+            def full():
+                return renderer.render(serializer_class(queryset(), many=True, context={'request': request}).data)
+
+            def lean():
+                return renderer.render(lean_class(lean_class.get_rows(queryset())).data)
+
+            assert full() == lean(), label
+            full_best, _ = measure(full, repeat=3)
+            lean_best, _ = measure(lean, repeat=3)
+            print(
+                f'{label:12} {size:6,} linhas   ModelSerializer {size / full_best:9,.0f} linhas/s   '
+                f'LeanSerializer {size / lean_best:9,.0f} linhas/s   x{full_best / lean_best:.1f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
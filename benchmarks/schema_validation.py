@@ -0,0 +1,50 @@
+"""
+Validação das fichas (characters/schema.py): fichas/s com o validador
+compilado do template, comparado ao jsonschema (Draft 2020-12) sobre o mesmo
+schema, e a validação só dos caminhos alterados (PATCH .../sheet/), para a
+ficha padrão de cada sistema.
+
+    python -m benchmarks.schema_validation [--number 2000]
+"""
+import argparse
+import json
+from io import StringIO
+
+from . import measure, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--number', type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from jsonschema import Draft202012Validator
+    from characters.models import Character, RPGSystem
+    from characters.schema import validate_paths, validate_sheet
+
+    call_command('populate_rpg_systems', stdout=StringIO())
+    user = User.objects.create_user('jogador')
+    number = args.number
+
+    for system in RPGSystem.objects.order_by('slug'):
+        character = Character.objects.create(user=user, rpg_system=system)
+        template_id, sheet = character.sheet_template_id, character.sheet_data
+        assert validate_sheet(template_id, sheet) == []
+
+        best, _ = measure(lambda: validate_sheet(template_id, sheet), number=number)
+        validator = Draft202012Validator(character.sheet_template.schema)
+        reference, _ = measure(lambda: validator.validate(sheet), number=max(number // 10, 1))
+        paths = [[next(iter(sheet))]]
+        partial, _ = measure(lambda: validate_paths(template_id, sheet, paths), number=number)
+        print(
+            f'{system.slug:16} {len(json.dumps(sheet)):7,} bytes   '
+            f'compilado {1 / best:9,.0f}/s   jsonschema {1 / reference:7,.0f}/s   '
+            f'um caminho {1 / partial:9,.0f}/s'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Filtro de acesso por sessão: o antigo ``session__members__user=user`` +
+``.distinct()`` (JOIN + deduplicação) contra o ``accessible_to(user)`` com
+EXISTS correlacionado em (user, session). Mostra o plano de cada consulta
+e o tempo de listar a primeira página de anotações, itens, mapas e sessões.
+
+    python -m benchmarks.session_access [--sessions 500] [--members 20] [--rows 40]
+"""
+import argparse
+import time
+
+from . import measure, setup_django
+
+PAGE = 50
+
+
+def seed(sessions, members, rows):
+    from django.contrib.auth.models import User
+    from items.models import Item
+    from maps.models import SessionMap
+    from session.models import Session, SessionMember, SessionNote
+
+    users = User.objects.bulk_create(User(username=f'u{i}') for i in range(sessions + members))
+    for index in range(sessions):
+        master = users[index]
+        session = Session.objects.create(master=master, name=f'Mesa {index}')
+        # Cada mesa tem o mestre e `members` jogadores (um grupo que se sobrepõe entre mesas)
+        players = users[sessions:sessions + members]
+        SessionMember.objects.bulk_create(
+            [SessionMember(session=session, user=master, role='MASTER')]
+            + [SessionMember(session=session, user=player, role='PLAYER') for player in players]
+        )
+        SessionNote.objects.bulk_create(
+            SessionNote(session=session, user=players[i % members], title=f'Nota {i}', content='x')
+            for i in range(rows)
+        )
+        Item.objects.bulk_create(
+            Item(session=session, name=f'Item {i}', category='c', durability_current=1,
+                 durability_max=1, rarity='r')
+            for i in range(rows)
+        )
+        SessionMap.objects.bulk_create(SessionMap(session=session, name=f'Mapa {i}') for i in range(rows // 4))
+    return users[sessions]  # jogador presente em todas as mesas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=500)
+    parser.add_argument('--members', type=int, default=20)
+    parser.add_argument('--rows', type=int, default=40)
+    args = parser.parse_args()
+
+    setup_django()
+    from items.models import Item
+    from maps.models import SessionMap
+    from session.models import Session, SessionNote
+
+    started = time.perf_counter()
+    player = seed(args.sessions, args.members, args.rows)
+    print(f'dados criados em {time.perf_counter() - started:.0f} s')
+
+    cases = [
+        ('sessões', Session, 'members__user', '-created_at'),
+        ('anotações', SessionNote, 'session__members__user', '-created_at'),
+        ('itens', Item, 'session__members__user', 'name'),
+        ('mapas', SessionMap, 'session__members__user', '-created_at'),
+    ]
+    for label, model, lookup, ordering in cases:
+        before = model.objects.filter(**{lookup: player}).distinct().order_by(ordering)
+        after = model.objects.accessible_to(player).order_by(ordering)
+        assert list(before.values_list('pk', flat=True)) == list(after.values_list('pk', flat=True))
+
+        print(f'\n== {label} ({after.count():,} visíveis)')
+        for name, queryset in (('JOIN + DISTINCT', before), ('EXISTS', after)):
+            _, median = measure(lambda: list(queryset[:PAGE]), repeat=7)
+            _, count_median = measure(lambda: queryset.count(), repeat=7)
+            print(f'{name:16} página {median * 1000:8.2f} ms   count {count_median * 1000:8.2f} ms')
+            for line in queryset[:PAGE].explain().splitlines():
+                print(f'    {line}')
+
+
+if __name__ == '__main__':
+    main()
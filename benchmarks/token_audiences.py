@@ -0,0 +1,100 @@
+"""
+Frames de movimento por audiência (maps/visibility.py) contra a checagem
+de visibilidade por socket: mapa com 300 tokens, visibilidade mista (ocultos,
+exceções por facção e individuais), mestre e N jogadores recebendo frames
+de 20 movimentos.
+
+    python -m benchmarks.token_audiences [--players 30] [--frames 500]
+"""
+import argparse
+import random
+import time
+
+from . import setup_django
+
+
+def build_map(players, seed=7):
+    """(tokens, rules) como o MapState carrega do banco"""
+    rnd = random.Random(seed)
+    tokens = {}
+    for index in range(300):
+        owner = players[index % len(players)] if index < len(players) else None
+        hidden = index >= len(players) and rnd.random() < 0.25
+        tokens[f't{index}'] = (owner, hidden)
+
+    # Três facções recebem exceções em bloco (ex: batedores veem as emboscadas
+    # da sua área) e alguns jogadores perdem a visão de tokens públicos
+    third = max(len(players) // 3, 1)
+    factions = [players[:third], players[third:2 * third], players[2 * third:]]
+    rules = {}
+    for index in range(len(players), 300):
+        if rnd.random() < 0.15:
+            rules[f't{index}'] = {user_id: True for user_id in rnd.choice(factions)}
+        if rnd.random() < 0.03:
+            rules.setdefault(f't{index}', {})[rnd.choice(players)] = False
+    return tokens, rules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--players', type=int, default=30)
+    parser.add_argument('--frames', type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+    from core.renderers import dumps
+    from maps.visibility import AudienceFrames, TokenAudiences
+
+    master = 1
+    players = list(range(2, args.players + 2))
+    recipients = [master] + players
+    tokens, rules = build_map(players)
+
+    started = time.perf_counter()
+    audiences = TokenAudiences(master, tokens, rules, recipients)
+    print(
+        f'{args.players} jogadores: {audiences.audience_count()} audiências distintas (+ mestre), '
+        f'montadas em {(time.perf_counter() - started) * 1000:.2f} ms'
+    )
+
+    rnd = random.Random(11)
+    frames = [
+        [[f't{rnd.randrange(300)}', rnd.uniform(0, 5000), rnd.uniform(0, 5000), 0.0] for _ in range(20)]
+        for _ in range(args.frames)
+    ]
+
+    def build(items):
+        return dumps({'action': 'moves', 'moves': items})
+
+    def per_socket(moves):
+        texts = []
+        for user_id in recipients:
+            visible = [move for move in moves if audiences.can_see(user_id, move[0])]
+            texts.append(build(visible) if visible else None)
+        return texts
+
+    def per_audience(moves):
+        event = AudienceFrames(audiences, moves, build)
+        return [event.for_audience(audiences.audience_of(user_id)) for user_id in recipients]
+
+    for moves in frames[:50]:
+        assert per_socket(moves) == per_audience(moves)
+
+    for name, fn in (('por socket', per_socket), ('por audiência', per_audience)):
+        started = time.perf_counter()
+        for moves in frames:
+            fn(moves)
+        elapsed = (time.perf_counter() - started) / len(frames)
+        print(f'{name:14} {elapsed * 1e6:8.1f} us por frame de 20 movimentos para {len(recipients)} sockets')
+
+    encodes = []
+    for moves in frames:
+        event = AudienceFrames(audiences, moves, build)
+        for user_id in recipients:
+            event.for_audience(audiences.audience_of(user_id))
+        encodes.append(len(event._by_content))
+    print(f'serializações por frame: {sum(encodes) / len(encodes):.1f} (contra {len(recipients)})')
+
+
+if __name__ == '__main__':
+    main()
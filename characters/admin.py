@@ -1,17 +1,25 @@
+import json
+
 from django.contrib import admin
 from django import forms
 from django.forms.widgets import Textarea
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
-from .models import Character, RPGSystem
+from .formulas import recompute_system
+from .indexing import reindex_system
+from .models import Character, RPGSystem, SheetTemplate
 
 
 class RPGSystemAdminForm(forms.ModelForm):
     class Meta:
         model = RPGSystem
-        fields = ['name', 'logo_url', 'description', 'base_sheet_data', 'is_active', 'is_default']
+        fields = [
+            'name', 'logo_url', 'description', 'base_sheet_data', 'derived_formulas',
+            'indexed_paths', 'is_active', 'is_default'
+        ]
         widgets = {
             'base_sheet_data': Textarea(attrs={'rows': 20, 'cols': 80, 'style': 'font-family: monospace;'}),
+            'derived_formulas': Textarea(attrs={'rows': 10, 'cols': 80, 'style': 'font-family: monospace;'}),
             'description': Textarea(attrs={'rows': 4, 'cols': 80}),
         }
 
@@ -33,6 +41,14 @@ class RPGSystemAdmin(admin.ModelAdmin):
             'fields': ('base_sheet_data',),
             'classes': ('collapse',)
         }),
+        ('Campos Derivados', {
+            'fields': ('derived_formulas',),
+            'classes': ('collapse',)
+        }),
+        ('Filtros', {
+            'fields': ('indexed_paths',),
+            'description': 'Caminhos da ficha usados em ?sheet.<caminho>= na listagem de personagens',
+        }),
         ('Configurações', {
             'fields': ('is_active', 'is_default')
         }),
@@ -51,7 +67,7 @@ class RPGSystemAdmin(admin.ModelAdmin):
         return mark_safe('<span style="color: gray;">Nenhum personagem</span>')
     character_count.short_description = 'Personagens'
 
-    actions = ['duplicate_system']
+    actions = ['duplicate_system', 'recompute_derived', 'reindex_sheets']
     
     def duplicate_system(self, request, queryset):
         """Ação para duplicar sistemas selecionados"""
@@ -66,13 +82,26 @@ class RPGSystemAdmin(admin.ModelAdmin):
         self.message_user(request, f'{count} sistema(s) duplicado(s) com sucesso.')
     duplicate_system.short_description = 'Duplicar sistemas selecionados'
 
+    def recompute_derived(self, request, queryset):
+        """Recalcula os campos derivados de todos os personagens dos sistemas"""
+        updated = sum(recompute_system(system) for system in queryset)
+        self.message_user(request, f'{updated} ficha(s) atualizada(s).')
+    recompute_derived.short_description = 'Recalcular campos derivados das fichas'
+
+    def reindex_sheets(self, request, queryset):
+        """Reconstrói o índice dos caminhos filtráveis das fichas"""
+        for system in queryset:
+            reindex_system(system)
+        self.message_user(request, f'Índice de {queryset.count()} sistema(s) reconstruído.')
+    reindex_sheets.short_description = 'Reconstruir índice de filtros das fichas'
+
 
 class CharacterAdminForm(forms.ModelForm):
     class Meta:
         model = Character
         fields = '__all__'
         widgets = {
-            'sheet_data': Textarea(attrs={'rows': 20, 'cols': 80, 'style': 'font-family: monospace;'}),
+            'sheet_overrides': Textarea(attrs={'rows': 20, 'cols': 80, 'style': 'font-family: monospace;'}),
         }
 
 
@@ -82,7 +111,8 @@ class CharacterAdmin(admin.ModelAdmin):
     list_display = ['player_name', 'user', 'rpg_system_name', 'xp_total', 'is_active', 'created_at']
     list_filter = ['rpg_system', 'is_active', 'created_at', 'updated_at']
     search_fields = ['player_name', 'user__username', 'user__email', 'rpg_system__name']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['created_at', 'updated_at', 'sheet_preview']
+    raw_id_fields = ['sheet_template']
     list_editable = ['is_active']
     list_per_page = 25
     
@@ -94,7 +124,7 @@ class CharacterAdmin(admin.ModelAdmin):
             'fields': ('xp_total', 'avatar_url', 'description')
         }),
         ('Dados da Ficha', {
-            'fields': ('sheet_data',),
+            'fields': ('sheet_template', 'sheet_overrides', 'sheet_preview'),
             'classes': ('collapse',)
         }),
         ('Status', {
@@ -112,4 +142,25 @@ class CharacterAdmin(admin.ModelAdmin):
     rpg_system_name.admin_order_field = 'rpg_system__name'
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('user', 'rpg_system')
\ No newline at end of file
+        return super().get_queryset(request).select_related('user', 'rpg_system')
+
+    def sheet_preview(self, obj):
+        """Ficha completa (template + alterações)"""
+        if not obj.pk:
+            return '-'
+        return format_html(
+            '<pre style="max-height: 400px; overflow: auto;">{}</pre>',
+            json.dumps(obj.sheet_data, indent=2, ensure_ascii=False)
+        )
+    sheet_preview.short_description = 'Ficha completa'
+
+
+@admin.register(SheetTemplate)
+class SheetTemplateAdmin(admin.ModelAdmin):
+    list_display = ['rpg_system', 'version', 'checksum', 'created_at']
+    list_filter = ['rpg_system']
+    readonly_fields = ['rpg_system', 'version', 'checksum', 'data', 'schema', 'created_at']
+
+    def has_add_permission(self, request):
+        # Versões são criadas pelo RPGSystem.save()
+        return False
@@ -4,4 +4,8 @@ from django.apps import AppConfig
 class CharactersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'characters'
-    verbose_name = 'Personagens'
\ No newline at end of file
+    verbose_name = 'Personagens'
+
+    def ready(self):
+        # Registra os signals que invalidam o cache dos sistemas
+        from . import cache  # noqa: F401
\ No newline at end of file
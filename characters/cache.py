@@ -0,0 +1,142 @@
+"""
+Cache versionado dos sistemas de RPG.
+
+Os sistemas ativos (com os base_sheet_data, que podem ser grandes) ficam no
+cache do Django sob uma chave versionada e também em memória no processo.
+A versão vem do próprio banco (quantidade de sistemas, maior updated_at e
+maior id de template), consultada no máximo a cada VERSION_CHECK_INTERVAL
+segundos por processo: funciona com o LocMemCache (um cache por worker)
+sem depender de um backend compartilhado. O save/delete no próprio processo
+força a consulta na hora.
+
+Junto com os sistemas vem a versão atual do template de cada um
+(SheetTemplate). Versões de template são imutáveis, então get_sheet_template
+as guarda por id sem precisar de invalidação.
+
+Os objetos retornados são compartilhados: quem for alterar um template deve
+copiá-lo antes (veja copy_template).
+"""
+import copy
+import json
+import os
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.db.models import Count, Max
+from django.dispatch import receiver
+
+from .models import RPGSystem, SheetTemplate
+
+VERSION_CHECK_INTERVAL = 2
+SYSTEMS_TTL = 60 * 60 * 24
+
+TEMPLATE_TTL = 60 * 60 * 24 * 7
+
+_local = {'version': None, 'checked_at': 0.0, 'systems': None, 'templates': None}
+
+
+def _current_version():
+    """Impressão digital dos sistemas e templates no banco (uma consulta)"""
+    state = RPGSystem.objects.aggregate(
+        systems=Count('pk', distinct=True),
+        updated=Max('updated_at'),
+        template=Max('sheet_templates__id'),
+    )
+    updated = state['updated'].timestamp() if state['updated'] else 0
+    return f"{state['systems']}:{updated}:{state['template'] or 0}"
+
+
+def _load():
+    now = time.monotonic()
+    if _local['version'] is not None and now - _local['checked_at'] < VERSION_CHECK_INTERVAL:
+        return _local
+
+    version = _current_version()
+    _local['checked_at'] = now
+    if _local['version'] == version:
+        return _local
+
+    key = f'rpg_systems:{version}'
+    loaded = cache.get(key)
+    if loaded is None:
+        systems = {system.slug: system for system in RPGSystem.objects.filter(is_active=True)}
+        templates = {}
+        # Ordenado por versão decrescente: o primeiro de cada sistema é o atual
+        for template in SheetTemplate.objects.filter(
+            rpg_system__in=list(systems)
+        ).order_by('rpg_system_id', '-version'):
+            templates.setdefault(template.rpg_system_id, template)
+        loaded = (systems, templates)
+        cache.set(key, loaded, SYSTEMS_TTL)
+
+    _local['systems'], _local['templates'] = loaded
+    _local['version'] = version
+    return _local
+
+
+def get_active_systems():
+    """Dict slug -> RPGSystem com todos os sistemas ativos"""
+    return _load()['systems']
+
+
+def get_system(slug):
+    """Sistema ativo pelo slug (ou None)"""
+    return get_active_systems().get(slug)
+
+
+def get_default_system():
+    """Sistema ativo marcado como padrão (ou None)"""
+    for system in sorted(get_active_systems().values(), key=lambda system: system.name):
+        if system.is_default:
+            return system
+    return None
+
+
+def get_current_template(slug):
+    """Versão atual do template de ficha do sistema (ou None)"""
+    template = _load()['templates'].get(slug)
+    if template is None:
+        # Sistema inativo (personagens antigos ainda podem usá-lo)
+        template = SheetTemplate.objects.filter(rpg_system_id=slug).order_by('-version').first()
+    return template
+
+
+@lru_cache(maxsize=256)
+def get_sheet_template(template_id):
+    """SheetTemplate pelo id; versões nunca mudam, então não expira"""
+    key = f'sheet_template:{template_id}'
+    template = cache.get(key)
+    if template is None:
+        template = SheetTemplate.objects.get(pk=template_id)
+        cache.set(key, template, TEMPLATE_TTL)
+    return template
+
+
+def copy_template(sheet_data):
+    """Cópia independente de um template compartilhado"""
+    return copy.deepcopy(sheet_data)
+
+
+@lru_cache(maxsize=1)
+def load_template_file():
+    """character_sheet_template.json, lido no máximo uma vez por processo"""
+    template_path = os.path.join(settings.BASE_DIR, 'character_sheet_template.json')
+    try:
+        with open(template_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def invalidate_systems():
+    """Força a releitura da versão no banco na próxima consulta deste processo"""
+    _local['version'] = None
+
+
+@receiver(post_save, sender=RPGSystem)
+@receiver(post_delete, sender=RPGSystem)
+def rpg_system_changed(sender, instance, **kwargs):
+    invalidate_systems()
@@ -0,0 +1,363 @@
+"""
+Campos derivados das fichas (CA, bônus de proficiência, perícias...).
+
+Cada RPGSystem pode ter ``derived_formulas``: ``{"caminho.do.campo": "fórmula"}``,
+por exemplo ``{"derived_stats.proficiency_bonus": "2 + (basic_info.level - 1) // 4"}``.
+As fórmulas são expressões Python restritas (números, operadores, comparações,
+``x if c else y`` e as funções de FUNCTIONS); nomes como ``attributes.dexterity``
+leem a ficha (campos ausentes ou não numéricos valem 0).
+
+As fórmulas viram um grafo compilado (closures, sem eval) em ordem
+topológica, guardado por conteúdo em cache. ``FormulaGraph.recompute``
+recalcula só os campos que dependem dos caminhos alterados.
+"""
+import ast
+import json
+import logging
+import math
+import operator
+from functools import lru_cache
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .sheets import diff_sheet, json_equal, merge_sheet
+
+logger = logging.getLogger(__name__)
+
+MAX_FORMULAS = 500
+MAX_FORMULA_LENGTH = 500
+MAX_EXPONENT = 100
+BATCH_SIZE = 500
+MAX_CACHED_CHANGES = 1024  # conjuntos de caminhos alterados memorizados por grafo
+
+
+class FormulaError(ValueError):
+    """Fórmula inválida, dependência circular ou erro ao calcular"""
+
+
+FUNCTIONS = {
+    'mod': lambda score: (score - 10) // 2,  # modificador de atributo (d20)
+    'floor': math.floor,
+    'ceil': math.ceil,
+    'round': round,
+    'int': int,
+    'abs': abs,
+    'min': min,
+    'max': max,
+    'clamp': lambda value, low, high: max(low, min(high, value)),
+}
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+}
+
+UNARY_OPERATORS = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+    ast.Not: operator.not_,
+}
+
+COMPARISONS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+
+
+def _power(base, exponent):
+    if abs(exponent) > MAX_EXPONENT:
+        raise FormulaError('Expoente muito grande')
+    return base ** exponent
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    return 0
+
+
+def _lookup(sheet, path):
+    value = sheet
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def _reference(node):
+    """a.b.c -> ('a', 'b', 'c'); None se não for uma referência"""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return tuple(reversed(parts))
+
+
+def _compile(node, deps):
+    """Converte um nó da AST em uma função sheet -> valor"""
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        value = node.value
+        return lambda sheet: value
+
+    path = _reference(node)
+    if path is not None:
+        if path[0] in FUNCTIONS and len(path) == 1:
+            raise FormulaError(f'"{path[0]}" é uma função')
+        deps.add(path)
+        return lambda sheet: _number(_lookup(sheet, path))
+
+    if isinstance(node, ast.BinOp):
+        left, right = _compile(node.left, deps), _compile(node.right, deps)
+        if isinstance(node.op, ast.Pow):
+            return lambda sheet: _power(left(sheet), right(sheet))
+        op = BINARY_OPERATORS.get(type(node.op))
+        if op is None:
+            raise FormulaError(f'Operador não permitido: {type(node.op).__name__}')
+        return lambda sheet: op(left(sheet), right(sheet))
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+        op, operand = UNARY_OPERATORS[type(node.op)], _compile(node.operand, deps)
+        return lambda sheet: op(operand(sheet))
+
+    if isinstance(node, ast.Compare):
+        operands = [_compile(node.left, deps)] + [_compile(item, deps) for item in node.comparators]
+        ops = []
+        for op in node.ops:
+            if type(op) not in COMPARISONS:
+                raise FormulaError(f'Comparação não permitida: {type(op).__name__}')
+            ops.append(COMPARISONS[type(op)])
+
+        def compare(sheet):
+            values = [operand(sheet) for operand in operands]
+            return all(op(a, b) for op, a, b in zip(ops, values, values[1:]))
+        return compare
+
+    if isinstance(node, ast.BoolOp):
+        values = [_compile(item, deps) for item in node.values]
+        if isinstance(node.op, ast.And):
+            return lambda sheet: all(value(sheet) for value in values)
+        return lambda sheet: any(value(sheet) for value in values)
+
+    if isinstance(node, ast.IfExp):
+        test, body, orelse = (_compile(node.test, deps), _compile(node.body, deps),
+                              _compile(node.orelse, deps))
+        return lambda sheet: body(sheet) if test(sheet) else orelse(sheet)
+
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        function = FUNCTIONS.get(node.func.id)
+        if function is None:
+            raise FormulaError(f'Função desconhecida: {node.func.id}')
+        args = [_compile(arg, deps) for arg in node.args]
+        return lambda sheet: function(*(arg(sheet) for arg in args))
+
+    raise FormulaError(f'Expressão não permitida: {ast.dump(node)[:60]}')
+
+
+def _overlaps(a, b):
+    """Um caminho contém o outro (ex: attributes e attributes.dexterity)"""
+    size = min(len(a), len(b))
+    return a[:size] == b[:size]
+
+
+class FormulaGraph:
+    """Fórmulas compiladas de um sistema, em ordem topológica"""
+
+    def __init__(self, formulas):
+        if not isinstance(formulas, dict):
+            raise FormulaError('derived_formulas deve ser um objeto {caminho: fórmula}')
+        if len(formulas) > MAX_FORMULAS:
+            raise FormulaError(f'Máximo de {MAX_FORMULAS} fórmulas')
+
+        compiled = {}
+        for target, expression in formulas.items():
+            if not isinstance(expression, str) or len(expression) > MAX_FORMULA_LENGTH:
+                raise FormulaError(f'{target}: fórmula inválida')
+            try:
+                tree = ast.parse(expression, mode='eval')
+            except SyntaxError:
+                raise FormulaError(f'{target}: erro de sintaxe')
+            deps = set()
+            try:
+                function = _compile(tree.body, deps)
+            except FormulaError as e:
+                raise FormulaError(f'{target}: {e}')
+            compiled[tuple(target.split('.'))] = (function, deps)
+
+        # Quem depende de cada campo derivado
+        self.dependents = {target: [] for target in compiled}
+        for target, (function, deps) in compiled.items():
+            for other in compiled:
+                if other != target and any(_overlaps(dep, other) for dep in deps):
+                    self.dependents[other].append(target)
+
+        self.order = self._sort(compiled)
+        self.formulas = compiled
+
+        # Fórmulas por chave de primeiro nível (alvo ou dependência), para não
+        # comparar cada caminho alterado com o grafo inteiro
+        self.by_root = {}
+        for target, (function, deps) in compiled.items():
+            for path in {target, *deps}:
+                self.by_root.setdefault(path[0], set()).add(target)
+        self._affected_cache = {}
+
+    def _sort(self, compiled):
+        pending = {target: 0 for target in compiled}
+        for children in self.dependents.values():
+            for child in children:
+                pending[child] += 1
+        ready = [target for target, count in pending.items() if count == 0]
+        order = []
+        while ready:
+            target = ready.pop()
+            order.append(target)
+            for child in self.dependents[target]:
+                pending[child] -= 1
+                if pending[child] == 0:
+                    ready.append(child)
+        if len(order) != len(compiled):
+            cycle = sorted('.'.join(target) for target, count in pending.items() if count)
+            raise FormulaError(f'Dependência circular entre: {", ".join(cycle)}')
+        return order
+
+    def affected(self, changed_paths):
+        """Campos derivados a recalcular quando `changed_paths` mudam"""
+        key = tuple(sorted(tuple(path) for path in changed_paths))
+        affected = self._affected_cache.get(key)
+        if affected is not None:
+            return affected
+
+        stack = []
+        for path in key:
+            candidates = self.formulas if not path else self.by_root.get(path[0], ())
+            for target in candidates:
+                deps = self.formulas[target][1]
+                if _overlaps(path, target) or any(_overlaps(path, dep) for dep in deps):
+                    stack.append(target)
+        affected = set()
+        while stack:
+            target = stack.pop()
+            if target not in affected:
+                affected.add(target)
+                stack.extend(self.dependents[target])
+
+        if len(self._affected_cache) >= MAX_CACHED_CHANGES:
+            self._affected_cache.clear()
+        self._affected_cache[key] = affected
+        return affected
+
+    def recompute(self, sheet, changed_paths=None):
+        """
+        Recalcula (no lugar) os campos derivados; todos se `changed_paths` for
+        None. Retorna os caminhos (listas de chaves) cujo valor mudou.
+        """
+        targets = None if changed_paths is None else self.affected(changed_paths)
+        updated = []
+        for target in self.order:
+            if targets is not None and target not in targets:
+                continue
+            try:
+                value = self.formulas[target][0](sheet)
+            except (ArithmeticError, FormulaError, TypeError, ValueError) as e:
+                logger.warning(f'Erro ao calcular {".".join(target)}: {str(e)}')
+                continue
+            if isinstance(value, bool):
+                value = int(value)
+            elif isinstance(value, float) and value.is_integer():
+                value = int(value)
+            if not json_equal(_lookup(sheet, target), value) and _assign(sheet, target, value):
+                updated.append(list(target))
+        return updated
+
+
+def _assign(sheet, path, value):
+    container = sheet
+    for key in path[:-1]:
+        container = container.setdefault(key, {})
+        if not isinstance(container, dict):
+            return False
+    container[path[-1]] = value
+    return True
+
+
+@lru_cache(maxsize=64)
+def _compiled(formulas_json):
+    return FormulaGraph(json.loads(formulas_json))
+
+
+def compile_formulas(formulas):
+    """Grafo compilado (em cache pelo conteúdo das fórmulas); None se vazio"""
+    if not formulas:
+        return None
+    return _compiled(json.dumps(formulas, sort_keys=True))
+
+
+def get_formula_graph(rpg_system):
+    """Grafo do sistema; fórmulas inválidas são registradas no log e ignoradas"""
+    if rpg_system is None:
+        return None
+    try:
+        return compile_formulas(rpg_system.derived_formulas)
+    except FormulaError as e:
+        logger.error(f'Fórmulas inválidas em {rpg_system.slug}: {str(e)}')
+        return None
+
+
+def recompute_system(rpg_system, batch_size=BATCH_SIZE):
+    """
+    Recalcula os campos derivados de todos os personagens do sistema, em
+    lotes (cada lote trava só as suas linhas e grava com bulk_update).
+    Retorna quantos personagens mudaram.
+    """
+    from .cache import get_sheet_template
+    from .models import Character
+
+    graph = get_formula_graph(rpg_system)
+    if graph is None:
+        return 0
+
+    from .indexing import index_values, sync_sheet_index
+
+    paths = list(rpg_system.indexed_paths or [])
+    ids = list(Character.objects.filter(rpg_system=rpg_system).values_list('pk', flat=True))
+    updated = 0
+    for start in range(0, len(ids), batch_size):
+        with transaction.atomic():
+            batch = []
+            index = {}
+            now = timezone.now()
+            for character in Character.objects.select_for_update().filter(
+                pk__in=ids[start:start + batch_size]
+            ).only('pk', 'sheet_template', 'sheet_overrides'):
+                template = (
+                    get_sheet_template(character.sheet_template_id).data
+                    if character.sheet_template_id else {}
+                )
+                sheet = merge_sheet(template, character.sheet_overrides)
+                if graph.recompute(sheet):
+                    character.sheet_overrides = diff_sheet(template, sheet)
+                    character.sheet_version = F('sheet_version') + 1
+                    character.updated_at = now
+                    batch.append(character)
+                    if paths:
+                        index[character.pk] = index_values(sheet, paths)
+            Character.objects.bulk_update(batch, ['sheet_overrides', 'sheet_version', 'updated_at'])
+            sync_sheet_index(index)
+            updated += len(batch)
+    return updated
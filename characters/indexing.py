@@ -0,0 +1,176 @@
+"""
+Índice dos caminhos filtráveis das fichas.
+
+Cada RPGSystem declara em ``indexed_paths`` os caminhos da ficha que podem
+ser filtrados (ex: ``basic_info.class``). O valor de cada caminho fica em
+CharacterSheetIndex (texto e número, com índices no banco), atualizado no
+save do personagem só quando algum desses valores muda.
+
+Filtros na listagem de personagens: ``?sheet.basic_info.class=Mago``,
+``?sheet.basic_info.level__gte=3``, ``?sheet.basic_info.race__in=Elfo,Anão``.
+"""
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from rest_framework.exceptions import ValidationError
+
+from .sheets import sheet_value
+
+FILTER_PREFIX = 'sheet.'
+MAX_TEXT_LENGTH = 255
+BATCH_SIZE = 500
+
+NUMBER_LOOKUPS = {'gt', 'gte', 'lt', 'lte'}
+TEXT_LOOKUPS = {'iexact', 'icontains', 'istartswith'}
+LOOKUPS = NUMBER_LOOKUPS | TEXT_LOOKUPS | {'exact', 'in'}
+
+
+def indexed_paths(rpg_system_id):
+    """Caminhos indexáveis do sistema (via cache dos sistemas ativos)"""
+    from .cache import get_system
+    from .models import RPGSystem
+
+    if not rpg_system_id:
+        return []
+    system = get_system(rpg_system_id)
+    if system is None:
+        system = RPGSystem.objects.filter(slug=rpg_system_id).first()
+    return list(system.indexed_paths or []) if system else []
+
+
+def _index_value(value):
+    """(value_text, value_number) ou None se o valor não é indexável"""
+    if isinstance(value, bool):
+        return ('true' if value else 'false', float(value))
+    if isinstance(value, (int, float)):
+        return (str(value), float(value))
+    if isinstance(value, str):
+        return (value[:MAX_TEXT_LENGTH], _to_number(value))
+    return None
+
+
+def _to_number(text):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def index_values(sheet, paths):
+    """Valores indexáveis de uma ficha já montada"""
+    return sparse_index_values(sheet, None, paths)
+
+
+def sparse_index_values(template, overrides, paths):
+    """Valores indexáveis lidos direto de template + alterações"""
+    values = {}
+    for path in paths:
+        value = _index_value(sheet_value(template, overrides, path.split('.')))
+        if value is not None:
+            values[path] = value
+    return values
+
+
+def sync_sheet_index(values_by_character):
+    """Grava o índice {character_id: {caminho: (texto, número)}} (só o que mudou)"""
+    from .models import CharacterSheetIndex
+
+    if not values_by_character:
+        return
+    existing = {
+        (row.character_id, row.path): row
+        for row in CharacterSheetIndex.objects.filter(character_id__in=list(values_by_character))
+    }
+    stale = []
+    create = []
+    for character_id, values in values_by_character.items():
+        for path, (text, number) in values.items():
+            row = existing.pop((character_id, path), None)
+            if row is not None and (row.value_text, row.value_number) == (text, number):
+                continue
+            if row is not None:
+                stale.append(row.pk)
+            create.append(CharacterSheetIndex(
+                character_id=character_id, path=path, value_text=text, value_number=number
+            ))
+    # Caminhos que deixaram de ser indexados ou de ter valor
+    stale.extend(row.pk for row in existing.values())
+
+    with transaction.atomic():
+        if stale:
+            CharacterSheetIndex.objects.filter(pk__in=stale).delete()
+        if create:
+            CharacterSheetIndex.objects.bulk_create(create)
+
+
+def reindex_system(rpg_system, batch_size=BATCH_SIZE):
+    """Reconstrói o índice de todos os personagens do sistema, em lotes"""
+    from .cache import get_sheet_template
+    from .models import Character
+
+    paths = list(rpg_system.indexed_paths or [])
+    queryset = Character.objects.filter(rpg_system=rpg_system).only(
+        'pk', 'sheet_template', 'sheet_overrides'
+    )
+    batch = {}
+    for character in queryset.iterator(chunk_size=batch_size):
+        template = (
+            get_sheet_template(character.sheet_template_id).data
+            if character.sheet_template_id else {}
+        )
+        batch[character.pk] = sparse_index_values(template, character.sheet_overrides, paths)
+        if len(batch) >= batch_size:
+            sync_sheet_index(batch)
+            batch = {}
+    sync_sheet_index(batch)
+
+
+def filterable_paths():
+    """Caminhos declarados como indexáveis por algum sistema ativo"""
+    from .cache import get_active_systems
+    return {
+        path for system in get_active_systems().values()
+        for path in (system.indexed_paths or [])
+    }
+
+
+def filter_by_sheet(queryset, params):
+    """Aplica os filtros ?sheet.<caminho>[__lookup]=valor ao queryset de Character"""
+    from .models import CharacterSheetIndex
+
+    allowed = None
+    for key, value in params.items():
+        if not key.startswith(FILTER_PREFIX):
+            continue
+        path, _, lookup = key[len(FILTER_PREFIX):].partition('__')
+        lookup = lookup or 'exact'
+        if allowed is None:
+            allowed = filterable_paths()
+        if path not in allowed:
+            raise ValidationError({key: 'Caminho não indexado pelo sistema de RPG'})
+        if lookup not in LOOKUPS:
+            raise ValidationError({key: f'Filtro inválido (use {", ".join(sorted(LOOKUPS))})'})
+
+        queryset = queryset.filter(Exists(
+            CharacterSheetIndex.objects.filter(
+                _value_condition(key, lookup, value), character=OuterRef('pk'), path=path
+            )
+        ))
+    return queryset
+
+
+def _value_condition(key, lookup, value):
+    if lookup in NUMBER_LOOKUPS:
+        number = _to_number(value)
+        if number is None:
+            raise ValidationError({key: 'Informe um número'})
+        return Q(**{f'value_number__{lookup}': number})
+    if lookup in TEXT_LOOKUPS:
+        return Q(**{f'value_text__{lookup}': value})
+
+    values = value.split(',') if lookup == 'in' else [value]
+    numbers = [number for number in map(_to_number, values) if number is not None]
+    condition = Q(value_text__in=values)
+    if numbers:
+        # "3" também encontra 3.0, gravado como número
+        condition |= Q(value_number__in=numbers)
+    return condition
@@ -0,0 +1,197 @@
+"""
+JSON Patch (RFC 6902) aplicado às fichas.
+
+``apply_patch`` altera o documento no lugar e retorna os caminhos afetados,
+usados para responder só com o que mudou (``changed_values``). Também há o
+formato simplificado ``{"caminho": valor}`` (``set_operations``), em que o
+caminho pode ser um JSON Pointer (``/hp/current``) ou pontuado (``hp.current``).
+"""
+import copy
+
+from core.renderers import UJSONParser
+
+from .sheets import json_equal
+
+MAX_OPERATIONS = 100
+
+OPERATIONS = ('add', 'remove', 'replace', 'move', 'copy', 'test')
+
+
+class PatchError(ValueError):
+    """Operação inválida ou caminho inexistente"""
+
+
+class PatchConflict(PatchError):
+    """Operação "test" falhou: a ficha não está no estado esperado"""
+
+
+class JSONPatchParser(UJSONParser):
+    media_type = 'application/json-patch+json'
+
+
+def escape(token):
+    return str(token).replace('~', '~0').replace('/', '~1')
+
+
+def parse_pointer(path):
+    """JSON Pointer (RFC 6901) -> lista de tokens"""
+    if not isinstance(path, str):
+        raise PatchError('Caminho deve ser um texto')
+    if path == '':
+        return []
+    if not path.startswith('/'):
+        raise PatchError(f'Caminho inválido: {path}')
+    return [token.replace('~1', '/').replace('~0', '~') for token in path[1:].split('/')]
+
+
+def to_pointer(tokens):
+    return ''.join('/' + escape(token) for token in tokens)
+
+
+def _index(container, token, allow_end=False):
+    if allow_end and token == '-':
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token[0] == '0'):
+        raise PatchError(f'Índice de lista inválido: {token}')
+    index = int(token)
+    limit = len(container) if allow_end else len(container) - 1
+    if index > limit:
+        raise PatchError(f'Índice fora da lista: {token}')
+    return index
+
+
+def _get(document, tokens):
+    value = document
+    for token in tokens:
+        if isinstance(value, dict):
+            if token not in value:
+                raise PatchError(f'Caminho não encontrado: {to_pointer(tokens)}')
+            value = value[token]
+        elif isinstance(value, list):
+            value = value[_index(value, token)]
+        else:
+            raise PatchError(f'Caminho não encontrado: {to_pointer(tokens)}')
+    return value
+
+
+def _parent(document, tokens):
+    if not tokens:
+        raise PatchError('Não é possível alterar a ficha inteira')
+    parent = _get(document, tokens[:-1])
+    if not isinstance(parent, (dict, list)):
+        raise PatchError(f'Caminho não encontrado: {to_pointer(tokens)}')
+    return parent, tokens[-1]
+
+
+def _add(document, tokens, value):
+    parent, token = _parent(document, tokens)
+    if isinstance(parent, list):
+        parent.insert(_index(parent, token, allow_end=True), value)
+        # Inserir desloca os índices: o cliente recebe a lista inteira
+        return tokens[:-1]
+    parent[token] = value
+    return tokens
+
+
+def _remove(document, tokens):
+    parent, token = _parent(document, tokens)
+    if isinstance(parent, list):
+        return parent.pop(_index(parent, token)), tokens[:-1]
+    if token not in parent:
+        raise PatchError(f'Caminho não encontrado: {to_pointer(tokens)}')
+    return parent.pop(token), tokens
+
+
+def _replace(document, tokens, value):
+    parent, token = _parent(document, tokens)
+    if isinstance(parent, list):
+        parent[_index(parent, token)] = value
+    elif token in parent:
+        parent[token] = value
+    else:
+        raise PatchError(f'Caminho não encontrado: {to_pointer(tokens)}')
+    return tokens
+
+
+def _operation(op):
+    if not isinstance(op, dict) or op.get('op') not in OPERATIONS:
+        raise PatchError(f'Operação inválida: {op}')
+    if 'path' not in op:
+        raise PatchError('Operação sem "path"')
+    if op['op'] in ('add', 'replace', 'test') and 'value' not in op:
+        raise PatchError(f'Operação "{op["op"]}" sem "value"')
+    if op['op'] in ('move', 'copy') and 'from' not in op:
+        raise PatchError(f'Operação "{op["op"]}" sem "from"')
+    return op['op']
+
+
+def apply_patch(document, operations):
+    """
+    Aplica as operações no documento (no lugar) e retorna a lista de caminhos
+    alterados. O chamador deve descartar o documento se houver PatchError.
+    """
+    if not isinstance(operations, list):
+        raise PatchError('As operações devem ser uma lista')
+    if len(operations) > MAX_OPERATIONS:
+        raise PatchError(f'Máximo de {MAX_OPERATIONS} operações por requisição')
+
+    changed = []
+    for op in operations:
+        name = _operation(op)
+        tokens = parse_pointer(op['path'])
+
+        if name == 'test':
+            if not json_equal(_get(document, tokens), op['value']):
+                raise PatchConflict(f'Teste falhou em {op["path"]}')
+        elif name == 'add':
+            changed.append(_add(document, tokens, copy.deepcopy(op['value'])))
+        elif name == 'replace':
+            changed.append(_replace(document, tokens, copy.deepcopy(op['value'])))
+        elif name == 'remove':
+            changed.append(_remove(document, tokens)[1])
+        elif name == 'copy':
+            value = copy.deepcopy(_get(document, parse_pointer(op['from'])))
+            changed.append(_add(document, tokens, value))
+        else:
+            source = parse_pointer(op['from'])
+            if tokens[:len(source)] == source and tokens != source:
+                raise PatchError('Não é possível mover um valor para dentro dele mesmo')
+            value, removed = _remove(document, source)
+            changed.append(removed)
+            changed.append(_add(document, tokens, value))
+
+    return collapse_paths(changed)
+
+
+def collapse_paths(paths):
+    """Remove duplicados e caminhos contidos em outro caminho alterado"""
+    result = []
+    for tokens in sorted({tuple(tokens) for tokens in paths}, key=lambda tokens: (len(tokens), tokens)):
+        if not any(tokens[:len(parent)] == parent for parent in result):
+            result.append(tokens)
+    return [list(tokens) for tokens in result]
+
+
+def changed_values(document, paths):
+    """Operações que levam do estado anterior ao atual, só nos caminhos alterados"""
+    changes = []
+    for tokens in paths:
+        try:
+            value = _get(document, tokens)
+        except PatchError:
+            changes.append({'op': 'remove', 'path': to_pointer(tokens)})
+        else:
+            changes.append({'op': 'add', 'path': to_pointer(tokens), 'value': value})
+    return changes
+
+
+def set_operations(changes):
+    """{"hp.current": 10, "/conditions": [...]} -> operações "add" equivalentes"""
+    if not isinstance(changes, dict):
+        raise PatchError('"set" deve ser um objeto {caminho: valor}')
+    operations = []
+    for path, value in changes.items():
+        if not path.startswith('/'):
+            path = to_pointer(path.split('.'))
+        operations.append({'op': 'add', 'path': path, 'value': value})
+    return operations
@@ -73,6 +73,30 @@ class Command(BaseCommand):
             }
         }
         
+        # Campos calculados pelo servidor (skill_proficiency.<perícia> = 1 soma a proficiência)
+        dnd5e_formulas = {
+            "derived_stats.proficiency_bonus": "2 + (basic_info.level - 1) // 4",
+            "derived_stats.armor_class": "10 + mod(attributes.dexterity) + derived_stats.armor_bonus",
+            "skills.acrobatics": "mod(attributes.dexterity) + skill_proficiency.acrobatics * derived_stats.proficiency_bonus",
+            "skills.animal_handling": "mod(attributes.wisdom) + skill_proficiency.animal_handling * derived_stats.proficiency_bonus",
+            "skills.arcana": "mod(attributes.intelligence) + skill_proficiency.arcana * derived_stats.proficiency_bonus",
+            "skills.athletics": "mod(attributes.strength) + skill_proficiency.athletics * derived_stats.proficiency_bonus",
+            "skills.deception": "mod(attributes.charisma) + skill_proficiency.deception * derived_stats.proficiency_bonus",
+            "skills.history": "mod(attributes.intelligence) + skill_proficiency.history * derived_stats.proficiency_bonus",
+            "skills.insight": "mod(attributes.wisdom) + skill_proficiency.insight * derived_stats.proficiency_bonus",
+            "skills.intimidation": "mod(attributes.charisma) + skill_proficiency.intimidation * derived_stats.proficiency_bonus",
+            "skills.investigation": "mod(attributes.intelligence) + skill_proficiency.investigation * derived_stats.proficiency_bonus",
+            "skills.medicine": "mod(attributes.wisdom) + skill_proficiency.medicine * derived_stats.proficiency_bonus",
+            "skills.nature": "mod(attributes.intelligence) + skill_proficiency.nature * derived_stats.proficiency_bonus",
+            "skills.perception": "mod(attributes.wisdom) + skill_proficiency.perception * derived_stats.proficiency_bonus",
+            "skills.performance": "mod(attributes.charisma) + skill_proficiency.performance * derived_stats.proficiency_bonus",
+            "skills.persuasion": "mod(attributes.charisma) + skill_proficiency.persuasion * derived_stats.proficiency_bonus",
+            "skills.religion": "mod(attributes.intelligence) + skill_proficiency.religion * derived_stats.proficiency_bonus",
+            "skills.sleight_of_hand": "mod(attributes.dexterity) + skill_proficiency.sleight_of_hand * derived_stats.proficiency_bonus",
+            "skills.stealth": "mod(attributes.dexterity) + skill_proficiency.stealth * derived_stats.proficiency_bonus",
+            "skills.survival": "mod(attributes.wisdom) + skill_proficiency.survival * derived_stats.proficiency_bonus",
+        }
+        
         # D&D 5e (Sistema padrão)
         dnd5e, created = RPGSystem.objects.get_or_create(
             slug='dnd5e',
@@ -80,6 +104,8 @@ class Command(BaseCommand):
                 'name': 'D&D 5ª Edição',
                 'description': 'Sistema oficial de Dungeons & Dragons 5ª edição',
                 'base_sheet_data': dnd5e_data,
+                'derived_formulas': dnd5e_formulas,
+                'indexed_paths': ['basic_info.level', 'basic_info.class', 'basic_info.race'],
                 'is_default': True,
                 'is_active': True
             }
@@ -88,6 +114,10 @@ class Command(BaseCommand):
             self.stdout.write(self.style.SUCCESS('✅ D&D 5e criado como sistema padrão'))
         else:
             dnd5e.is_default = True
+            if not dnd5e.derived_formulas:
+                dnd5e.derived_formulas = dnd5e_formulas
+            if not dnd5e.indexed_paths:
+                dnd5e.indexed_paths = ['basic_info.level', 'basic_info.class', 'basic_info.race']
             dnd5e.save()
             self.stdout.write(self.style.SUCCESS('✅ D&D 5e definido como padrão'))
         
@@ -105,6 +135,7 @@ class Command(BaseCommand):
                 'name': 'Sistema Genérico',
                 'description': 'Sistema básico para qualquer tipo de RPG',
                 'base_sheet_data': generic_data,
+                'indexed_paths': ['basic_info.level', 'basic_info.class', 'basic_info.race'],
                 'is_default': False,
                 'is_active': True
             }
@@ -180,6 +211,7 @@ class Command(BaseCommand):
                 'name': 'Call of Cthulhu',
                 'description': 'Sistema de horror investigativo da Chaosium',
                 'base_sheet_data': coc_data,
+                'indexed_paths': ['basic_info.occupation', 'basic_info.age'],
                 'is_default': False,
                 'is_active': True
             }
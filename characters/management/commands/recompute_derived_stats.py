@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from characters.formulas import recompute_system
+from characters.models import RPGSystem
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os campos derivados das fichas (todos os sistemas ou os informados)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('slugs', nargs='*', help='Slugs dos sistemas de RPG')
+
+    def handle(self, *args, **options):
+        systems = RPGSystem.objects.all()
+        if options['slugs']:
+            systems = systems.filter(slug__in=options['slugs'])
+
+        for system in systems:
+            updated = recompute_system(system)
+            self.stdout.write(self.style.SUCCESS(f'✅ {system.name}: {updated} ficha(s) atualizada(s)'))
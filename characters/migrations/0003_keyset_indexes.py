@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 07:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0002_rpgsystem_logo_url'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='character',
+            index=models.Index(fields=['user', 'created_at'], name='characters__user_id_c3d218_idx'),
+        ),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 4.2 on 2026-10-18 10:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from characters.sheets import diff_sheet, merge_sheet, sheet_checksum
+
+BATCH_SIZE = 500
+
+
+def create_templates(apps, schema_editor):
+    """Versão 1 do template para cada sistema e ficha convertida em diff"""
+    RPGSystem = apps.get_model('characters', 'RPGSystem')
+    SheetTemplate = apps.get_model('characters', 'SheetTemplate')
+    Character = apps.get_model('characters', 'Character')
+
+    templates = {}
+    for system in RPGSystem.objects.all():
+        templates[system.slug] = SheetTemplate.objects.create(
+            rpg_system=system,
+            version=1,
+            checksum=sheet_checksum(system.base_sheet_data),
+            data=system.base_sheet_data,
+        )
+
+    batch = []
+    for character in Character.objects.exclude(rpg_system=None).iterator(chunk_size=BATCH_SIZE):
+        template = templates[character.rpg_system_id]
+        # Neste ponto sheet_overrides ainda contém a ficha completa
+        character.sheet_overrides = diff_sheet(template.data, character.sheet_overrides)
+        character.sheet_template = template
+        batch.append(character)
+        if len(batch) >= BATCH_SIZE:
+            Character.objects.bulk_update(batch, ['sheet_overrides', 'sheet_template'])
+            batch = []
+    if batch:
+        Character.objects.bulk_update(batch, ['sheet_overrides', 'sheet_template'])
+
+
+def restore_full_sheets(apps, schema_editor):
+    """Volta a gravar a ficha completa em cada personagem"""
+    SheetTemplate = apps.get_model('characters', 'SheetTemplate')
+    Character = apps.get_model('characters', 'Character')
+
+    templates = {template.pk: template.data for template in SheetTemplate.objects.all()}
+    batch = []
+    for character in Character.objects.exclude(sheet_template=None).iterator(chunk_size=BATCH_SIZE):
+        character.sheet_overrides = merge_sheet(
+            templates[character.sheet_template_id], character.sheet_overrides
+        )
+        batch.append(character)
+        if len(batch) >= BATCH_SIZE:
+            Character.objects.bulk_update(batch, ['sheet_overrides'])
+            batch = []
+    if batch:
+        Character.objects.bulk_update(batch, ['sheet_overrides'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0003_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SheetTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('checksum', models.CharField(max_length=64)),
+                ('data', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('rpg_system', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sheet_templates', to='characters.rpgsystem')),
+            ],
+            options={
+                'verbose_name': 'Template de Ficha',
+                'verbose_name_plural': 'Templates de Ficha',
+                'ordering': ['rpg_system', '-version'],
+                'unique_together': {('rpg_system', 'version')},
+            },
+        ),
+        migrations.RenameField(
+            model_name='character',
+            old_name='sheet_data',
+            new_name='sheet_overrides',
+        ),
+        migrations.AlterField(
+            model_name='character',
+            name='sheet_overrides',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='character',
+            name='sheet_template',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='characters', to='characters.sheettemplate'),
+        ),
+        migrations.RunPython(create_templates, restore_full_sheets),
+    ]
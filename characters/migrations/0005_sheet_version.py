@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 07:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0004_sheet_templates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='character',
+            name='sheet_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
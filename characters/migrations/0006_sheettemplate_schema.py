@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-18 07:55
+
+from django.db import migrations, models
+
+from characters.schema import derive_schema
+
+
+def derive_schemas(apps, schema_editor):
+    SheetTemplate = apps.get_model('characters', 'SheetTemplate')
+    for template in SheetTemplate.objects.all():
+        template.schema = derive_schema(template.data)
+        template.save(update_fields=['schema'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0005_sheet_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sheettemplate',
+            name='schema',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(derive_schemas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 07:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0006_sheettemplate_schema'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rpgsystem',
+            name='derived_formulas',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2 on 2026-10-18 08:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0007_rpgsystem_derived_formulas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rpgsystem',
+            name='indexed_paths',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.CreateModel(
+            name='CharacterSheetIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=200)),
+                ('value_text', models.CharField(blank=True, max_length=255, null=True)),
+                ('value_number', models.FloatField(blank=True, null=True)),
+                ('character', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sheet_index', to='characters.character')),
+            ],
+            options={
+                'verbose_name': 'Índice de Ficha',
+                'verbose_name_plural': 'Índices de Ficha',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='charactersheetindex',
+            index=models.Index(fields=['path', 'value_text'], name='characters__path_9a0994_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='charactersheetindex',
+            index=models.Index(fields=['path', 'value_number'], name='characters__path_34cf63_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='charactersheetindex',
+            unique_together={('character', 'path')},
+        ),
+    ]
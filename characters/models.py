@@ -1,10 +1,11 @@
 import uuid
-import json
-import os
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.utils.text import slugify
 
+from .sheets import diff_sheet, json_equal, merge_sheet, sheet_checksum
+
 
 class RPGSystem(models.Model):
     """Modelo para diferentes sistemas de RPG"""
@@ -17,6 +18,10 @@ class RPGSystem(models.Model):
     
     # Template base para a ficha do personagem
     base_sheet_data = models.JSONField(default=dict)
+    # Campos calculados pelo servidor: {"caminho.do.campo": "fórmula"} (veja formulas.py)
+    derived_formulas = models.JSONField(default=dict, blank=True)
+    # Caminhos da ficha que podem ser usados em filtros (ex: ["basic_info.level"])
+    indexed_paths = models.JSONField(default=list, blank=True)
     
     # Configurações do sistema
     is_active = models.BooleanField(default=True)
@@ -41,30 +46,85 @@ class RPGSystem(models.Model):
         if self.is_default:
             # Usa o slug (já gerado acima) em vez de self.pk,
             # pois self.pk é None em objetos novos e causaria erro no ORM
-            RPGSystem.objects.exclude(slug=self.slug).update(is_default=False)
+            RPGSystem.objects.exclude(slug=self.slug).filter(is_default=True).update(
+                is_default=False, updated_at=timezone.now()
+            )
+
+        previous = RPGSystem.objects.filter(slug=self.slug).values(
+            'derived_formulas', 'indexed_paths'
+        ).first()
+        formulas_changed = previous is not None and not json_equal(
+            previous['derived_formulas'], self.derived_formulas
+        )
+        indexes_changed = previous is not None and not json_equal(
+            previous['indexed_paths'], self.indexed_paths
+        )
 
         super().save(*args, **kwargs)
+
+        if self.sync_sheet_template():
+            # Nova versão do template criada depois do post_save: invalida de
+            # novo para este processo não ficar com a versão anterior em cache
+            from .cache import invalidate_systems
+            invalidate_systems()
+
+        if formulas_changed:
+            from .formulas import recompute_system
+            recompute_system(self)
+        if indexes_changed:
+            from .indexing import reindex_system
+            reindex_system(self)
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        from .formulas import FormulaError, compile_formulas
+        try:
+            compile_formulas(self.derived_formulas)
+        except FormulaError as e:
+            raise ValidationError({'derived_formulas': str(e)})
+        if not isinstance(self.indexed_paths, list) or not all(
+            isinstance(path, str) and path for path in self.indexed_paths
+        ):
+            raise ValidationError({'indexed_paths': 'Informe uma lista de caminhos (ex: ["basic_info.level"])'})
+
+    def sync_sheet_template(self):
+        """
+        Cria uma nova versão (SheetTemplate) quando o base_sheet_data muda.
+        Retorna a versão criada ou None se o template atual já é igual.
+        """
+        checksum = sheet_checksum(self.base_sheet_data)
+        latest = self.sheet_templates.order_by('-version').first()
+        if latest and latest.checksum == checksum:
+            return None
+        from .schema import derive_schema
+        return SheetTemplate.objects.create(
+            rpg_system=self,
+            version=latest.version + 1 if latest else 1,
+            checksum=checksum,
+            data=self.base_sheet_data,
+            schema=derive_schema(self.base_sheet_data),
+        )
     
     @classmethod
     def get_default_system(cls):
-        """Retorna o sistema padrão"""
-        return cls.objects.filter(is_default=True, is_active=True).first()
+        """Retorna o sistema padrão (via cache, sem query na maioria das chamadas)"""
+        from .cache import get_default_system
+        return get_default_system()
     
     @classmethod
     def get_default_sheet_data(cls, system_slug=None):
-        """Retorna os dados base da ficha para um sistema específico ou o padrão"""
+        """Retorna uma cópia dos dados base da ficha para um sistema específico ou o padrão"""
+        from .cache import copy_template, get_system
+
         if system_slug:
-            try:
-                system = cls.objects.get(slug=system_slug, is_active=True)
-                if system.base_sheet_data:
-                    return system.base_sheet_data
-            except cls.DoesNotExist:
-                pass
+            system = get_system(system_slug)
+            if system and system.base_sheet_data:
+                return copy_template(system.base_sheet_data)
         
         # Fallback para sistema padrão
         default_system = cls.get_default_system()
         if default_system and default_system.base_sheet_data:
-            return default_system.base_sheet_data  # corrigido: era default_system._data
+            return copy_template(default_system.base_sheet_data)
         
         # Fallback final para dados básicos
         return {
@@ -95,6 +155,32 @@ class RPGSystem(models.Model):
         }
 
 
+class SheetTemplate(models.Model):
+    """Versão imutável do base_sheet_data de um sistema, compartilhada pelas fichas"""
+
+    rpg_system = models.ForeignKey(
+        RPGSystem,
+        on_delete=models.CASCADE,
+        related_name="sheet_templates",
+        to_field='slug'
+    )
+    version = models.PositiveIntegerField()
+    checksum = models.CharField(max_length=64)
+    data = models.JSONField(default=dict)
+    # JSON Schema usado para validar as fichas desta versão (veja schema.py)
+    schema = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Template de Ficha"
+        verbose_name_plural = "Templates de Ficha"
+        ordering = ['rpg_system', '-version']
+        unique_together = ('rpg_system', 'version')
+
+    def __str__(self):
+        return f"{self.rpg_system_id} v{self.version}"
+
+
 def get_default_sheet_data():
     """Retorna o template padrão da ficha de personagem baseado no sistema selecionado"""
     sheet_data = RPGSystem.get_default_sheet_data()
@@ -102,12 +188,11 @@ def get_default_sheet_data():
         return sheet_data
     
     # Fallback para arquivo template (compatibilidade com versão anterior)
-    template_path = os.path.join(settings.BASE_DIR, 'character_sheet_template.json')
-    try:
-        with open(template_path, 'r', encoding='utf-8') as file:
-            return json.load(file)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return RPGSystem.get_default_sheet_data()
+    from .cache import copy_template, load_template_file
+    template = load_template_file()
+    if template is not None:
+        return copy_template(template)
+    return RPGSystem.get_default_sheet_data()
 
 
 class Character(models.Model):
@@ -135,7 +220,18 @@ class Character(models.Model):
     xp_total = models.IntegerField(default=0)
     description = models.TextField(blank=True, null=True)
 
-    sheet_data = models.JSONField(default=get_default_sheet_data)
+    # Ficha copy-on-write: versão do template + só o que mudou em relação a
+    # ele. A ficha completa é exposta pela property sheet_data.
+    sheet_template = models.ForeignKey(
+        SheetTemplate,
+        on_delete=models.PROTECT,
+        related_name="characters",
+        null=True,
+        blank=True
+    )
+    sheet_overrides = models.JSONField(default=dict, blank=True)
+    # Incrementada a cada mudança na ficha (controle de concorrência otimista)
+    sheet_version = models.PositiveIntegerField(default=1)
 
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -145,21 +241,123 @@ class Character(models.Model):
         ordering = ["-created_at"]
         verbose_name = "Personagem"
         verbose_name_plural = "Personagens"
+        indexes = [
+            models.Index(fields=["user", "created_at"]),
+        ]
     
+    @property
+    def template_data(self):
+        """Conteúdo (compartilhado, não alterar) da versão do template da ficha"""
+        if not self.sheet_template_id:
+            return {}
+        from .cache import get_sheet_template
+        return get_sheet_template(self.sheet_template_id).data
+
+    @property
+    def sheet_data(self):
+        """Ficha completa, montada sob demanda e guardada na instância"""
+        sheet = self.__dict__.get('_sheet_cache')
+        if sheet is None:
+            sheet = merge_sheet(self.template_data, self.sheet_overrides)
+            self._sheet_cache = sheet
+        return sheet
+
+    @sheet_data.setter
+    def sheet_data(self, value):
+        # O diff contra o template é calculado no save()
+        self._sheet_cache = value if value is not None else {}
+
+    def apply_template(self, rpg_system=None):
+        """Volta a ficha para a versão atual do template (sem copiar o JSON)"""
+        from .cache import get_current_template
+
+        rpg_system = rpg_system or self.rpg_system
+        template = get_current_template(rpg_system.slug) if rpg_system else None
+        self.sheet_template = template
+        self.sheet_overrides = {} if template else get_default_sheet_data()
+        self._sheet_cache = None
+        self._sheet_changed = True
+        if not self._state.adding:
+            self.sheet_version += 1
+
+    def recompute_derived(self, changed_paths=None):
+        """
+        Recalcula os campos derivados da ficha (só os afetados por
+        `changed_paths`, se informado). Retorna os caminhos que mudaram.
+        """
+        self._derived_current = True
+        return self._recompute_derived(changed_paths)
+
+    def _recompute_derived(self, changed_paths=None):
+        from .cache import get_system
+        from .formulas import get_formula_graph
+
+        rpg_system = get_system(self.rpg_system_id) or self.rpg_system
+        graph = get_formula_graph(rpg_system)
+        if graph is None:
+            return []
+        return graph.recompute(self.sheet_data, changed_paths)
+
     def save(self, *args, **kwargs):
         """Override save to set default RPG system and apply sheet template"""
         # Se não tem sistema definido, usa o padrão
         if not self.rpg_system_id:
             self.rpg_system = RPGSystem.get_default_system()
 
-        # Se é um novo personagem, sempre aplica o template do sistema
-        if not self.pk:
-            if self.rpg_system and self.rpg_system.base_sheet_data:
-                self.sheet_data = self.rpg_system.base_sheet_data
-            else:
-                self.sheet_data = get_default_sheet_data()
-        
+        sheet = self.__dict__.get('_sheet_cache')
+        if self._state.adding and not self.sheet_template_id:
+            # Novo personagem: aponta para o template do sistema e guarda só
+            # o que foi informado de diferente dele
+            self.apply_template()
+            if sheet is not None:
+                self.sheet_data = sheet
+
+        update_fields = kwargs.get('update_fields')
+        derived_current = self.__dict__.pop('_derived_current', False)
+        if not derived_current and self.rpg_system_id and (
+            update_fields is None or 'sheet_data' in update_fields
+            or 'sheet_overrides' in update_fields
+        ):
+            self._recompute_derived()
+
+        from .indexing import indexed_paths, index_values, sparse_index_values, sync_sheet_index
+
+        # Template trocado ou personagem novo: o índice é sempre regravado.
+        # Nos demais casos só se algum valor indexado mudar.
+        index_before = None
+        sheet_changed = self.__dict__.pop('_sheet_changed', False) or self._state.adding
+        paths = indexed_paths(self.rpg_system_id)
+        sheet = self.__dict__.get('_sheet_cache')
+        if sheet is not None:
+            if not sheet_changed:
+                index_before = sparse_index_values(self.template_data, self.sheet_overrides, paths)
+            # Cobre tanto sheet_data = {...} quanto alterações in-place
+            overrides = diff_sheet(self.template_data, sheet)
+            if not json_equal(overrides, self.sheet_overrides):
+                self.sheet_overrides = overrides
+                sheet_changed = True
+                if not self._state.adding:
+                    self.sheet_version += 1
+
+        if update_fields is not None and 'sheet_data' in update_fields:
+            kwargs['update_fields'] = [
+                field for field in update_fields if field != 'sheet_data'
+            ] + ['sheet_overrides', 'sheet_version']
+
+        adding = self._state.adding
         super().save(*args, **kwargs)
+
+        if sheet_changed:
+            if sheet is not None:
+                index_after = index_values(sheet, paths)
+            else:
+                index_after = sparse_index_values(self.template_data, self.sheet_overrides, paths)
+            if index_after != index_before and (index_after or not adding):
+                sync_sheet_index({self.pk: index_after})
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._sheet_cache = None
     
     @property
     def system_name(self):
@@ -169,4 +367,30 @@ class Character(models.Model):
     def __str__(self):
         player_info = f" ({self.player_name})" if self.player_name else ""
         system_name = self.rpg_system.name if self.rpg_system else "Sem sistema"
-        return f"{self.player_name or 'Personagem'}{player_info} - {system_name}"
\ No newline at end of file
+        return f"{self.player_name or 'Personagem'}{player_info} - {system_name}"
+
+
+class CharacterSheetIndex(models.Model):
+    """Valor extraído da ficha em um caminho indexável do sistema (usado nos filtros)"""
+
+    character = models.ForeignKey(
+        Character,
+        on_delete=models.CASCADE,
+        related_name="sheet_index"
+    )
+    path = models.CharField(max_length=200)
+    value_text = models.CharField(max_length=255, blank=True, null=True)
+    value_number = models.FloatField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = "Índice de Ficha"
+        verbose_name_plural = "Índices de Ficha"
+        unique_together = ('character', 'path')
+        indexes = [
+            models.Index(fields=["path", "value_text"]),
+            models.Index(fields=["path", "value_number"]),
+        ]
+
+    def __str__(self):
+        return f"{self.character_id} {self.path}={self.value_text}"
+
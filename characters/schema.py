@@ -0,0 +1,189 @@
+"""
+Validação das fichas por JSON Schema.
+
+Cada versão de template (SheetTemplate) guarda um schema derivado do seu
+conteúdo: tipos de cada campo conhecido, aceitando campos extras e null nos
+valores simples. O schema é compilado uma única vez por versão em uma árvore
+de validadores em Python; palavras-chave fora do subconjunto compilado
+(type, properties, items, required, additionalProperties, enum, minimum,
+maximum) são delegadas ao jsonschema.
+
+``validate_paths`` valida só as partes alteradas da ficha (usado pelo
+PATCH /sheet/), sem percorrer o documento inteiro.
+"""
+from functools import lru_cache
+
+from jsonschema.validators import validator_for
+
+from .jsonpatch import to_pointer
+
+MAX_ERRORS = 20
+
+COMPILED_KEYWORDS = {
+    'type', 'properties', 'items', 'required', 'additionalProperties',
+    'enum', 'minimum', 'maximum',
+    # Anotações, ignoradas na validação
+    '$schema', 'title', 'description', 'default',
+}
+
+
+def derive_schema(value):
+    """JSON Schema com os tipos do template (campos extras são permitidos)"""
+    if value is None:
+        return {}
+    if isinstance(value, bool):
+        return {'type': ['boolean', 'null']}
+    if isinstance(value, (int, float)):
+        return {'type': ['number', 'null']}
+    if isinstance(value, str):
+        return {'type': ['string', 'null']}
+    if isinstance(value, list):
+        schema = {'type': 'array'}
+        items = [derive_schema(item) for item in value]
+        if items and all(item == items[0] for item in items):
+            schema['items'] = items[0]
+        return schema
+    if isinstance(value, dict):
+        return {
+            'type': 'object',
+            'properties': {key: derive_schema(item) for key, item in value.items()},
+        }
+    return {}
+
+
+def _is_type(value, name):
+    if name == 'object':
+        return isinstance(value, dict)
+    if name == 'array':
+        return isinstance(value, list)
+    if name == 'string':
+        return isinstance(value, str)
+    if name == 'boolean':
+        return isinstance(value, bool)
+    if name == 'null':
+        return value is None
+    if isinstance(value, bool):
+        return False
+    if name == 'number':
+        return isinstance(value, (int, float))
+    if name == 'integer':
+        return isinstance(value, int) or (isinstance(value, float) and value.is_integer())
+    return False
+
+
+class _Node:
+    """Validador compilado de um (sub)schema"""
+
+    def __init__(self, schema):
+        if schema is True or schema is None:
+            schema = {}
+        if schema is False:
+            schema = {'not': {}}
+        types = schema.get('type')
+        self.types = [types] if isinstance(types, str) else types
+        self.enum = schema.get('enum')
+        self.minimum = schema.get('minimum')
+        self.maximum = schema.get('maximum')
+        self.required = schema.get('required', ())
+        self.properties = {
+            key: _Node(subschema) for key, subschema in schema.get('properties', {}).items()
+        }
+        additional = schema.get('additionalProperties', True)
+        self.additional = None if additional is True else _Node(additional)
+        self.items = _Node(schema['items']) if 'items' in schema else None
+
+        extra = {key: item for key, item in schema.items() if key not in COMPILED_KEYWORDS}
+        self.fallback = None
+        if extra:
+            cls = validator_for(schema)
+            cls.check_schema(schema)
+            self.fallback = cls(schema)
+
+    def validate(self, value, path, errors):
+        if len(errors) >= MAX_ERRORS:
+            return
+        if self.types and not any(_is_type(value, name) for name in self.types):
+            errors.append(f'{to_pointer(path) or "/"}: esperado {" ou ".join(self.types)}')
+            return
+        if self.enum is not None and value not in self.enum:
+            errors.append(f'{to_pointer(path)}: valor não permitido')
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            if self.minimum is not None and value < self.minimum:
+                errors.append(f'{to_pointer(path)}: mínimo {self.minimum}')
+            if self.maximum is not None and value > self.maximum:
+                errors.append(f'{to_pointer(path)}: máximo {self.maximum}')
+
+        if isinstance(value, dict):
+            for key in self.required:
+                if key not in value:
+                    errors.append(f'{to_pointer(path + [key])}: obrigatório')
+            for key, item in value.items():
+                node = self.child(key)
+                if node is not None:
+                    node.validate(item, path + [key], errors)
+        elif isinstance(value, list) and self.items is not None:
+            for index, item in enumerate(value):
+                self.items.validate(item, path + [str(index)], errors)
+
+        if self.fallback is not None:
+            for error in self.fallback.iter_errors(value):
+                errors.append(f'{to_pointer(path + [str(p) for p in error.absolute_path])}: {error.message}')
+                if len(errors) >= MAX_ERRORS:
+                    break
+
+    def child(self, token):
+        """Validador de uma chave/índice (None = qualquer valor)"""
+        if self.items is not None:
+            return self.items
+        node = self.properties.get(token)
+        return node if node is not None else self.additional
+
+
+@lru_cache(maxsize=256)
+def _compiled(template_id):
+    from .cache import get_sheet_template
+    return _Node(get_sheet_template(template_id).schema)
+
+
+def validate_sheet(template_id, sheet):
+    """Lista de erros da ficha inteira (vazia = válida)"""
+    if not template_id:
+        return []
+    errors = []
+    _compiled(template_id).validate(sheet, [], errors)
+    return errors
+
+
+def validate_paths(template_id, sheet, paths):
+    """Valida só os caminhos alterados (tokens, como retornados por apply_patch)"""
+    if not template_id:
+        return []
+    root = _compiled(template_id)
+    errors = []
+    for tokens in paths:
+        node, value, exists = root, sheet, True
+        for token in tokens:
+            node = node.child(token) if node is not None else None
+            if isinstance(value, dict) and token in value:
+                value = value[token]
+            elif isinstance(value, list) and token.isdigit() and int(token) < len(value):
+                value = value[int(token)]
+            else:
+                exists = False
+                break
+        if not exists:
+            # Caminho removido: só as chaves obrigatórias do pai importam
+            parent = _node_at(root, tokens[:-1])
+            if parent is not None and tokens[-1] in parent.required:
+                errors.append(f'{to_pointer(tokens)}: obrigatório')
+        elif node is not None:
+            node.validate(value, list(tokens), errors)
+    return errors
+
+
+def _node_at(node, tokens):
+    for token in tokens:
+        if node is None:
+            return None
+        node = node.child(token)
+    return node
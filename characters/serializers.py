@@ -1,8 +1,13 @@
 from rest_framework import serializers
+from core.lean import LeanSerializer, datetime_repr, uuid_repr
+from core.sparse import SparseFieldsMixin
+from .cache import get_sheet_template
 from .models import Character, RPGSystem
+from .schema import validate_sheet
+from .sheets import merge_sheet
 
 
-class RPGSystemSerializer(serializers.ModelSerializer):
+class RPGSystemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer para RPGSystem model"""
     
     character_count = serializers.SerializerMethodField(read_only=True)
@@ -15,6 +20,8 @@ class RPGSystemSerializer(serializers.ModelSerializer):
             "logo_url", 
             "description",
             "base_sheet_data",
+            "derived_formulas",
+            "indexed_paths",
             "is_active",
             "is_default",
             "character_count",
@@ -22,13 +29,14 @@ class RPGSystemSerializer(serializers.ModelSerializer):
             "updated_at",
         ]
         read_only_fields = ["slug", "created_at", "updated_at", "character_count"]
+        field_sources = {"character_count": ()}
     
     def get_character_count(self, obj):
         """Retorna o número de personagens que usam este sistema"""
         return obj.characters.count()
 
 
-class RPGSystemListSerializer(serializers.ModelSerializer):
+class RPGSystemListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer simplificado para listagem de sistemas"""
     
     class Meta:
@@ -43,12 +51,14 @@ class RPGSystemListSerializer(serializers.ModelSerializer):
         ]
 
 
-class CharacterSerializer(serializers.ModelSerializer):
+class CharacterSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer para Character model"""
     
     user_info = serializers.SerializerMethodField(read_only=True)
     system_name = serializers.CharField(read_only=True)
     rpg_system = RPGSystemListSerializer(read_only=True)
+    # Ficha completa (template + alterações); o model guarda só o diff
+    sheet_data = serializers.JSONField(required=False)
     
     class Meta:
         model = Character
@@ -61,13 +71,29 @@ class CharacterSerializer(serializers.ModelSerializer):
             "description",
             "avatar_url",
             "sheet_data",
+            "sheet_version",
             "is_active",
             "created_at",
             "updated_at",
             "user_info",
         ]
-        read_only_fields = ["id", "created_at", "updated_at", "user_info", "rpg_system", "system_name"]
+        read_only_fields = ["id", "sheet_version", "created_at", "updated_at", "user_info", "rpg_system", "system_name"]
+        field_sources = {
+            "sheet_data": ("sheet_template", "sheet_overrides"),
+            "system_name": ("rpg_system.name",),
+            "user_info": ("user.id", "user.username", "user.email"),
+        }
     
+    def validate_sheet_data(self, value):
+        """Valida a ficha contra o schema da versão do template"""
+        if not isinstance(value, dict):
+            raise serializers.ValidationError('A ficha deve ser um objeto')
+        template_id = self.instance.sheet_template_id if self.instance else None
+        errors = validate_sheet(template_id, value)
+        if errors:
+            raise serializers.ValidationError(errors)
+        return value
+
     def get_user_info(self, obj):
         """Retorna informações básicas do usuário"""
         if obj.user:
@@ -79,6 +105,58 @@ class CharacterSerializer(serializers.ModelSerializer):
         return None
 
 
+class CharacterLeanSerializer(LeanSerializer):
+    """Listagem de personagens: mesma saída do CharacterSerializer, via .values()"""
+
+    values = (
+        "id", "player_name", "rpg_system_id", "rpg_system__name", "rpg_system__logo_url",
+        "rpg_system__description", "rpg_system__is_active", "rpg_system__is_default",
+        "xp_total", "description", "avatar_url", "sheet_template_id", "sheet_overrides",
+        "sheet_version", "is_active", "created_at", "updated_at",
+        "user_id", "user__username", "user__email",
+    )
+
+    def to_representation(self, row):
+        rpg_system = None
+        if row["rpg_system_id"] is not None:
+            rpg_system = {
+                "slug": row["rpg_system_id"],
+                "name": row["rpg_system__name"],
+                "logo_url": row["rpg_system__logo_url"],
+                "description": row["rpg_system__description"],
+                "is_active": row["rpg_system__is_active"],
+                "is_default": row["rpg_system__is_default"],
+            }
+
+        template_id = row["sheet_template_id"]
+        template = get_sheet_template(template_id).data if template_id else {}
+
+        user_info = None
+        if row["user_id"] is not None:
+            user_info = {
+                'id': row["user_id"],
+                'username': row["user__username"],
+                'email': row["user__email"],
+            }
+
+        return {
+            "id": uuid_repr(row["id"]),
+            "player_name": row["player_name"],
+            "rpg_system": rpg_system,
+            "system_name": rpg_system["name"] if rpg_system else "Sistema não definido",
+            "xp_total": row["xp_total"],
+            "description": row["description"],
+            "avatar_url": row["avatar_url"],
+            # Só leitura: pode compartilhar objetos com o template em cache
+            "sheet_data": merge_sheet(template, row["sheet_overrides"], shared=True),
+            "sheet_version": row["sheet_version"],
+            "is_active": row["is_active"],
+            "created_at": datetime_repr(row["created_at"]),
+            "updated_at": datetime_repr(row["updated_at"]),
+            "user_info": user_info,
+        }
+
+
 class CharacterCreateSerializer(serializers.ModelSerializer):
     """Serializer específico para criação de personagens"""
     
@@ -101,9 +179,8 @@ class CharacterCreateSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         """
-        Cria personagem garantindo que o sheet_data venha do base_sheet_data
-        do rpg_system selecionado. O Character.save() cuida disso, mas forçamos
-        aqui também para garantir consistência mesmo sem passar pelo save().
+        Cria personagem no sistema selecionado (ou no padrão). O
+        Character.save() aponta a ficha para a versão atual do template.
         """
         rpg_system = validated_data.get('rpg_system')
 
@@ -113,10 +190,6 @@ class CharacterCreateSerializer(serializers.ModelSerializer):
             if rpg_system:
                 validated_data['rpg_system'] = rpg_system
 
-        # Sempre aplica o template do sistema ao criar
-        if rpg_system and rpg_system.base_sheet_data:
-            validated_data['sheet_data'] = rpg_system.base_sheet_data
-
         character = super().create(validated_data)
         return character
     
@@ -149,6 +222,7 @@ class CharacterCreateSerializer(serializers.ModelSerializer):
             "description": instance.description,
             "avatar_url": instance.avatar_url,
             "sheet_data": instance.sheet_data,
+            "sheet_version": instance.sheet_version,
             "is_active": instance.is_active,
             "created_at": instance.created_at,
             "updated_at": instance.updated_at,
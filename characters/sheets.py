@@ -0,0 +1,116 @@
+"""
+Fichas copy-on-write.
+
+O personagem guarda só uma referência para a versão do template
+(SheetTemplate) e um documento esparso com o que mudou em relação a ele.
+``merge_sheet`` monta a ficha completa; ``diff_sheet`` faz o caminho
+inverso. Dicionários são comparados recursivamente; listas e valores
+simples são substituídos inteiros. Chaves removidas do template ficam
+listadas em ``REMOVED_KEY`` no nível em que foram removidas.
+"""
+import copy
+import hashlib
+import json
+
+REMOVED_KEY = '$removed'
+
+
+def merge_sheet(base, overrides, shared=False):
+    """
+    Ficha completa: template + alterações (sem compartilhar objetos do
+    template). Com `shared=True` não copia nada: o resultado reaproveita
+    listas e dicts do template e das alterações e só pode ser lido.
+    """
+    clone = _identity if shared else copy.deepcopy
+    if not overrides:
+        return clone(base) if base else {}
+    if not isinstance(base, dict):
+        return clone(overrides)
+
+    removed = set(overrides.get(REMOVED_KEY, ()))
+    merged = {}
+    for key, value in base.items():
+        if key in removed:
+            continue
+        if key in overrides:
+            override = overrides[key]
+            if isinstance(value, dict) and isinstance(override, dict):
+                merged[key] = merge_sheet(value, override, shared)
+            else:
+                merged[key] = clone(override)
+        else:
+            merged[key] = clone(value)
+
+    for key, override in overrides.items():
+        if key != REMOVED_KEY and key not in base:
+            merged[key] = clone(override)
+    return merged
+
+
+def _identity(value):
+    return value
+
+
+def diff_sheet(base, sheet):
+    """Documento esparso com o que `sheet` tem de diferente de `base`"""
+    if not isinstance(base, dict) or not isinstance(sheet, dict):
+        return copy.deepcopy(sheet)
+
+    diff = {}
+    for key, value in sheet.items():
+        if key not in base:
+            diff[key] = copy.deepcopy(value)
+            continue
+        base_value = base[key]
+        if isinstance(value, dict) and isinstance(base_value, dict):
+            nested = diff_sheet(base_value, value)
+            if nested:
+                diff[key] = nested
+        elif not json_equal(value, base_value):
+            diff[key] = copy.deepcopy(value)
+
+    removed = sorted(key for key in base if key not in sheet)
+    if removed:
+        diff[REMOVED_KEY] = removed
+    return diff
+
+
+def sheet_value(base, overrides, path, default=None):
+    """Valor em `path` (lista de chaves) na ficha montada, sem montá-la inteira"""
+    for key in path:
+        if isinstance(overrides, dict) and key in overrides and key != REMOVED_KEY:
+            override = overrides[key]
+            base = base.get(key) if isinstance(base, dict) else None
+            if isinstance(override, dict) and isinstance(base, dict):
+                overrides = override
+            else:
+                base, overrides = override, None
+        elif isinstance(overrides, dict) and key in overrides.get(REMOVED_KEY, ()):
+            return default
+        elif isinstance(base, dict) and key in base:
+            base, overrides = base[key], None
+        else:
+            return default
+    if isinstance(overrides, dict) and overrides and isinstance(base, dict):
+        return merge_sheet(base, overrides)
+    return base
+
+
+def json_equal(a, b):
+    """Igualdade como em JSON (em Python 1 == True)"""
+    if type(a) is not type(b) and not (
+        isinstance(a, (int, float)) and isinstance(b, (int, float))
+        and not isinstance(a, bool) and not isinstance(b, bool)
+    ):
+        return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(json_equal(a[key], b[key]) for key in a)
+    if isinstance(a, list):
+        return len(a) == len(b) and all(json_equal(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def sheet_checksum(data):
+    """Hash estável do conteúdo de um template (identifica versões iguais)"""
+    encoded = json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
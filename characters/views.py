@@ -1,11 +1,31 @@
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from asgiref.sync import sync_to_async
+from core.conditional import ConditionalGetMixin
+from core.lean import LeanListMixin
+from core.renderers import UJSONParser
+from core.sparse import SparseFieldsViewMixin
+from .cache import get_current_template, get_system
+from .indexing import filter_by_sheet, index_values, indexed_paths, sync_sheet_index
+from .jsonpatch import (
+    JSONPatchParser,
+    PatchConflict,
+    PatchError,
+    apply_patch,
+    changed_values,
+    collapse_paths,
+    set_operations,
+)
+from .schema import validate_paths
 from .models import Character, RPGSystem
 from .serializers import (
     CharacterSerializer, 
     CharacterCreateSerializer,
+    CharacterLeanSerializer,
     RPGSystemSerializer, 
     RPGSystemListSerializer
 )
@@ -15,13 +35,15 @@ class IsOwner(permissions.BasePermission):
     """Permission para garantir que usuários só acessem seus próprios personagens"""
     
     def has_object_permission(self, request, view, obj):
-        return obj.user == request.user
+        return obj.user_id == request.user.id
 
 
-class RPGSystemViewSet(viewsets.ReadOnlyModelViewSet):
+class RPGSystemViewSet(ConditionalGetMixin, SparseFieldsViewMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet para consulta de sistemas de RPG"""
     
     permission_classes = [permissions.IsAuthenticated]
+    # Chave primária (slug do nome): única e em ordem quase alfabética
+    cursor_ordering = 'slug'
     
     def get_queryset(self):
         """Retorna apenas sistemas ativos"""
@@ -31,6 +53,12 @@ class RPGSystemViewSet(viewsets.ReadOnlyModelViewSet):
         if self.action == 'list':
             return RPGSystemListSerializer
         return RPGSystemSerializer
+
+    def get_validator_aggregates(self):
+        # character_count do detalhe
+        if self.action == 'retrieve':
+            return {'character_count': Count('characters', distinct=True)}
+        return {}
     
     @action(detail=False, methods=['get'])
     def default(self, request):
@@ -48,26 +76,38 @@ class RPGSystemViewSet(viewsets.ReadOnlyModelViewSet):
     def template(self, request, pk=None):
         """Retorna o template base da ficha para o sistema"""
         system = self.get_object()
+        template = get_current_template(system.slug)
         return Response({
             'system': system.name,
-            'base_sheet_data': system.base_sheet_data
+            'base_sheet_data': system.base_sheet_data,
+            'version': template.version if template else None,
+            'schema': template.schema if template else None,
         })
 
 
-class CharacterViewSet(viewsets.ModelViewSet):
+class CharacterViewSet(ConditionalGetMixin, SparseFieldsViewMixin, LeanListMixin, viewsets.ModelViewSet):
     """ViewSet para gerenciamento completo de personagens"""
     
     permission_classes = [permissions.IsAuthenticated, IsOwner]
+    lean_serializer_class = CharacterLeanSerializer
 
     def get_queryset(self):
         """Retorna apenas personagens do usuário autenticado"""
-        return Character.objects.filter(user=self.request.user).select_related('rpg_system').order_by('-created_at')
+        queryset = Character.objects.filter(user=self.request.user).select_related('rpg_system', 'user').order_by('-created_at')
+        if self.action == 'list':
+            # ?sheet.basic_info.level__gte=3 (caminhos em RPGSystem.indexed_paths)
+            queryset = filter_by_sheet(queryset, self.request.query_params)
+        return queryset
     
     def get_serializer_class(self):
         if self.action == 'create':
             return CharacterCreateSerializer
         return CharacterSerializer
 
+    def get_validator_aggregates(self):
+        # O sistema vem aninhado em cada personagem
+        return {'rpg_system_updated_at': Max('rpg_system__updated_at')}
+
     def perform_create(self, serializer):
         """Associa o personagem ao usuário autenticado"""
         serializer.save(user=self.request.user)
@@ -77,13 +117,106 @@ class CharacterViewSet(viewsets.ModelViewSet):
         self.perform_destroy(instance)
         return Response({"message": "Apagado com sucesso"}, status=200)
 
+    @action(detail=True, methods=['get', 'patch'], parser_classes=[JSONPatchParser, UJSONParser])
+    def sheet(self, request, pk=None):
+        """
+        GET: ficha completa e versão (também no ETag).
+        PATCH: altera a ficha com JSON Patch (RFC 6902) de forma atômica. O
+        corpo pode ser a lista de operações ou {"version", "operations"} /
+        {"version", "set": {"hp.current": 10}}. Se a versão (corpo ou
+        If-Match) não for a atual retorna 412. Responde só o que mudou,
+        incluindo os campos derivados recalculados.
+        """
+        character = self.get_object()
+        if request.method == 'GET':
+            # If-None-Match com a versão atual: 304 sem montar a ficha
+            etag = self._sheet_etag(character)
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                not_modified['ETag'] = etag
+                return not_modified
+            return self._sheet_response({
+                'version': character.sheet_version,
+                'sheet_data': character.sheet_data,
+            }, character)
+
+        body = request.data
+        expected = self._expected_sheet_version(request)
+        try:
+            if isinstance(body, list):
+                operations = body
+            elif isinstance(body, dict):
+                operations = list(body.get('operations') or [])
+                if 'set' in body:
+                    operations += set_operations(body['set'])
+            else:
+                raise PatchError('Corpo inválido')
+        except PatchError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            character = Character.objects.select_for_update().get(pk=character.pk)
+            if expected is not None and expected != character.sheet_version:
+                return self._sheet_response({
+                    'error': 'A ficha foi alterada por outra requisição',
+                    'version': character.sheet_version,
+                }, character, status.HTTP_412_PRECONDITION_FAILED)
+
+            sheet = character.sheet_data
+            try:
+                paths = apply_patch(sheet, operations)
+            except PatchConflict as e:
+                return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+            except PatchError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Campos derivados (CA, perícias...) que dependem do que mudou
+            paths = collapse_paths(paths + character.recompute_derived(paths))
+
+            errors = validate_paths(character.sheet_template_id, sheet, paths)
+            if errors:
+                return Response(
+                    {'error': 'Ficha inválida', 'errors': errors},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            if paths:
+                character.save(update_fields=['sheet_data', 'updated_at'])
+
+        return self._sheet_response({
+            'version': character.sheet_version,
+            'changes': changed_values(sheet, paths),
+        }, character)
+
+    def _expected_sheet_version(self, request):
+        """Versão esperada pelo cliente (If-Match ou "version" no corpo)"""
+        header = request.headers.get('If-Match', '').strip()
+        if header and header != '*':
+            value = header.removeprefix('W/').strip('"')
+        elif isinstance(request.data, dict):
+            value = request.data.get('version')
+        else:
+            value = None
+        try:
+            return int(value) if value is not None else None
+        except (TypeError, ValueError):
+            return -1  # nunca bate: o cliente recebe 412 com a versão atual
+
+    def _sheet_response(self, data, character, status_code=status.HTTP_200_OK):
+        response = Response(data, status=status_code)
+        response['ETag'] = self._sheet_etag(character)
+        return response
+
+    def _sheet_etag(self, character):
+        return f'"{character.sheet_version}"'
+
     @action(detail=True, methods=['post'])
     def reset_sheet(self, request, pk=None):
         """Reseta a ficha do personagem para o template do sistema"""
         character = self.get_object()
         
         if character.rpg_system and character.rpg_system.base_sheet_data:
-            character.sheet_data = character.rpg_system.base_sheet_data
+            character.apply_template()
             character.save()
             
             serializer = self.get_serializer(character)
@@ -105,9 +238,8 @@ class CharacterViewSet(viewsets.ModelViewSet):
         system_id = request.data.get('rpg_system_id')
         apply_template = request.data.get('apply_template', False)
         
-        try:
-            new_system = RPGSystem.objects.get(id=system_id, is_active=True)
-        except RPGSystem.DoesNotExist:
+        new_system = get_system(system_id)
+        if new_system is None:
             return Response(
                 {'error': 'Sistema de RPG não encontrado ou não ativo'}, 
                 status=status.HTTP_404_NOT_FOUND
@@ -117,9 +249,15 @@ class CharacterViewSet(viewsets.ModelViewSet):
         
         # Aplica o template se solicitado
         if apply_template and new_system.base_sheet_data:
-            character.sheet_data = new_system.base_sheet_data
+            character.apply_template(new_system)
         
         character.save()
+
+        if not apply_template:
+            # Mesma ficha, mas os caminhos indexados agora são os do novo sistema
+            sync_sheet_index({
+                character.pk: index_values(character.sheet_data, indexed_paths(new_system.slug))
+            })
         
         serializer = self.get_serializer(character)
         return Response({
@@ -0,0 +1,106 @@
+"""
+Compressão das respostas HTTP (brotli ou gzip, negociada pelo Accept-Encoding).
+
+Respostas menores que ``COMPRESSION_MIN_SIZE`` bytes saem sem compressão
+(o ganho não paga a CPU). Streaming (exportações) é comprimido em pedaços,
+sem juntar a resposta. O brotli só é usado se o pacote estiver instalado;
+senão tudo sai em gzip, como no GZipMiddleware do Django (inclusive os
+bytes aleatórios contra BREACH).
+"""
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_BROTLI_QUALITY = 5  # 11 (padrão do brotli) é lento demais por requisição
+
+
+def accepted_encodings(header):
+    """{codificação: q} do Accept-Encoding (q=0 fica de fora)"""
+    encodings = {}
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            encodings[name] = quality
+    return encodings
+
+
+def preferred_encoding(header):
+    """'br', 'gzip' ou None, pela preferência do cliente (br no empate)"""
+    encodings = accepted_encodings(header)
+    available = ['br', 'gzip'] if brotli is not None else ['gzip']
+    wildcard = encodings.get('*', 0)
+    best, best_quality = None, 0
+    for name in available:
+        quality = encodings.get(name, wildcard)
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def _brotli_sequence(sequence, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for chunk in sequence:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """GZipMiddleware com tamanho mínimo configurável e brotli opcional"""
+
+    def process_response(self, request, response):
+        min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', DEFAULT_MIN_SIZE)
+        if not response.streaming and len(response.content) < min_size:
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = preferred_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None or (response.streaming and response.is_async):
+            return response
+
+        quality = getattr(settings, 'COMPRESSION_BROTLI_QUALITY', DEFAULT_BROTLI_QUALITY)
+        if response.streaming:
+            if encoding == 'br':
+                response.streaming_content = _brotli_sequence(response.streaming_content, quality)
+            else:
+                response.streaming_content = compress_sequence(
+                    response.streaming_content, max_random_bytes=self.max_random_bytes
+                )
+            del response.headers['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed = brotli.compress(response.content, quality=quality)
+            else:
+                compressed = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # ETag forte vira fraco (o corpo comprimido não é o mesmo)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,134 @@
+"""
+Requisições condicionais (ETag / Last-Modified / 304) nas leituras.
+
+Os validadores vêm de um único aggregate (quantidade de linhas + maior
+``updated_at``, mais os agregados extras da view) sobre a mesma query da
+resposta, calculado antes de buscar e serializar os objetos. Se o
+If-None-Match/If-Modified-Since do cliente ainda vale, responde 304 sem
+corpo. O ETag também leva o usuário, a URL completa (filtros, página,
+?fields) e o formato da resposta, que mudam o conteúdo.
+
+Listagens só mandam ETag: remover uma linha antiga não muda o maior
+``updated_at``, só a quantidade, então Last-Modified sozinho daria 304 errado.
+Nas paginadas o aggregate cobre só a página pedida (os ids dela, mais os
+links e o total do paginador), depois da paginação e antes da serialização:
+um aggregate sobre a listagem inteira custaria um scan completo a cada
+requisição e anularia a paginação por cursor.
+
+O queryset da view já deve estar restrito ao que o usuário pode ver: o 304
+do detalhe sai antes das permissões de objeto.
+"""
+import hashlib
+from calendar import timegm
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+class PageNotModified(Exception):
+    """Página ainda válida para o cliente: interrompe o list() com o 304"""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """list()/retrieve() com ETag e Last-Modified e respostas 304"""
+    last_modified_field = 'updated_at'
+    _validating_page = False
+    _page_etag = None
+
+    def get_validator_aggregates(self):
+        """Agregados extras que mudam a resposta (ex: Max de uma relação)"""
+        return {}
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator is None:
+            queryset = self.filter_queryset(self.get_queryset())
+            return self.conditional_response(
+                queryset, super().list, request, *args, last_modified=False, **kwargs
+            )
+
+        # Paginada: o ETag sai da página em paginate_queryset()
+        self._validating_page, self._page_etag = True, None
+        try:
+            response = super().list(request, *args, **kwargs)
+        except PageNotModified as not_modified:
+            response = not_modified.response
+        finally:
+            self._validating_page = False
+        if self._page_etag is None or response.status_code not in (200, 304):
+            return response
+        response['ETag'] = self._page_etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is None or not self._validating_page:
+            return page
+
+        # Linhas do LeanListMixin são dicts de .values(); os ids já vêm da
+        # query restrita ao usuário, então basta buscá-los pela chave primária
+        pks = [row['id'] if isinstance(row, dict) else row.pk for row in page]
+        paginator = self.paginator
+        total = getattr(getattr(paginator, 'page', None), 'paginator', None)
+        self._page_etag, _ = self.get_validators(
+            self.get_queryset().model._default_manager.filter(pk__in=pks),
+            (pks, paginator.get_next_link(), paginator.get_previous_link(), total and total.count),
+        )
+        response = get_conditional_response(self.request, etag=self._page_etag)
+        if response is not None:
+            raise PageNotModified(response)
+        return page
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except (TypeError, ValueError, ValidationError):
+            # Lookup inválido: o get_object() responde 404
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(queryset, super().retrieve, request, *args, **kwargs)
+
+    def conditional_response(self, queryset, handler, request, *args, last_modified=True, **kwargs):
+        etag, modified = self.get_validators(queryset)
+        timestamp = timegm(modified.utctimetuple()) if modified and last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        # O navegador sempre revalida (sem servir cópia velha por heurística)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def get_validators(self, queryset, extra=()):
+        """(ETag, último updated_at) da query, sem carregar os objetos"""
+        values = queryset.order_by().aggregate(
+            validator_count=Count('pk', distinct=True),
+            validator_last_modified=Max(self.last_modified_field),
+            **self.get_validator_aggregates(),
+        )
+        dates = [value for value in values.values() if hasattr(value, 'utctimetuple')]
+        last_modified = max(dates) if dates else None
+
+        request = self.request
+        key = repr((
+            request.user.pk,
+            request.get_full_path(),
+            getattr(request, 'accepted_media_type', None),
+            sorted(values.items()),
+            extra,
+        ))
+        digest = hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+        return f'W/"{digest}"', last_modified
@@ -0,0 +1,74 @@
+"""
+Serialização enxuta (só leitura) para as listagens.
+
+Os ModelSerializer do DRF instanciam e percorrem um Field por atributo de
+cada objeto, o que domina o tempo das listas grandes. Um LeanSerializer lê
+só as colunas necessárias com ``.values()`` (sem montar instâncias dos
+models) e monta os dicts direto, com a mesma saída (chaves, ordem e
+formatos) do serializer que substitui. Escrita, detalhe e formulários
+continuam com os ModelSerializer.
+
+Desligável com ``LEAN_LIST_SERIALIZERS = False`` nos settings.
+"""
+from django.conf import settings
+from rest_framework import serializers
+from rest_framework.response import Response
+
+_datetime_field = serializers.DateTimeField()
+
+
+def datetime_repr(value):
+    """Data/hora no formato do DateTimeField do DRF (fuso atual, ISO 8601)"""
+    return _datetime_field.to_representation(value) if value is not None else None
+
+
+def uuid_repr(value):
+    return str(value) if value is not None else None
+
+
+class LeanSerializer:
+    """
+    Base dos serializers enxutos: `values` são os lookups lidos do banco e
+    `to_representation(row)` monta o dict de cada linha.
+    """
+    values = ()
+
+    def __init__(self, rows, context=None):
+        self.rows = rows
+        self.context = context or {}
+
+    @classmethod
+    def get_rows(cls, queryset):
+        return queryset.values(*cls.values)
+
+    def to_representation(self, row):
+        raise NotImplementedError
+
+    @property
+    def data(self):
+        to_representation = self.to_representation
+        return [to_representation(row) for row in self.rows]
+
+
+class LeanListMixin:
+    """list() com o `lean_serializer_class` da view, quando definido"""
+    lean_serializer_class = None
+
+    def get_lean_serializer(self, rows):
+        return self.lean_serializer_class(rows, context=self.get_serializer_context())
+
+    def uses_lean_list(self):
+        return self.lean_serializer_class is not None and getattr(
+            settings, 'LEAN_LIST_SERIALIZERS', True
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not self.uses_lean_list():
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = self.lean_serializer_class.get_rows(queryset)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.get_lean_serializer(page).data)
+        return Response(self.get_lean_serializer(rows).data)
@@ -0,0 +1,85 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Paginação por cursor (keyset) em created_at: a página N custa o mesmo
+    que a primeira, sem COUNT(*) nem OFFSET
+    """
+    ordering = '-created_at'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class OptionalCursorPagination(PageNumberPagination):
+    """
+    Paginação padrão do projeto.
+
+    Continua usando ?page=N, mas com ?pagination=cursor (ou ao seguir um link
+    com ?cursor=) passa para a paginação por keyset. A ordenação do cursor
+    vem do atributo `cursor_ordering` da view (padrão: -created_at) e deve
+    ser coberta por um índice composto com o filtro principal da listagem.
+    """
+    cursor_query_param = 'cursor'
+    cursor_page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def __init__(self):
+        self.cursor_paginator = None
+
+    def wants_cursor(self, request):
+        return (
+            request.query_params.get('pagination') == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.wants_cursor(request):
+            self.cursor_paginator = None
+            return super().paginate_queryset(queryset, request, view)
+
+        self.cursor_paginator = CursorPagination()
+        self.cursor_paginator.page_size = self.page_size
+        self.cursor_paginator.page_size_query_param = self.cursor_page_size_query_param
+        self.cursor_paginator.max_page_size = self.max_page_size
+        self.cursor_paginator.ordering = getattr(view, 'cursor_ordering', '-created_at')
+        return self.cursor_paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_next_link(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_next_link()
+        return super().get_next_link()
+
+    def get_previous_link(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_previous_link()
+        return super().get_previous_link()
+
+    def get_html_context(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_html_context()
+        return super().get_html_context()
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters.append({
+            'name': 'pagination',
+            'required': False,
+            'in': 'query',
+            'description': 'Use "cursor" para paginação por keyset',
+            'schema': {'type': 'string', 'enum': ['cursor']},
+        })
+        parameters.append({
+            'name': self.cursor_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Cursor retornado em next/previous',
+            'schema': {'type': 'string'},
+        })
+        return parameters
@@ -0,0 +1,93 @@
+"""
+JSON rápido (ujson) para o DRF e para os WebSockets.
+
+UJSONRenderer/UJSONParser produzem e aceitam o mesmo JSON que os do DRF
+(compacto, UTF-8, sem NaN), usando o encoder do DRF só para os tipos que o
+ujson não conhece (UUID, datetime, QuerySet...). A saída é idêntica byte a
+byte, exceto pelo expoente de floats pequenos: o ujson escreve 1e-7 onde o
+json da biblioteca padrão escreve 1e-07 (o valor lido é o mesmo). Qualquer caso que o ujson
+não trate igual (indentação pedida pelo cliente, inteiros enormes, NaN) cai
+no JSONRenderer/JSONParser padrão. Sem o ujson instalado, tudo usa o json
+da biblioteca padrão.
+"""
+import json
+
+from django.conf import settings
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders, json as drf_json
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover
+    ujson = None
+
+_encoder = encoders.JSONEncoder()
+
+# Literais que o ujson aceita na leitura, mas o DRF (STRICT_JSON) rejeita
+_STRICT_CONSTANTS = (b'NaN', b'Infinity')
+
+
+def dumps(data):
+    """Serializa para texto JSON compacto (como o JSONRenderer do DRF)"""
+    text = None
+    if ujson is not None:
+        try:
+            text = ujson.dumps(
+                data,
+                ensure_ascii=False,
+                escape_forward_slashes=False,
+                allow_nan=False,
+                default=_encoder.default,
+            )
+        except (OverflowError, TypeError, ValueError):
+            pass
+    if text is None:
+        text = json.dumps(
+            data,
+            cls=encoders.JSONEncoder,
+            ensure_ascii=False,
+            separators=(',', ':'),
+            allow_nan=not api_settings.STRICT_JSON,
+        )
+    # Separadores de linha do Unicode não são válidos em JavaScript (como no DRF)
+    return text.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+
+
+def loads(text):
+    """Lê texto/bytes JSON; levanta ValueError se for inválido"""
+    if ujson is not None:
+        raw = text.encode('utf-8') if isinstance(text, str) else text
+        if not any(constant in raw for constant in _STRICT_CONSTANTS):
+            try:
+                return ujson.loads(raw)
+            except (OverflowError, ValueError):
+                pass
+    return drf_json.loads(text) if api_settings.STRICT_JSON else json.loads(text)
+
+
+class UJSONRenderer(renderers.JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # Indentação (?indent / Accept: ...; indent=4) fica com o renderer padrão
+        if ujson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data).encode('utf-8')
+
+
+class UJSONParser(JSONParser):
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        raw = stream.read() if stream is not None else b''
+        if encoding.lower().replace('-', '') != 'utf8':
+            raw = raw.decode(encoding)
+        try:
+            return loads(raw)
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,298 @@
+"""
+Seleção de campos nas respostas (GET): ?fields=, ?exclude= e ?expand=.
+
+- ``?fields=id,name`` devolve só esses campos e ``?exclude=sheet_data`` tira
+  campos; campos aninhados usam ponto (``?fields=id,invites.code``).
+- ``?expand=master`` troca o id de uma relação pelo objeto (campos
+  declarados em ``Meta.expandable_fields`` do serializer).
+
+Caminhos que o serializer não tem (ou subcampos de um campo que não é
+serializer, como ``?fields=sheet_data.x`` num JSONField) respondem 400.
+
+A view (SparseFieldsViewMixin) também enxuga a query: adia (defer) as
+colunas que só os campos fora da resposta usam e descarta os
+select_related/prefetch_related deles. Campos calculados (métodos,
+properties) declaram o que leem em ``Meta.field_sources``; se algum campo da
+resposta não declara, a query não é alterada.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+EXCLUDE_PARAM = 'exclude'
+EXPAND_PARAM = 'expand'
+
+
+def parse_field_list(value):
+    """'id,invites.code' -> {'id': {}, 'invites': {'code': {}}}"""
+    tree = {}
+    for item in (value or '').split(','):
+        node = tree
+        for name in filter(None, item.strip().split('.')):
+            node = node.setdefault(name, {})
+    return tree
+
+
+def _dotted(tree, prefix=''):
+    """{'a': {'b': {}}} -> ['a.b']"""
+    paths = []
+    for name, children in tree.items():
+        path = prefix + name
+        paths.extend(_dotted(children, path + '.') if children else [path])
+    return paths
+
+
+def invalid_paths(serializer, tree, expand=False, prefix=''):
+    """
+    Caminhos de `tree` que o serializer não atende: campos que não existem
+    (ou não são expansíveis, com expand=True) e subcampos de campos que não
+    são serializers com seleção de campos
+    """
+    invalid = []
+    fields = serializer.fields
+    expandable = getattr(getattr(serializer, 'Meta', None), 'expandable_fields', {})
+    for name, children in tree.items():
+        path = prefix + name
+        if name not in fields or (expand and name not in expandable):
+            invalid.extend(_dotted({name: children}, prefix))
+            continue
+        if not children:
+            continue
+        child = getattr(fields[name], 'child', fields[name])
+        if isinstance(child, SparseFieldsMixin):
+            invalid.extend(invalid_paths(child, children, expand, path + '.'))
+        else:
+            invalid.extend(_dotted(children, path + '.'))
+    return invalid
+
+
+class SparseFieldsMixin:
+    """Serializer com seleção de campos (fields/exclude/expand em árvores)"""
+
+    def __init__(self, *args, fields=None, exclude=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sparse_fields = fields
+        self.sparse_exclude = exclude or {}
+        self.sparse_expand = expand or {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        for name in self.sparse_expand:
+            if name in expandable:
+                serializer_class, options = expandable[name]
+                if isinstance(serializer_class, str):
+                    serializer_class = import_string(serializer_class)
+                fields[name] = serializer_class(read_only=True, **options)
+
+        if self.sparse_fields:
+            fields = {name: field for name, field in fields.items() if name in self.sparse_fields}
+        for name, nested in self.sparse_exclude.items():
+            if not nested:
+                fields.pop(name, None)
+
+        # Repassa os caminhos com ponto para os serializers aninhados
+        for name, field in fields.items():
+            child = getattr(field, 'child', field)
+            if isinstance(child, SparseFieldsMixin):
+                child.sparse_fields = (self.sparse_fields or {}).get(name) or None
+                child.sparse_exclude = self.sparse_exclude.get(name, {})
+                child.sparse_expand = self.sparse_expand.get(name, {})
+        return fields
+
+
+class SparseFieldsViewMixin:
+    """Aplica ?fields/?exclude/?expand ao serializer e à query das leituras"""
+
+    def get_field_selection(self):
+        """Árvores de fields/exclude/expand do request; None se não houver"""
+        if not hasattr(self, '_field_selection'):
+            self._field_selection = None
+            request = self.request
+            if request is not None and request.method in SAFE_METHODS:
+                params = request.query_params
+                selection = {
+                    'fields': parse_field_list(params.get(FIELDS_PARAM)) or None,
+                    'exclude': parse_field_list(params.get(EXCLUDE_PARAM)),
+                    'expand': parse_field_list(params.get(EXPAND_PARAM)),
+                }
+                if any(selection.values()):
+                    self.check_field_selection(selection)
+                    self._field_selection = selection
+        return self._field_selection
+
+    def check_field_selection(self, selection):
+        """ValidationError (400) com os caminhos que o serializer não atende"""
+        serializer_class = self.get_serializer_class()
+        if not issubclass(serializer_class, SparseFieldsMixin):
+            return
+        # Com as expansões pedidas, para validar os caminhos dentro delas
+        serializer = serializer_class(
+            expand=selection['expand'], context=self.get_serializer_context()
+        )
+        errors = {}
+        for param, tree, expand in (
+            (FIELDS_PARAM, selection['fields'] or {}, False),
+            (EXCLUDE_PARAM, selection['exclude'], False),
+            (EXPAND_PARAM, selection['expand'], True),
+        ):
+            invalid = invalid_paths(serializer, tree, expand)
+            if invalid:
+                errors[param] = f"Campos inválidos: {', '.join(invalid)}."
+        if errors:
+            raise ValidationError(errors)
+
+    def uses_lean_list(self):
+        # Respostas parciais saem pelo serializer completo (com a query enxuta)
+        return self.get_field_selection() is None and super().uses_lean_list()
+
+    def get_serializer(self, *args, **kwargs):
+        selection = self.get_field_selection()
+        if selection and issubclass(self.get_serializer_class(), SparseFieldsMixin):
+            kwargs.update(selection)
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        selection = self.get_field_selection()
+        serializer_class = self.get_serializer_class()
+        if selection and issubclass(serializer_class, SparseFieldsMixin):
+            ordering = getattr(self, 'cursor_ordering', '-created_at')
+            queryset = narrow_queryset(
+                queryset, serializer_class(**selection), keep=[ordering.lstrip('-')]
+            )
+        return queryset
+
+
+def narrow_queryset(queryset, serializer, keep=()):
+    """
+    Adia as colunas e descarta os joins/prefetches que `serializer` (já com a
+    seleção aplicada) não usa. `keep` são caminhos que continuam carregados.
+    """
+    model = queryset.model
+    queryset = _join_expanded(queryset, serializer)
+    used = set()
+    for path in keep:
+        _use(used, path.split('__'))
+    for path in queryset.query.order_by or model._meta.ordering:
+        if isinstance(path, str):
+            _use(used, path.lstrip('-').split('__'))
+    if not _collect(serializer, model, (), used):
+        return queryset
+
+    deferred = _unused_columns(model, (), used)
+    select_related = queryset.query.select_related
+    if isinstance(select_related, dict):
+        kept = [path for path in _paths(select_related) if path in used]
+        queryset = queryset.select_related(None)
+        if kept:
+            queryset = queryset.select_related(*kept)
+        for path in kept:
+            if path + '__*' not in used:
+                related = _related_model(model, path)
+                deferred += _unused_columns(related, tuple(path.split('__')), used)
+
+    lookups = queryset._prefetch_related_lookups
+    if lookups:
+        kept = [lookup for lookup in lookups if _prefetch_root(lookup) in used]
+        queryset = queryset.prefetch_related(None)
+        if kept:
+            queryset = queryset.prefetch_related(*kept)
+
+    return queryset.defer(*deferred) if deferred else queryset
+
+
+def _join_expanded(queryset, serializer):
+    """select_related/prefetch_related das relações pedidas em ?expand="""
+    expandable = getattr(serializer.Meta, 'expandable_fields', {})
+    for name in serializer.sparse_expand:
+        if name not in expandable:
+            continue
+        source = expandable[name][1].get('source', name)
+        try:
+            field = queryset.model._meta.get_field(source)
+        except FieldDoesNotExist:
+            continue
+        if field.many_to_one or field.one_to_one:
+            queryset = queryset.select_related(source)
+        elif field.is_relation:
+            queryset = queryset.prefetch_related(source)
+    return queryset
+
+
+def _use(used, parts):
+    for size in range(1, len(parts) + 1):
+        used.add('__'.join(parts[:size]))
+
+
+def _field_sources(serializer, name, field, model):
+    """Caminhos (tuplas) lidos por um campo; None se não dá para saber"""
+    declared = getattr(getattr(serializer, 'Meta', None), 'field_sources', {})
+    if name in declared:
+        return [tuple(source.split('.')) for source in declared[name]]
+    if field.source == '*':
+        return None
+    parts = tuple(field.source.split('.'))
+    try:
+        model._meta.get_field(parts[0])
+    except FieldDoesNotExist:
+        return None  # property ou método do model
+    return [parts]
+
+
+def _collect(serializer, model, prefix, used):
+    """Marca em `used` os caminhos lidos pelos campos do serializer"""
+    for name, field in serializer.fields.items():
+        sources = _field_sources(serializer, name, field, model)
+        if sources is None:
+            return False
+        for source in sources:
+            _use(used, list(prefix + source))
+
+        child = getattr(field, 'child', field)
+        if isinstance(child, serializers.Serializer) and len(sources) == 1:
+            path = prefix + sources[0]
+            related = _related_model(model, '__'.join(sources[0]))
+            if related is None or not _collect(child, related, path, used):
+                used.add('__'.join(path) + '__*')
+    return True
+
+
+def _unused_columns(model, prefix, used):
+    """Colunas simples (não pk, não relação) do model fora de `used`"""
+    columns = []
+    for field in model._meta.concrete_fields:
+        if field.primary_key or field.is_relation:
+            continue
+        path = '__'.join(prefix + (field.name,))
+        if path not in used:
+            columns.append(path)
+    return columns
+
+
+def _related_model(model, path):
+    for name in path.split('__'):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if not field.is_relation:
+            return None
+        model = field.related_model
+    return model
+
+
+def _paths(tree, prefix=''):
+    for name, children in tree.items():
+        path = prefix + name
+        yield path
+        yield from _paths(children, path + '__')
+
+
+def _prefetch_root(lookup):
+    path = lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+    return path.split('__')[0]
@@ -0,0 +1,103 @@
+"""
+JSON por streaming para exportações grandes.
+
+``stream_json`` gera o JSON de um objeto em pedaços de bytes. Listas
+grandes entram como ``RowStream`` (linhas de um queryset + função que monta
+cada item), lidas do banco em blocos com ``iterator(chunk_size=...)`` (cursor
+no servidor no PostgreSQL): nem as linhas nem o documento inteiro ficam em
+memória. O formato é o mesmo do renderer da API (core.renderers.dumps).
+
+No ASGI o Django 4.2 consome um iterador síncrono inteiro antes de enviar
+(avisando que vai bufferizar). Com o `request` da view a resposta detecta o
+ASGI e usa um iterador assíncrono que busca cada bloco numa thread
+(sync_to_async), então o streaming vale nos dois servidores.
+"""
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+from .renderers import dumps
+
+CHUNK_SIZE = 1000
+BUFFER_SIZE = 64 * 1024
+
+
+class RowStream:
+    """Lista JSON lida do banco sob demanda"""
+
+    def __init__(self, rows, to_representation, chunk_size=CHUNK_SIZE):
+        self.rows = rows
+        self.to_representation = to_representation
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        for row in self.rows.iterator(chunk_size=self.chunk_size):
+            yield self.to_representation(row)
+
+
+def iter_json(value):
+    """Pedaços de texto JSON de `value` (dicts podem ter RowStream nos valores)"""
+    if isinstance(value, dict):
+        yield '{'
+        for index, (key, item) in enumerate(value.items()):
+            yield f'{"," if index else ""}{dumps(str(key))}:'
+            yield from iter_json(item)
+        yield '}'
+    elif isinstance(value, RowStream):
+        yield '['
+        for index, item in enumerate(value):
+            yield f'{"," if index else ""}{dumps(item)}'
+        yield ']'
+    else:
+        yield dumps(value)
+
+
+def stream_json(value, buffer_size=BUFFER_SIZE):
+    """Bytes do JSON de `value`, em blocos de ~buffer_size"""
+    buffer, size = [], 0
+    for part in iter_json(value):
+        buffer.append(part)
+        size += len(part)
+        if size >= buffer_size:
+            yield ''.join(buffer).encode('utf-8')
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+async def iter_async(iterator):
+    """
+    Iterador síncrono consumido bloco a bloco numa thread: o ORM não roda no
+    event loop, e thread_sensitive mantém o cursor na mesma conexão
+    """
+    next_part = sync_to_async(next, thread_sensitive=True)
+    try:
+        while True:
+            part = await next_part(iterator, None)
+            if part is None:
+                return
+            yield part
+    finally:
+        # Cliente desconectou no meio: fecha o gerador (e o cursor do banco)
+        await sync_to_async(iterator.close, thread_sensitive=True)()
+
+
+def is_asgi(request):
+    """True se o request (do Django ou do DRF) veio pelo handler ASGI"""
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    """
+    Resposta JSON gerada sob demanda; `filename` vira anexo para download.
+    Passe o `request` para o streaming valer também no ASGI
+    """
+
+    def __init__(self, value, filename=None, request=None, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        content = stream_json(value)
+        if request is not None and is_asgi(request):
+            content = iter_async(content)
+        super().__init__(content, **kwargs)
+        if filename:
+            self['Content-Disposition'] = f'attachment; filename="{filename}"'
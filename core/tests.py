@@ -0,0 +1,209 @@
+import datetime
+import decimal
+import json
+import uuid
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+
+from characters.models import Character
+from core.renderers import UJSONRenderer
+from characters.serializers import CharacterLeanSerializer, CharacterSerializer
+from items.models import Item
+from items.serializers import ItemLeanSerializer, ItemSerializer
+from maps.models import MapToken, SessionMap
+from maps.serializers import (
+    MapTokenLeanSerializer,
+    MapTokenSerializer,
+    SessionMapLeanSerializer,
+    SessionMapSerializer,
+)
+from session.models import Session, SessionEvent, SessionMember, SessionNote
+from session.serializers import (
+    NoteLeanSerializer,
+    NoteSerializer,
+    SessionEventLeanSerializer,
+    SessionEventSerializer,
+)
+
+
+class LeanSerializerParityTest(TestCase):
+    """
+    Cada LeanSerializer (core/lean.py) tem de produzir exatamente o JSON do
+    ModelSerializer que substitui: mesmas chaves, ordem e formatos
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('populate_rpg_systems', stdout=StringIO())
+        cls.user = User.objects.create_user(
+            'mestre', email='mestre@x.com', first_name='Ana', last_name='Çá'
+        )
+        cls.session = Session.objects.create(name='Mesa', master=cls.user)
+        SessionMember.objects.create(session=cls.session, user=cls.user, role='MASTER')
+
+        for index in range(3):
+            character = Character.objects.create(
+                user=cls.user, player_name=f'Personagem {index}',
+                description=None if index % 2 else 'Descrição',
+            )
+            Item.objects.create(
+                session=cls.session, name='Poção', category='consumível',
+                durability_current=1.5, durability_max=10, rarity='rara',
+                effects={'cura': [1, 2]} if index % 2 else None,
+            )
+            session_map = SessionMap.objects.create(
+                session=cls.session, name=f'Mapa {index}',
+                width=None if index % 2 else 1000, height=800, fog_enabled=bool(index % 2),
+            )
+            MapToken.objects.create(
+                map=session_map, name=f'Token {index}', x=10.5 * index, y=20,
+                character=character if index % 2 else None, is_hidden=bool(index % 2),
+            )
+            SessionNote.objects.create(
+                session=cls.session, user=cls.user, title=f'Nota {index}', content='Conteúdo',
+            )
+            SessionEvent.objects.create(
+                session=cls.session, user=cls.user if index % 2 else None,
+                room_code='sala', action='roll', payload={'total': index, 'dados': [index]},
+            )
+        # Personagem sem sistema
+        character = Character.objects.create(user=cls.user, player_name='Sem sistema')
+        Character.objects.filter(pk=character.pk).update(rpg_system=None)
+
+    def setUp(self):
+        request = APIRequestFactory().get('/')
+        request.user = self.user
+        self.context = {'request': request}
+
+    def assertParity(self, serializer_class, lean_serializer_class, queryset):
+        renderer = JSONRenderer()
+        expected = renderer.render(serializer_class(queryset, many=True, context=self.context).data)
+        lean = lean_serializer_class(lean_serializer_class.get_rows(queryset), context=self.context)
+        self.assertTrue(queryset.exists())
+        self.assertEqual(renderer.render(lean.data), expected)
+
+    def test_characters(self):
+        self.assertParity(
+            CharacterSerializer, CharacterLeanSerializer,
+            Character.objects.select_related('rpg_system', 'user').order_by('created_at'),
+        )
+
+    def test_items(self):
+        self.assertParity(ItemSerializer, ItemLeanSerializer, Item.objects.order_by('id'))
+
+    def test_maps(self):
+        self.assertParity(
+            SessionMapSerializer, SessionMapLeanSerializer, SessionMap.objects.order_by('created_at')
+        )
+
+    def test_map_tokens(self):
+        self.assertParity(MapTokenSerializer, MapTokenLeanSerializer, MapToken.objects.order_by('created_at'))
+
+    def test_notes(self):
+        self.assertParity(NoteSerializer, NoteLeanSerializer, SessionNote.objects.order_by('created_at'))
+
+    def test_session_events(self):
+        self.assertParity(
+            SessionEventSerializer, SessionEventLeanSerializer, SessionEvent.objects.order_by('created_at')
+        )
+
+
+class ConditionalListTest(TestCase):
+    """Listagens paginadas: ETag da página pedida, 304 enquanto ela não muda"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('mestre')
+        self.session = Session.objects.create(master=self.user, name='Mesa')
+        SessionMember.objects.create(session=self.session, user=self.user, role='MASTER')
+        self.notes = [
+            SessionNote.objects.create(session=self.session, user=self.user, title=f'Nota {i}')
+            for i in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_revalidates(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        note = self.notes[0]
+        note.title = 'Editada'
+        note.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        SessionNote.objects.create(session=self.session, user=self.user, title='Nova')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_page_number(self):
+        self.assert_revalidates('/api/v1/session/notes/?page=1')
+
+    def test_cursor(self):
+        self.assert_revalidates('/api/v1/session/notes/?pagination=cursor')
+
+
+class UJSONRendererParityTest(TestCase):
+    """UJSONRenderer igual ao JSONRenderer do DRF, salvo a grafia dos floats"""
+
+    def assert_same_bytes(self, data):
+        self.assertEqual(UJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_bytes_match(self):
+        self.assert_same_bytes({
+            'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'created_at': datetime.datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=datetime.timezone.utc),
+            'day': datetime.date(2026, 1, 2),
+            'price': decimal.Decimal('1.50'),
+            'big': 2 ** 70,
+            'nested': {'list': [1, 'dois', None, True, (3, 4)], 'empty': {}},
+            'text': 'ção / <b>&</b> "aspas" \\ \n \u2028 \u2029 🎲',
+        })
+
+    def test_floats_parse_equal(self):
+        floats = [0.0, -0.0, 0.1, 1.5, 1 / 3, 100.0, 1e-7, 2.5e-300, 1e16, 1e22, 123456789.123]
+        ujson_bytes = UJSONRenderer().render(floats)
+        self.assertEqual(json.loads(ujson_bytes), json.loads(JSONRenderer().render(floats)))
+        # A única diferença conhecida: expoente sem zero à esquerda
+        self.assertIn(b'1e-7', ujson_bytes)
+
+
+class SparseFieldsValidationTest(TestCase):
+    """?fields/?exclude/?expand com caminhos que o serializer não atende: 400"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('mestre')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_status(self, query, status_code):
+        response = self.client.get(f'/api/v1/session/sessions/?{query}')
+        self.assertEqual(response.status_code, status_code, response.content)
+        return response
+
+    def test_valid_paths(self):
+        self.assert_status('fields=id,invites.code', 200)
+        self.assert_status('expand=master&fields=id,master.username', 200)
+        self.assert_status('exclude=description', 200)
+
+    def test_invalid_paths(self):
+        response = self.assert_status('fields=id,nome', 400)
+        self.assertIn('nome', response.json()['fields'])
+        self.assert_status('fields=id,invites.nope', 400)
+        self.assert_status('exclude=name.first', 400)
+        self.assert_status('expand=name', 400)
+        # Sem ?expand o mestre é só o id: não tem subcampos
+        self.assert_status('fields=id,master.username', 400)
+
+    def test_json_subpath(self):
+        response = self.client.get('/api/v1/core/characters/?fields=id,sheet_data.basic_info')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('sheet_data.basic_info', response.json()['fields'])
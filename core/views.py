@@ -3,14 +3,16 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.contrib.auth.models import User
 from .serializers import UserSerializer
+from .sparse import SparseFieldsViewMixin
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     """ViewSet para gerenciamento de perfil do usuário"""
     
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cursor_ordering = '-date_joined'
     
     def get_queryset(self):
         """Retorna apenas o usuário autenticado"""
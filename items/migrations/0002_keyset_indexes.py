@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 07:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['session', 'name'], name='items_item_session_dd38c6_idx'),
+        ),
+    ]
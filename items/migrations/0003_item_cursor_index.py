@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 08:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('items', '0002_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['session', 'id'], name='items_item_session_54c887_idx'),
+        ),
+    ]
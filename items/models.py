@@ -1,4 +1,5 @@
 from django.db import models
+from session.models import SessionScopedQuerySet
 
 
 class Item(models.Model):
@@ -16,5 +17,13 @@ class Item(models.Model):
     effects = models.JSONField(blank=True, null=True)
     note = models.TextField(blank=True)
 
+    objects = SessionScopedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["session", "name"]),
+            models.Index(fields=["session", "id"]),
+        ]
+
     def __str__(self):
         return self.name
\ No newline at end of file
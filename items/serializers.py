@@ -1,8 +1,11 @@
 from rest_framework import serializers
+from core.lean import LeanSerializer
+from core.sparse import SparseFieldsMixin
 from .models import Item
+from session.roles import get_session_roles
 
 
-class ItemSerializer(serializers.ModelSerializer):
+class ItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     session_name = serializers.CharField(source='session.name', read_only=True)
 
     class Meta:
@@ -11,11 +14,35 @@ class ItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'session_name']
 
     def validate_session(self, value):
-        user = self.context['request'].user
-        if value.master == user:
+        request = self.context['request']
+        if value.master_id == request.user.id:
             return value
-        if value.members.filter(user=user).exists():
+        if get_session_roles(request).is_member(value.pk):
             return value
         raise serializers.ValidationError(
             "Você não tem acesso a esta sessão."
-        )
\ No newline at end of file
+        )
+
+
+class ItemLeanSerializer(LeanSerializer):
+    """Listagem de itens: mesma saída do ItemSerializer, via .values()"""
+
+    values = (
+        'id', 'session__name', 'name', 'image', 'category', 'durability_current',
+        'durability_max', 'rarity', 'effects', 'note', 'session_id',
+    )
+
+    def to_representation(self, row):
+        return {
+            'id': row['id'],
+            'session_name': row['session__name'],
+            'name': row['name'],
+            'image': row['image'],
+            'category': row['category'],
+            'durability_current': row['durability_current'],
+            'durability_max': row['durability_max'],
+            'rarity': row['rarity'],
+            'effects': row['effects'],
+            'note': row['note'],
+            'session': row['session_id'],
+        }
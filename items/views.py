@@ -1,18 +1,23 @@
 from rest_framework import viewsets, permissions
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
+from core.lean import LeanListMixin
+from core.sparse import SparseFieldsViewMixin
 from .models import Item
-from .serializers import ItemSerializer
+from .serializers import ItemLeanSerializer, ItemSerializer
 
 
-class ItemViewSet(viewsets.ModelViewSet):
+class ItemViewSet(SparseFieldsViewMixin, LeanListMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = ItemSerializer
+    lean_serializer_class = ItemLeanSerializer
+    # Item não tem created_at; o id (único e crescente) serve de chave do cursor
+    cursor_ordering = '-id'
 
     def get_queryset(self):
-        queryset = Item.objects.filter(
-            session__members__user=self.request.user
-        ).select_related('session').distinct()
+        queryset = Item.objects.accessible_to(
+            self.request.user
+        ).select_related('session')
 
         session_id = self.request.query_params.get('session')
         if session_id:
@@ -34,12 +39,12 @@ class ItemViewSet(viewsets.ModelViewSet):
 
     def perform_update(self, serializer):
         obj = self.get_object()
-        if obj.session.master != self.request.user:
+        if obj.session.master_id != self.request.user.id:
             raise PermissionDenied("Apenas o mestre pode editar itens.")
         serializer.save()
 
     def perform_destroy(self, instance):
-        if instance.session.master != self.request.user:
+        if instance.session.master_id != self.request.user.id:
             raise PermissionDenied("Apenas o mestre pode remover itens.")
         instance.delete()
 
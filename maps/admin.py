@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
-from .models import SessionMap
+from .models import SessionMap, MapToken, TokenVisibility
 
 
 @admin.register(SessionMap)
@@ -20,7 +20,7 @@ class SessionMapAdmin(admin.ModelAdmin):
             'fields': ('image_url', 'preview_image', 'width', 'height')
         }),
         ('Configurações da Grade', {
-            'fields': ('grid_enabled', 'grid_size')
+            'fields': ('grid_enabled', 'grid_size', 'fog_enabled')
         }),
         ('Metadados', {
             'fields': ('id', 'created_at'),
@@ -93,4 +93,21 @@ class SessionMapAdmin(admin.ModelAdmin):
         updated = queryset.update(grid_enabled=False)
         self.message_user(request, f'Grade desativada para {updated} mapa(s).')
     disable_grid.short_description = 'Desativar grade nos mapas selecionados'
-    
\ No newline at end of file
+    
+
+
+class TokenVisibilityInline(admin.TabularInline):
+    model = TokenVisibility
+    extra = 0
+    raw_id_fields = ['user']
+
+
+@admin.register(MapToken)
+class MapTokenAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'map', 'x', 'y', 'rotation', 'scale', 'is_hidden', 'updated_at']
+    list_filter = ['is_hidden', 'map']
+    search_fields = ['name', 'map__name', 'character__player_name', 'npc__name']
+    readonly_fields = ['id', 'created_at', 'updated_at']
+    raw_id_fields = ['map', 'character', 'npc']
+    inlines = [TokenVisibilityInline]
+    list_per_page = 50
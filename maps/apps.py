@@ -2,4 +2,8 @@ from django.apps import AppConfig
 
 class MapsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
-    name = "maps"
\ No newline at end of file
+    name = "maps"
+
+    def ready(self):
+        # Registra os signals que mantêm o índice espacial dos tokens
+        from . import spatial  # noqa: F401
\ No newline at end of file
@@ -0,0 +1,232 @@
+"""
+Névoa de guerra (fog of war) calculada no servidor.
+
+O mapa vira uma grade de ``cols x rows`` células (``width``/``height`` do
+SessionMap divididos pelo ``grid_size``). Máscaras são bitsets compactos
+(int do Python, bit ``row * cols + col``): as uniões/diferenças do mapa
+inteiro são operações únicas sobre o inteiro, feitas em C.
+
+A linha de visão de um token usa um molde de raios pré-calculado por raio
+(``ray_template``): os raios do centro até a borda do disco em árvore,
+achatada em pré-ordem. Uma célula bloqueada (``SessionMap.blockers``) fica
+visível mas pula a subárvore inteira atrás dela, então cada célula do disco
+é visitada no máximo uma vez por caminho.
+
+O cálculo é incremental: um movimento só refaz a visão do token que mudou
+de célula, e cada jogador recebe a diferença (XOR) da sua máscara,
+comprimida com zlib em base64.
+"""
+import base64
+import math
+import zlib
+from functools import lru_cache
+
+MAX_VISION_RADIUS = 30
+# Teto de células (cols * rows) da grade: máscaras, terreno e o A* alocam
+# memória por célula
+MAX_GRID_CELLS = 1000 * 1000
+
+
+def _shape(width, height, grid_size):
+    if not width or not height or not grid_size or width <= 0 or height <= 0 or grid_size <= 0:
+        return 0, 0
+    return math.ceil(width / grid_size), math.ceil(height / grid_size)
+
+
+def check_grid(width, height, grid_size):
+    """ValueError se a grade passar de MAX_GRID_CELLS células"""
+    cols, rows = _shape(width, height, grid_size)
+    if cols * rows > MAX_GRID_CELLS:
+        raise ValueError(
+            f'A grade do mapa teria {cols} x {rows} células; o máximo é {MAX_GRID_CELLS} '
+            '(aumente o grid ou reduza largura/altura).'
+        )
+
+
+def grid_shape(width, height, grid_size):
+    """(cols, rows) da grade do mapa; (0, 0) sem dimensões ou acima de MAX_GRID_CELLS"""
+    cols, rows = _shape(width, height, grid_size)
+    if cols * rows > MAX_GRID_CELLS:
+        return 0, 0
+    return cols, rows
+
+
+def mask_bytes(cols, rows):
+    return (cols * rows + 7) // 8
+
+
+def encode_mask(mask, nbytes):
+    """Máscara (int) -> base64 do zlib dos bytes (little-endian)"""
+    return base64.b64encode(zlib.compress(mask.to_bytes(nbytes, 'little'))).decode('ascii')
+
+
+def decode_mask(text, nbytes):
+    """Inverso de encode_mask; ValueError se o texto não for uma máscara válida"""
+    try:
+        data = zlib.decompress(base64.b64decode(text, validate=True))
+    except (zlib.error, ValueError) as e:
+        raise ValueError('Máscara inválida.') from e
+    if len(data) != nbytes:
+        raise ValueError(f'A máscara deve ter {nbytes} bytes.')
+    return int.from_bytes(data, 'little')
+
+
+def _line(x1, y1):
+    """Células (Bresenham) de (0, 0) até (x1, y1)"""
+    points = []
+    x = y = 0
+    dx, dy = abs(x1), -abs(y1)
+    sx, sy = (1 if x1 > 0 else -1), (1 if y1 > 0 else -1)
+    err = dx + dy
+    while True:
+        points.append((x, y))
+        if x == x1 and y == y1:
+            return points
+        e2 = 2 * err
+        if e2 >= dy:
+            err += dy
+            x += sx
+        if e2 <= dx:
+            err += dx
+            y += sy
+
+
+@lru_cache(maxsize=64)
+def ray_template(radius):
+    """
+    Raios até a borda do disco de `radius` células, como árvore achatada
+    em pré-ordem: tupla de (dx, dy, índice após a subárvore)
+    """
+    limit = radius * radius + radius
+    root = {}
+    ring = [
+        (dx, dy)
+        for dx in range(-radius, radius + 1)
+        for dy in range(-radius, radius + 1)
+        if max(abs(dx), abs(dy)) == radius
+    ]
+    for target in ring:
+        node = root
+        for dx, dy in _line(*target)[1:]:
+            if dx * dx + dy * dy > limit:
+                break
+            node = node.setdefault((dx, dy), {})
+
+    flat = []
+
+    def walk(node):
+        for (dx, dy), children in node.items():
+            index = len(flat)
+            flat.append(None)
+            walk(children)
+            flat[index] = (dx, dy, len(flat))
+
+    walk(root)
+    return tuple(flat)
+
+
+class FogOfWar:
+    """Visão (por token) e máscaras visíveis/exploradas (por jogador) de um mapa"""
+
+    def __init__(self, cols, rows, blockers=b''):
+        self.cols = cols
+        self.rows = rows
+        self.nbytes = mask_bytes(cols, rows)
+        self.tokens = {}  # token_id -> [owner_id, cell, radius, máscara]
+        self.visible = {}  # owner_id -> máscara
+        self.explored = {}  # owner_id -> máscara
+        self.set_blockers(blockers)
+
+    def set_blockers(self, blockers):
+        """Troca as células bloqueadas (bytes) e refaz a visão de todos os tokens"""
+        self.blockers = bytes(blockers or b'')[:self.nbytes].ljust(self.nbytes, b'\0')
+        for token in self.tokens.values():
+            token[3] = self._token_mask(token[1], token[2])
+        return self.commit(set(self.visible))
+
+    def cell_at(self, x, y, grid_size):
+        """Célula da posição (x, y) em pixels, limitada à grade"""
+        col = min(max(int(x // grid_size), 0), self.cols - 1)
+        row = min(max(int(y // grid_size), 0), self.rows - 1)
+        return row * self.cols + col
+
+    def line_of_sight(self, cell, radius):
+        """Máscara das células visíveis a partir de `cell`"""
+        cols, rows, blockers = self.cols, self.rows, self.blockers
+        col, row = cell % cols, cell // cols
+        bits = bytearray(self.nbytes)
+        bits[cell >> 3] |= 1 << (cell & 7)
+
+        template = ray_template(radius)
+        size = len(template)
+        i = 0
+        while i < size:
+            dx, dy, end = template[i]
+            x, y = col + dx, row + dy
+            if x < 0 or y < 0 or x >= cols or y >= rows:
+                i = end
+                continue
+            target = y * cols + x
+            bits[target >> 3] |= 1 << (target & 7)
+            i = end if blockers[target >> 3] >> (target & 7) & 1 else i + 1
+        return int.from_bytes(bits, 'little')
+
+    def _token_mask(self, cell, radius):
+        return self.line_of_sight(cell, radius) if radius > 0 else 0
+
+    def place(self, token_id, owner_id, cell, radius):
+        """
+        Coloca/move o token; retorna os donos cuja visão pode ter mudado
+        (vazio se o token não mudou de célula)
+        """
+        token = self.tokens.get(token_id)
+        if token is not None and token[0] == owner_id and token[1] == cell and token[2] == radius:
+            return set()
+        affected = {self.remove(token_id), owner_id} - {None}
+        if owner_id is not None:
+            self.tokens[token_id] = [owner_id, cell, radius, self._token_mask(cell, radius)]
+        return affected
+
+    def remove(self, token_id):
+        token = self.tokens.pop(token_id, None)
+        return token[0] if token is not None else None
+
+    def commit(self, owners):
+        """
+        Recalcula a visão dos donos alterados; retorna {dono: (xor da
+        máscara visível, células recém-exploradas)} só para quem mudou
+        """
+        deltas = {}
+        for owner_id in owners:
+            if owner_id is None:
+                continue
+            visible = 0
+            for token in self.tokens.values():
+                if token[0] == owner_id:
+                    visible |= token[3]
+            changed = visible ^ self.visible.get(owner_id, 0)
+            explored = self.explored.get(owner_id, 0)
+            discovered = visible & ~explored
+            self.visible[owner_id] = visible
+            if discovered:
+                self.explored[owner_id] = explored | discovered
+            if changed or discovered:
+                deltas[owner_id] = (changed, discovered)
+        return deltas
+
+    def encode_delta(self, delta):
+        changed, discovered = delta
+        return {
+            'action': 'fog',
+            'visible': encode_mask(changed, self.nbytes),
+            'explored': encode_mask(discovered, self.nbytes),
+        }
+
+    def snapshot(self, owner_id):
+        """Máscaras completas do jogador (mesmo formato dos deltas, aplicados sobre zero)"""
+        return {
+            'cols': self.cols,
+            'rows': self.rows,
+            'visible': encode_mask(self.visible.get(owner_id, 0), self.nbytes),
+            'explored': encode_mask(self.explored.get(owner_id, 0), self.nbytes),
+        }
@@ -0,0 +1,376 @@
+"""
+Estado em memória dos mapas abertos no MapConsumer (ws/map/<id>/).
+
+Cada mapa com conexões neste processo tem um MapState com as posições dos
+tokens, o dono de cada um e os limites do mapa, carregados uma vez. Os
+movimentos são validados contra esse estado, agrupados por token e
+transmitidos ao grupo a cada MOVE_TICK segundos (um frame por tick com a
+última posição de cada token). A gravação no banco é em lote (bulk_update)
+a cada FLUSH_INTERVAL segundos, não a cada movimento.
+
+Com a névoa de guerra ligada, cada movimento que muda um token de célula
+refaz só a visão desse token (maps/fog.py) e o dono recebe o delta da sua
+máscara; as células exploradas são gravadas junto com as posições.
+
+Cada usuário só recebe os tokens que vê (maps/visibility.py): os frames
+são montados uma vez por audiência, não por conexão.
+
+Alterações feitas fora do WebSocket (REST, admin) mudam a geração dos
+tokens do mapa (maps/spatial.py); o estado é recarregado quando ela muda e
+as conexões recebem um snapshot novo. As posições gravadas pelo flush (deste
+ou de outro processo) não mudam essa geração: os movimentos já chegam a
+todos os processos pelo grupo (publish).
+"""
+import asyncio
+import logging
+import math
+import time
+import uuid
+from collections import OrderedDict
+
+from channels.db import database_sync_to_async
+from django.utils import timezone
+
+from core.renderers import dumps
+
+from .fog import FogOfWar, grid_shape
+from .models import MapExploration, MapToken, SessionMap, TokenVisibility
+from .spatial import tokens_changed, tokens_generation
+from .visibility import AudienceFrames, TokenAudiences
+
+logger = logging.getLogger(__name__)
+
+MOVE_TICK = 0.05
+FLUSH_INTERVAL = 1.0
+REFRESH_INTERVAL = 2.0
+MAX_PUBLISHED_EVENTS = 200
+
+
+class MoveError(Exception):
+    pass
+
+
+def _moves_frame(moves):
+    return dumps({'action': 'moves', 'moves': moves})
+
+
+class TokenState:
+    __slots__ = ('x', 'y', 'rotation', 'owner_id', 'is_hidden', 'vision_radius')
+
+    def __init__(self, x, y, rotation, owner_id, is_hidden, vision_radius):
+        self.x = x
+        self.y = y
+        self.rotation = rotation
+        self.owner_id = owner_id
+        self.is_hidden = is_hidden
+        self.vision_radius = vision_radius
+
+
+class MapState:
+    """Posições autoritativas dos tokens de um mapa neste processo"""
+
+    def __init__(self, map_id):
+        self.map_id = map_id
+        self.group_name = f'map_{map_id}'
+        self.session_id = None
+        self.master_id = None
+        self.width = None
+        self.height = None
+        self.grid_size = None
+        self.tokens = {}
+        self.audiences = None
+        self.fog = None
+        self.generation = None
+        self.connections = 0
+        self.consumers = set()  # conexões deste processo (para reenviar o snapshot)
+        self.outgoing = {}  # token_id -> [id, x, y, rotation] a transmitir
+        self.dirty = {}  # token_id -> (x, y, rotation) a gravar
+        self.explored_dirty = set()  # jogadores com células exploradas a gravar
+        self._published = OrderedDict()
+        self._load_lock = asyncio.Lock()
+        self._loaded = False
+        self._task = None
+        self._last_flush = self._last_refresh = time.monotonic()
+
+    # Carga
+
+    async def ensure_loaded(self):
+        async with self._load_lock:
+            if not self._loaded:
+                await database_sync_to_async(self.load)()
+                self._loaded = True
+
+    def load(self):
+        """Lê mapa e tokens (SessionMap.DoesNotExist se o mapa não existir)"""
+        session_map = SessionMap.objects.select_related('session').get(pk=self.map_id)
+        self.generation = session_map.tokens_generation
+        self.session_id = session_map.session_id
+        self.master_id = session_map.session.master_id
+        self.width = session_map.width
+        self.height = session_map.height
+        self.grid_size = session_map.grid_size
+        self.tokens = {
+            str(pk): TokenState(*values)
+            for pk, *values in MapToken.objects.filter(map_id=session_map.pk).values_list(
+                'id', 'x', 'y', 'rotation', 'character__user_id', 'is_hidden', 'vision_radius'
+            )
+        }
+        # Movimentos ainda não gravados continuam valendo
+        for token_id, (x, y, rotation) in self.dirty.items():
+            token = self.tokens.get(token_id)
+            if token is not None:
+                token.x, token.y, token.rotation = x, y, rotation
+        self.audiences = self._load_audiences(session_map)
+        self.fog = self._load_fog(session_map)
+
+    def _load_audiences(self, session_map):
+        rules = {}
+        for token_id, user_id, can_see in TokenVisibility.objects.filter(
+            token__map_id=session_map.pk
+        ).values_list('token_id', 'user_id', 'can_see'):
+            rules.setdefault(str(token_id), {})[user_id] = can_see
+        members = session_map.session.members.values_list('user_id', flat=True)
+        return TokenAudiences(
+            self.master_id,
+            {token_id: (token.owner_id, token.is_hidden) for token_id, token in self.tokens.items()},
+            rules,
+            members,
+        )
+
+    def _load_fog(self, session_map):
+        cols, rows = grid_shape(self.width, self.height, self.grid_size)
+        if not session_map.fog_enabled or not cols:
+            return None
+
+        fog = FogOfWar(cols, rows, session_map.blockers)
+        for user_id, explored in MapExploration.objects.filter(
+            map_id=session_map.pk
+        ).values_list('user_id', 'explored'):
+            explored = bytes(explored)
+            if len(explored) == fog.nbytes:
+                fog.explored[user_id] = int.from_bytes(explored, 'little')
+        # Exploração ainda não gravada (recarga com a mesma grade)
+        previous = self.fog
+        if previous is not None and (previous.cols, previous.rows) == (cols, rows):
+            for user_id, explored in previous.explored.items():
+                fog.explored[user_id] = fog.explored.get(user_id, 0) | explored
+
+        owners = set()
+        for token_id, token in self.tokens.items():
+            cell = fog.cell_at(token.x, token.y, self.grid_size)
+            owners |= fog.place(token_id, token.owner_id, cell, token.vision_radius)
+        for user_id, (_, discovered) in fog.commit(owners).items():
+            if discovered:
+                self.explored_dirty.add(user_id)
+        return fog
+
+    def refresh(self):
+        """Recarrega se os tokens mudaram fora deste estado; True se recarregou"""
+        if tokens_generation(self.map_id) != self.generation:
+            self.load()
+            return True
+        return False
+
+    # Movimentos
+
+    def move(self, user_id, token_id, x, y, rotation=None):
+        """Valida e aplica um movimento; MoveError se não for permitido"""
+        token = self.tokens.get(token_id)
+        if token is None:
+            raise MoveError('Token não encontrado.')
+        if user_id != self.master_id and user_id != token.owner_id:
+            raise MoveError('Sem permissão para mover este token.')
+        if not (math.isfinite(x) and math.isfinite(y)):
+            raise MoveError('Posição inválida.')
+        if x < 0 or y < 0 or (self.width and x > self.width) or (self.height and y > self.height):
+            raise MoveError('Posição fora do mapa.')
+        if rotation is None:
+            rotation = token.rotation
+        elif not math.isfinite(rotation):
+            raise MoveError('Rotação inválida.')
+        else:
+            rotation %= 360
+
+        token.x, token.y, token.rotation = x, y, rotation
+        self.outgoing[token_id] = [token_id, x, y, rotation]
+        self.dirty[token_id] = (x, y, rotation)
+
+    def snapshot(self, user_id):
+        fog = None
+        if self.fog is not None and user_id != self.master_id:
+            fog = self.fog.snapshot(user_id)
+        audience = self.audiences.audience_of(user_id)
+        return {
+            'action': 'map_state',
+            'map_id': str(self.map_id),
+            'width': self.width,
+            'height': self.height,
+            'grid_size': self.grid_size,
+            'tokens': [
+                [token_id, token.x, token.y, token.rotation]
+                for token_id, token in self.tokens.items()
+                if self.audiences.sees(audience, token_id)
+            ],
+            'fog': fog,
+        }
+
+    def publish(self, event_id, moves):
+        """
+        Aplica os movimentos do grupo (vindos deste ou de outro processo) e
+        retorna (AudienceFrames dos movimentos, {jogador: delta da névoa}),
+        calculados uma única vez por evento
+        """
+        published = self._published.get(event_id)
+        if published is not None:
+            return published
+
+        for token_id, x, y, rotation in moves:
+            token = self.tokens.get(token_id)
+            if token is not None:
+                token.x, token.y, token.rotation = x, y, rotation
+
+        frames = AudienceFrames(self.audiences, moves, _moves_frame)
+        published = (frames, self._move_fog(moves))
+
+        self._published[event_id] = published
+        if len(self._published) > MAX_PUBLISHED_EVENTS:
+            self._published.popitem(last=False)
+        return published
+
+    def frame_for(self, frames, user_id):
+        """Frame dos movimentos para o usuário (None se ele não vê nenhum)"""
+        return frames.for_audience(self.audiences.audience_of(user_id))
+
+    def _move_fog(self, moves):
+        """Refaz a visão dos tokens que mudaram de célula; {jogador: texto do delta}"""
+        fog = self.fog
+        if fog is None:
+            return {}
+        owners = set()
+        for token_id, x, y, _ in moves:
+            token = self.tokens.get(token_id)
+            if token is not None:
+                cell = fog.cell_at(x, y, self.grid_size)
+                owners |= fog.place(token_id, token.owner_id, cell, token.vision_radius)
+
+        texts = {}
+        for user_id, delta in fog.commit(owners).items():
+            texts[user_id] = dumps(fog.encode_delta(delta))
+            if delta[1]:
+                self.explored_dirty.add(user_id)
+        return texts
+
+    # Ciclo de transmissão/gravação
+
+    def start(self, channel_layer):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run(channel_layer))
+
+    async def run(self, channel_layer):
+        while True:
+            await asyncio.sleep(MOVE_TICK)
+            await self.broadcast(channel_layer)
+
+            now = time.monotonic()
+            pending = self.dirty or self.explored_dirty
+            if pending and (not self.connections or now - self._last_flush >= FLUSH_INTERVAL):
+                await self.flush()
+                self._last_flush = now
+
+            # Sem conexões (nem gravações pendentes): descarta o estado
+            if not self.connections and not self.dirty and not self.explored_dirty and not self.outgoing:
+                if _states.get(self.map_id) is self:
+                    del _states[self.map_id]
+                return
+
+            if now - self._last_refresh >= REFRESH_INTERVAL:
+                self._last_refresh = now
+                try:
+                    reloaded = await database_sync_to_async(self.refresh)()
+                except Exception as e:
+                    logger.error(f'Erro ao recarregar o mapa {self.map_id}: {str(e)}')
+                    continue
+                if reloaded:
+                    for consumer in list(self.consumers):
+                        await consumer.send_snapshot()
+
+    async def broadcast(self, channel_layer):
+        if not self.outgoing:
+            return
+        moves = list(self.outgoing.values())
+        self.outgoing = {}
+        await channel_layer.group_send(self.group_name, {
+            'type': 'map_moves',
+            'event_id': uuid.uuid4().hex,
+            'moves': moves,
+        })
+
+    async def flush(self):
+        dirty, self.dirty = self.dirty, {}
+        explored = {}
+        if self.fog is not None:
+            explored = {
+                user_id: self.fog.explored.get(user_id, 0).to_bytes(self.fog.nbytes, 'little')
+                for user_id in self.explored_dirty
+            }
+        self.explored_dirty = set()
+        if explored:
+            try:
+                await database_sync_to_async(self._save_explored)(explored)
+            except Exception as e:
+                logger.error(f'Erro ao gravar a exploração do mapa {self.map_id}: {str(e)}')
+        if not dirty:
+            return
+        try:
+            await database_sync_to_async(self._save)(dirty)
+        except Exception as e:
+            logger.error(f'Erro ao gravar {len(dirty)} posição(ões) do mapa {self.map_id}: {str(e)}')
+
+    def _save(self, dirty):
+        now = timezone.now()
+        MapToken.objects.bulk_update(
+            [
+                MapToken(pk=token_id, x=x, y=y, rotation=rotation, updated_at=now)
+                for token_id, (x, y, rotation) in dirty.items()
+            ],
+            ['x', 'y', 'rotation', 'updated_at'],
+            batch_size=500,
+        )
+        tokens_changed(
+            self.map_id,
+            moved=[(uuid.UUID(token_id), x, y) for token_id, (x, y, _) in dirty.items()],
+            flushed=True,
+        )
+
+    def _save_explored(self, explored):
+        for user_id, data in explored.items():
+            MapExploration.objects.update_or_create(
+                map_id=self.map_id, user_id=user_id, defaults={'explored': data}
+            )
+
+
+_states = {}
+
+
+async def get_map_state(map_id, channel_layer):
+    """
+    Estado do mapa (criado e carregado se preciso), com a conexão já
+    registrada; None se o mapa não existir
+    """
+    state = _states.get(map_id)
+    if state is None:
+        state = _states[map_id] = MapState(map_id)
+    state.connections += 1
+    try:
+        await state.ensure_loaded()
+    except SessionMap.DoesNotExist:
+        release_map_state(state)
+        if not state.connections and _states.get(map_id) is state:
+            del _states[map_id]
+        return None
+    state.start(channel_layer)
+    return state
+
+
+def release_map_state(state):
+    state.connections = max(state.connections - 1, 0)
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 07:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maps', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sessionmap',
+            index=models.Index(fields=['session', 'created_at'], name='maps_sessio_session_f9dcd2_idx'),
+        ),
+    ]
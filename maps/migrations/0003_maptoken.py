@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-18 08:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('npc', '0003_keyset_indexes'),
+        ('characters', '0008_sheet_index'),
+        ('maps', '0002_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MapToken',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(blank=True, max_length=120)),
+                ('image_url', models.URLField(blank=True, null=True)),
+                ('x', models.FloatField(default=0)),
+                ('y', models.FloatField(default=0)),
+                ('rotation', models.FloatField(default=0)),
+                ('scale', models.FloatField(default=1)),
+                ('is_hidden', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('character', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='map_tokens', to='characters.character')),
+                ('map', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens', to='maps.sessionmap')),
+                ('npc', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='map_tokens', to='npc.npc')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='maptoken',
+            index=models.Index(fields=['map', 'created_at'], name='maps_maptok_map_id_d72122_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2 on 2026-10-18 08:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('maps', '0003_maptoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='maptoken',
+            name='vision_radius',
+            field=models.PositiveSmallIntegerField(default=6),
+        ),
+        migrations.AddField(
+            model_name='sessionmap',
+            name='blockers',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+        migrations.AddField(
+            model_name='sessionmap',
+            name='fog_enabled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='MapExploration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('explored', models.BinaryField(default=b'')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('map', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='explorations', to='maps.sessionmap')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='map_explorations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('map', 'user')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-18 08:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('maps', '0004_fog_of_war'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenVisibility',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('can_see', models.BooleanField(default=True)),
+                ('token', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visibility', to='maps.maptoken')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='token_visibility', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('token', 'user')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 08:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maps', '0005_tokenvisibility'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sessionmap',
+            name='terrain',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maps', '0006_sessionmap_terrain'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sessionmap',
+            name='tokens_generation',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
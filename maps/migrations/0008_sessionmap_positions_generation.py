@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maps', '0007_sessionmap_tokens_generation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sessionmap',
+            name='positions_generation',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
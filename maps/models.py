@@ -1,5 +1,8 @@
 import uuid
+from django.conf import settings
 from django.db import models
+from django.db.models import Exists, OuterRef, Q
+from session.models import SessionScopedQuerySet
 
 class SessionMap(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -20,4 +23,127 @@ class SessionMap(models.Model):
 
     is_active = models.BooleanField(default=True)
 
-    created_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    # Névoa de guerra (maps/fog.py): células da grade que bloqueiam a visão,
+    # em bitset (bit row * cols + col)
+    fog_enabled = models.BooleanField(default=False)
+    blockers = models.BinaryField(blank=True, default=b"")
+    # Custo de movimento (maps/pathfinding.py): um byte por célula
+    terrain = models.BinaryField(blank=True, default=b"")
+    # Gerações dos tokens (maps/spatial.py): edições (REST, admin) e posições
+    # gravadas em lote pelo MapState (maps/live.py), contadas à parte
+    tokens_generation = models.PositiveBigIntegerField(default=0, editable=False)
+    positions_generation = models.PositiveBigIntegerField(default=0, editable=False)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = SessionScopedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["session", "created_at"]),
+        ]
+
+
+class MapTokenQuerySet(SessionScopedQuerySet):
+    session_ref = "map__session_id"
+
+    def visible_to(self, user):
+        """
+        Tokens que o usuário vê: o mestre vê todos e o dono do personagem vê
+        o próprio token; senão vale a regra do TokenVisibility do usuário
+        ou, sem regra, o is_hidden do token
+        """
+        rules = TokenVisibility.objects.filter(token=OuterRef("pk"), user=user)
+        return self.filter(
+            Q(map__session__master=user)
+            | Q(character__user=user)
+            | Exists(rules.filter(can_see=True))
+            | (Q(is_hidden=False) & ~Exists(rules.filter(can_see=False)))
+        )
+
+
+class MapToken(models.Model):
+    """Token no mapa; x/y em pixels da imagem (centro do token)"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    map = models.ForeignKey(
+        SessionMap,
+        on_delete=models.CASCADE,
+        related_name="tokens"
+    )
+    character = models.ForeignKey(
+        "characters.Character",
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="map_tokens"
+    )
+    npc = models.ForeignKey(
+        "npc.NPC",
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="map_tokens"
+    )
+
+    name = models.CharField(max_length=120, blank=True)
+    image_url = models.URLField(blank=True, null=True)
+
+    x = models.FloatField(default=0)
+    y = models.FloatField(default=0)
+    rotation = models.FloatField(default=0)  # graus
+    scale = models.FloatField(default=1)
+
+    is_hidden = models.BooleanField(default=False)
+    # Alcance da visão (em células) na névoa de guerra; 0 = não enxerga
+    vision_radius = models.PositiveSmallIntegerField(default=6)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = MapTokenQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["map", "created_at"]),
+        ]
+
+    def __str__(self):
+        return self.name or str(self.id)
+
+
+class TokenVisibility(models.Model):
+    """Exceção ao is_hidden do token para um usuário (can_see: vê ou não vê)"""
+    token = models.ForeignKey(
+        MapToken,
+        on_delete=models.CASCADE,
+        related_name="visibility"
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="token_visibility"
+    )
+    can_see = models.BooleanField(default=True)
+
+    class Meta:
+        unique_together = ("token", "user")
+
+
+class MapExploration(models.Model):
+    """Células do mapa já exploradas por um jogador (bitset da névoa de guerra)"""
+    map = models.ForeignKey(
+        SessionMap,
+        on_delete=models.CASCADE,
+        related_name="explorations"
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="map_explorations"
+    )
+    explored = models.BinaryField(default=b"")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("map", "user")
@@ -0,0 +1,239 @@
+"""
+Caminhos e alcance de movimento na grade dos mapas.
+
+A grade é a mesma da névoa (maps/fog.py): ``cols x rows`` células, célula
+``row * cols + col``. O custo de entrar numa célula vem de duas camadas do
+SessionMap: ``blockers`` (bitset; paredes também bloqueiam o movimento) e
+``terrain`` (um byte por célula: 0 ou 1 é terreno normal, 2..254 multiplica
+o custo, ``IMPASSABLE`` não deixa passar). Diagonais custam ``DIAGONAL``
+vezes o passo reto e não cortam cantos de células intransponíveis.
+
+``MovementGrid`` guarda os custos num ``array`` com uma borda intransponível
+em volta, então os vizinhos de uma célula são só somas de deslocamentos, sem
+checar limites. ``path`` é A* (heurística octil, empates para quem está mais
+perto do destino), interrompido depois de ``MAX_PATH_NODES`` células
+expandidas, e ``reachable`` é Dijkstra limitado pelo deslocamento.
+
+``movement_grid(session_map)`` mantém a grade de cada mapa em memória (LRU
+de ``MAX_GRIDS`` mapas), junto com os resultados por célula de origem;
+tudo é descartado quando bloqueios, terreno ou dimensões mudam.
+"""
+import base64
+import heapq
+import math
+import threading
+import zlib
+from array import array
+from collections import OrderedDict
+
+from .fog import encode_mask, grid_shape, mask_bytes
+
+IMPASSABLE = 255
+DIAGONAL = 1.5
+MAX_BUDGET = 100
+# Teto de células expandidas pelo A* por busca (roda dentro da requisição)
+MAX_PATH_NODES = 5000
+MAX_GRIDS = 32
+MAX_RESULTS = 256
+
+
+def encode_layer(data):
+    """Bytes de uma camada -> base64 do zlib"""
+    return base64.b64encode(zlib.compress(bytes(data))).decode('ascii')
+
+
+def decode_layer(text, nbytes):
+    """Inverso de encode_layer; ValueError se o texto não for uma camada válida"""
+    try:
+        data = zlib.decompress(base64.b64decode(text, validate=True))
+    except (zlib.error, ValueError) as e:
+        raise ValueError('Camada inválida.') from e
+    if len(data) != nbytes:
+        raise ValueError(f'A camada deve ter {nbytes} bytes.')
+    return data
+
+
+class MovementGrid:
+    """Custos de movimento de um mapa, com caminhos e alcances em cache"""
+
+    def __init__(self, cols, rows, blockers=b'', terrain=b''):
+        self.cols = cols
+        self.rows = rows
+        self.nbytes = mask_bytes(cols, rows)
+        width = self.width = cols + 2
+
+        # Bitset de bloqueios como texto de '0'/'1' (um caractere por célula)
+        size = cols * rows
+        blocked = bin(int.from_bytes(bytes(blockers or b''), 'little'))[2:][::-1][:size].ljust(size, '0')
+        terrain = bytes(terrain or b'')[:size].ljust(size, b'\0')
+        # Custo de entrar em cada célula (0 = intransponível), com borda
+        cost = array('d', bytes(8 * width * (rows + 2)))
+        for row in range(rows):
+            first = row * cols
+            base = (row + 1) * width + 1
+            cost[base:base + cols] = array('d', [
+                0 if wall == '1' or value == IMPASSABLE else value or 1
+                for wall, value in zip(blocked[first:first + cols], terrain[first:first + cols])
+            ])
+        self.cost = cost
+
+        # (deslocamento, fator, laterais que não podem estar bloqueadas)
+        self.steps = (
+            (1, 1.0, 0, 0), (-1, 1.0, 0, 0), (width, 1.0, 0, 0), (-width, 1.0, 0, 0),
+            (width + 1, DIAGONAL, 1, width), (width - 1, DIAGONAL, -1, width),
+            (-width + 1, DIAGONAL, 1, -width), (-width - 1, DIAGONAL, -1, -width),
+        )
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def cell_at(self, x, y, grid_size):
+        """Célula da posição (x, y) em pixels, limitada à grade"""
+        col = min(max(int(x // grid_size), 0), self.cols - 1)
+        row = min(max(int(y // grid_size), 0), self.rows - 1)
+        return row * self.cols + col
+
+    def _padded(self, cell):
+        row, col = divmod(cell, self.cols)
+        return (row + 1) * self.width + col + 1
+
+    def _unpadded(self, node):
+        row, col = divmod(node, self.width)
+        return (row - 1) * self.cols + col - 1
+
+    def _cached(self, key, compute):
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+        result = compute()
+        with self._lock:
+            self._results[key] = result
+            while len(self._results) > MAX_RESULTS:
+                self._results.popitem(last=False)
+        return result
+
+    def path(self, start, goal, max_cost=None):
+        """
+        Menor caminho de `start` a `goal`: (custo, [células]) ou None se não
+        houver (ou se custar mais que `max_cost`, que também limita a busca,
+        ou se a busca expandir mais de MAX_PATH_NODES células)
+        """
+        return self._cached(('path', start, goal, max_cost), lambda: self._path(start, goal, max_cost))
+
+    def reachable(self, start, budget):
+        """{célula: custo} das células alcançáveis de `start` gastando até `budget`"""
+        return self._cached(('reachable', start, budget), lambda: self._reachable(start, budget))
+
+    def _path(self, start, goal, max_cost=None):
+        cost, steps, width = self.cost, self.steps, self.width
+        source, target = self._padded(start), self._padded(goal)
+        if source == target:
+            return 0.0, [start]
+        if not cost[target]:
+            return None
+        target_y, target_x = divmod(target, width)
+        # Heurística octil: a diagonal troca dois passos retos por DIAGONAL
+        diagonal_saving = 2 - DIAGONAL
+
+        limit = math.inf if max_cost is None else max_cost
+        best = {source: 0.0}
+        unvisited = math.inf
+        heap = [(0.0, 0.0, 0.0, source)]
+        pop, push = heapq.heappop, heapq.heappush
+        expanded = 0
+        while heap:
+            _, _, spent, node = pop(heap)
+            if node == target:
+                break
+            if spent > best[node]:
+                continue
+            expanded += 1
+            if expanded > MAX_PATH_NODES:
+                return None
+            for offset, factor, side_a, side_b in steps:
+                neighbor = node + offset
+                step = cost[neighbor]
+                if not step or (side_a and not (cost[node + side_a] and cost[node + side_b])):
+                    continue
+                total = spent + step * factor
+                if total < best.get(neighbor, unvisited):
+                    y, x = divmod(neighbor, width)
+                    dx, dy = abs(x - target_x), abs(y - target_y)
+                    h = dx + dy - diagonal_saving * (dx if dx < dy else dy)
+                    if total + h > limit:
+                        continue
+                    best[neighbor] = total
+                    push(heap, (total + h, h, total, neighbor))
+        else:
+            return None
+
+        # Volta do destino pelo vizinho que explica o custo de cada célula
+        cells = [goal]
+        node = target
+        while node != source:
+            for offset, factor, side_a, side_b in steps:
+                if side_a and not (cost[node + side_a] and cost[node + side_b]):
+                    continue
+                if best.get(node + offset, unvisited) + cost[node] * factor == best[node]:
+                    break
+            node += offset
+            cells.append(self._unpadded(node))
+        cells.reverse()
+        return best[target], cells
+
+    def _reachable(self, start, budget):
+        cost, steps = self.cost, self.steps
+        source = self._padded(start)
+        best = {source: 0.0}
+        heap = [(0.0, source)]
+        pop, push = heapq.heappop, heapq.heappush
+        while heap:
+            spent, node = pop(heap)
+            if spent > best[node]:
+                continue
+            for offset, factor, side_a, side_b in steps:
+                neighbor = node + offset
+                step = cost[neighbor]
+                if not step or (side_a and not (cost[node + side_a] and cost[node + side_b])):
+                    continue
+                total = spent + step * factor
+                if total <= budget and total < best.get(neighbor, math.inf):
+                    best[neighbor] = total
+                    push(heap, (total, neighbor))
+        return {self._unpadded(node): spent for node, spent in best.items()}
+
+    def encode_reachable(self, cells):
+        """Células alcançáveis como máscara no formato da névoa"""
+        bits = bytearray(self.nbytes)
+        for cell in cells:
+            bits[cell >> 3] |= 1 << (cell & 7)
+        return encode_mask(int.from_bytes(bits, 'little'), self.nbytes)
+
+
+_grids = OrderedDict()  # map_id -> (chave das camadas, MovementGrid)
+_grids_lock = threading.Lock()
+
+
+def movement_grid(session_map):
+    """MovementGrid do mapa (None sem largura, altura e grid definidos)"""
+    cols, rows = grid_shape(session_map.width, session_map.height, session_map.grid_size)
+    if not cols:
+        return None
+    blockers = bytes(session_map.blockers or b'')
+    terrain = bytes(session_map.terrain or b'')
+    key = (cols, rows, zlib.crc32(blockers), zlib.crc32(terrain))
+    map_id = session_map.pk
+
+    with _grids_lock:
+        entry = _grids.get(map_id)
+        if entry is not None and entry[0] == key:
+            _grids.move_to_end(map_id)
+            return entry[1]
+
+    grid = MovementGrid(cols, rows, blockers, terrain)
+    with _grids_lock:
+        _grids[map_id] = (key, grid)
+        _grids.move_to_end(map_id)
+        while len(_grids) > MAX_GRIDS:
+            _grids.popitem(last=False)
+    return grid
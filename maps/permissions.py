@@ -1,5 +1,5 @@
 from rest_framework import permissions
-from session.models import SessionMember
+from session.roles import get_session_roles
 
 class IsSessionMember(permissions.BasePermission):
     """
@@ -22,9 +22,9 @@ class IsSessionMember(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         """Verifica se o usuário é membro da sessão ou master"""
-        is_master = obj.session.master == request.user
-        is_member = obj.session.members.filter(user=request.user).exists()
-        return is_master or is_member
+        if get_session_roles(request).is_member(obj.session_id):
+            return True
+        return obj.session.master_id == request.user.id
 
 
 class IsSessionGM(permissions.BasePermission):
@@ -37,14 +37,9 @@ class IsSessionGM(permissions.BasePermission):
             session_id = request.data.get("session")
             if not session_id:
                 return False
-            try:
-                from session.models import Session
-                session = Session.objects.get(id=session_id)
-                return session.master == request.user
-            except Session.DoesNotExist:
-                return False
+            return get_session_roles(request).role(session_id) == "MASTER"
         return True
 
     def has_object_permission(self, request, view, obj):
         """Verifica se o usuário é o mestre da sessão"""
-        return obj.session.master == request.user
\ No newline at end of file
+        return obj.session.master_id == request.user.id
\ No newline at end of file
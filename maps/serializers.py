@@ -1,8 +1,22 @@
 from rest_framework import serializers
-from .models import SessionMap
+from core.lean import LeanSerializer, datetime_repr, uuid_repr
+from core.sparse import SparseFieldsMixin
+from .fog import MAX_VISION_RADIUS, check_grid
+from .models import SessionMap, MapToken, TokenVisibility
 from session.models import Session
+from session.roles import get_session_roles
 
-class SessionMapSerializer(serializers.ModelSerializer):
+
+def validate_grid(serializer, attrs):
+    """Largura/altura/grid (novos ou os atuais do mapa) dentro do teto de células"""
+    current = serializer.instance or SessionMap()
+    try:
+        check_grid(*(attrs.get(name, getattr(current, name)) for name in ('width', 'height', 'grid_size')))
+    except ValueError as e:
+        raise serializers.ValidationError({'grid_size': str(e)})
+    return attrs
+
+class SessionMapSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     session_name = serializers.CharField(source='session.name', read_only=True)
     session_master = serializers.CharField(source='session.master.username', read_only=True)
     
@@ -20,19 +34,48 @@ class SessionMapSerializer(serializers.ModelSerializer):
             "width",
             "height",
             "is_active",
+            "fog_enabled",
             "created_at",
         ]
         read_only_fields = ["id", "created_at", "session_name", "session_master"]
     
+    def validate(self, attrs):
+        return validate_grid(self, attrs)
+
     def validate_session(self, value):
         """Valida se o usuário é membro da sessão"""
-        user = self.context['request'].user
-        if not value.members.filter(user=user).exists():
+        if not get_session_roles(self.context['request']).is_member(value.pk):
             raise serializers.ValidationError(
                 "Você não tem acesso a esta sessão."
             )
         return value
 
+class SessionMapLeanSerializer(LeanSerializer):
+    """Listagem de mapas: mesma saída do SessionMapSerializer, via .values()"""
+
+    values = (
+        "id", "session_id", "session__name", "session__master__username", "name",
+        "image_url", "grid_enabled", "grid_size", "width", "height", "is_active", "fog_enabled",
+        "created_at",
+    )
+
+    def to_representation(self, row):
+        return {
+            "id": uuid_repr(row["id"]),
+            "session": row["session_id"],
+            "session_name": row["session__name"],
+            "session_master": row["session__master__username"],
+            "name": row["name"],
+            "image_url": row["image_url"],
+            "grid_enabled": row["grid_enabled"],
+            "grid_size": row["grid_size"],
+            "width": row["width"],
+            "height": row["height"],
+            "is_active": row["is_active"],
+            "fog_enabled": row["fog_enabled"],
+            "created_at": datetime_repr(row["created_at"]),
+        }
+
 class SessionMapCreateSerializer(serializers.ModelSerializer):
     """Serializer específico para criação de mapas"""
     
@@ -46,19 +89,23 @@ class SessionMapCreateSerializer(serializers.ModelSerializer):
             "grid_size",
             "width",
             "height",
+            "fog_enabled",
         ]
 
+    def validate(self, attrs):
+        return validate_grid(self, attrs)
+
     def validate_session(self, value):
         """Valida se a sessão existe e o usuário tem acesso"""
-        user = self.context['request'].user
+        request = self.context['request']
         
         try:
             # Verifica se o usuário é master da sessão
-            if value.master == user:
+            if value.master_id == request.user.id:
                 return value
                 
             # Verifica se o usuário é membro da sessão
-            if value.members.filter(user=user).exists():
+            if get_session_roles(request).is_member(value.pk):
                 return value
                 
             raise serializers.ValidationError(
@@ -69,7 +116,7 @@ class SessionMapCreateSerializer(serializers.ModelSerializer):
                 "Sessão não encontrada."
             )
 
-class SessionMapDetailSerializer(serializers.ModelSerializer):
+class SessionMapDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer detalhado para visualização de mapas"""
     session_info = serializers.SerializerMethodField()
     can_edit = serializers.SerializerMethodField()
@@ -87,10 +134,15 @@ class SessionMapDetailSerializer(serializers.ModelSerializer):
             "width",
             "height",
             "is_active",
+            "fog_enabled",
             "created_at",
             "can_edit",
         ]
         read_only_fields = ["id", "created_at", "session_info", "can_edit"]
+        field_sources = {
+            "session_info": ("session.id", "session.name", "session.master.username", "session.status"),
+            "can_edit": ("session",),
+        }
     
     def get_session_info(self, obj):
         return {
@@ -102,4 +154,97 @@ class SessionMapDetailSerializer(serializers.ModelSerializer):
     
     def get_can_edit(self, obj):
         user = self.context['request'].user
-        return obj.session.master == user
\ No newline at end of file
+        return obj.session.master_id == user.id
+
+
+class MapTokenSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = MapToken
+        fields = [
+            "id",
+            "map",
+            "character",
+            "npc",
+            "name",
+            "image_url",
+            "x",
+            "y",
+            "rotation",
+            "scale",
+            "is_hidden",
+            "vision_radius",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = ["id", "created_at", "updated_at"]
+
+    def validate_map(self, value):
+        """Só o mestre da sessão coloca tokens no mapa"""
+        if self.instance is not None and value.pk != self.instance.map_id:
+            raise serializers.ValidationError("O token não pode mudar de mapa.")
+        if get_session_roles(self.context['request']).role(value.session_id) != "MASTER":
+            raise serializers.ValidationError("Apenas o mestre pode adicionar tokens.")
+        return value
+
+    def validate_vision_radius(self, value):
+        if value > MAX_VISION_RADIUS:
+            raise serializers.ValidationError(f"O alcance máximo é {MAX_VISION_RADIUS} células.")
+        return value
+
+    def validate_scale(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("A escala deve ser maior que zero.")
+        return value
+
+    def validate(self, attrs):
+        session_map = attrs.get("map") or self.instance.map
+        character = attrs.get("character")
+        if character is not None and not character.sessioncharacter_set.filter(
+            session_id=session_map.session_id
+        ).exists():
+            raise serializers.ValidationError({"character": "Personagem não está nesta sessão."})
+        npc = attrs.get("npc")
+        if npc is not None and npc.session_id != session_map.session_id:
+            raise serializers.ValidationError({"npc": "NPC não pertence a esta sessão."})
+        return attrs
+
+
+class MapTokenLeanSerializer(LeanSerializer):
+    """Listagem de tokens: mesma saída do MapTokenSerializer, via .values()"""
+
+    values = (
+        "id", "map_id", "character_id", "npc_id", "name", "image_url",
+        "x", "y", "rotation", "scale", "is_hidden", "vision_radius", "created_at", "updated_at",
+    )
+
+    def to_representation(self, row):
+        return {
+            "id": uuid_repr(row["id"]),
+            "map": row["map_id"],
+            "character": row["character_id"],
+            "npc": row["npc_id"],
+            "name": row["name"],
+            "image_url": row["image_url"],
+            "x": row["x"],
+            "y": row["y"],
+            "rotation": row["rotation"],
+            "scale": row["scale"],
+            "is_hidden": row["is_hidden"],
+            "vision_radius": row["vision_radius"],
+            "created_at": datetime_repr(row["created_at"]),
+            "updated_at": datetime_repr(row["updated_at"]),
+        }
+
+
+class TokenVisibilitySerializer(serializers.ModelSerializer):
+    """Regra de visibilidade de um token para um usuário da sessão"""
+
+    class Meta:
+        model = TokenVisibility
+        fields = ["user", "can_see"]
+
+    def validate_user(self, value):
+        member_ids = self.context.get("member_ids")
+        if member_ids is not None and value.pk not in member_ids:
+            raise serializers.ValidationError("Usuário não é membro da sessão.")
+        return value
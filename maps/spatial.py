@@ -0,0 +1,228 @@
+"""
+Índice espacial dos tokens de cada mapa (grade uniforme em memória).
+
+UniformGrid divide o plano em células quadradas de ``cell_size`` pixels e
+guarda em cada célula os ids dos tokens cuja posição cai nela; consultas por
+retângulo (viewport, área) e por raio só olham as células que os cruzam.
+
+``token_index(session_map)`` devolve o índice do mapa, mantido em memória no
+processo (LRU de ``MAX_INDEXES`` mapas, células de ``CELL_SQUARES`` quadrados
+do grid). Cada alteração de token grava uma nova geração no próprio
+SessionMap, visível a todos os processos mesmo sem cache compartilhado: o
+índice é reconstruído quando a geração muda, ou atualizado no lugar quando a
+única mudança foi deste processo. As posições gravadas pelo MapState
+(maps/live.py) contam em positions_generation, separada das edições
+(tokens_generation): os mapas abertos em outros processos já receberam esses
+movimentos pelo grupo e não precisam recarregar.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import MapToken, SessionMap, TokenVisibility
+
+CELL_SQUARES = 4
+MAX_INDEXES = 64
+
+
+class UniformGrid:
+    """Pontos (chave -> x, y) indexados numa grade de células quadradas"""
+
+    def __init__(self, cell_size):
+        self.cell_size = float(cell_size)
+        self.cells = {}
+        self.points = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.points)
+
+    def _cell(self, x, y):
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def insert(self, key, x, y):
+        """Adiciona `key` em (x, y), ou move se já existir"""
+        with self._lock:
+            self.remove(key)
+            self.points[key] = (x, y)
+            self.cells.setdefault(self._cell(x, y), set()).add(key)
+
+    def remove(self, key):
+        with self._lock:
+            point = self.points.pop(key, None)
+            if point is None:
+                return
+            cell = self._cell(*point)
+            keys = self.cells[cell]
+            keys.discard(key)
+            if not keys:
+                del self.cells[cell]
+
+    def _cells_in(self, x0, y0, x1, y1):
+        """(chaves, célula inteira dentro?) das células ocupadas que cruzam o retângulo"""
+        cx0, cy0 = self._cell(x0, y0)
+        cx1, cy1 = self._cell(x1, y1)
+        cells = self.cells
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) <= len(cells):
+            candidates = ((cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1))
+        else:
+            # Retângulo maior que a parte ocupada: percorre só as células com tokens
+            candidates = (cell for cell in cells if cx0 <= cell[0] <= cx1 and cy0 <= cell[1] <= cy1)
+        for cell in candidates:
+            keys = cells.get(cell)
+            if keys:
+                cx, cy = cell
+                yield keys, cx0 < cx < cx1 and cy0 < cy < cy1
+
+    def in_rect(self, x0, y0, x1, y1):
+        """Chaves com x0 <= x <= x1 e y0 <= y <= y1"""
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        points = self.points
+        found = []
+        with self._lock:
+            for keys, inside in self._cells_in(x0, y0, x1, y1):
+                if inside:
+                    found.extend(keys)
+                    continue
+                for key in keys:
+                    x, y = points[key]
+                    if x0 <= x <= x1 and y0 <= y <= y1:
+                        found.append(key)
+        return found
+
+    def in_radius(self, x, y, radius):
+        """Chaves a até `radius` de (x, y)"""
+        limit = radius * radius
+        points = self.points
+        found = []
+        with self._lock:
+            for keys, _ in self._cells_in(x - radius, y - radius, x + radius, y + radius):
+                for key in keys:
+                    px, py = points[key]
+                    if (px - x) ** 2 + (py - y) ** 2 <= limit:
+                        found.append(key)
+        return found
+
+
+_indexes = OrderedDict()  # map_id -> ((edições, posições), UniformGrid)
+_indexes_lock = threading.Lock()
+
+
+GENERATION_FIELDS = ('tokens_generation', 'positions_generation')
+
+
+def tokens_generation(map_id):
+    """Geração das edições dos tokens do mapa (None se o mapa não existir)"""
+    return SessionMap.objects.filter(pk=map_id).values_list('tokens_generation', flat=True).first()
+
+
+def _generations(map_id):
+    """(edições, posições) do mapa (None se o mapa não existir)"""
+    return SessionMap.objects.filter(pk=map_id).values_list(*GENERATION_FIELDS).first()
+
+
+def _next_generation(map_id, field):
+    """(anteriores, novas) gerações do mapa com `field` trocada sob lock da linha"""
+    with transaction.atomic():
+        previous = SessionMap.objects.select_for_update().filter(pk=map_id).values_list(
+            *GENERATION_FIELDS
+        ).first()
+        if previous is None:
+            return None, None
+        # Sempre crescente e nunca repetida, mesmo que um save() do mapa com a
+        # instância antiga regrave um valor anterior
+        index = GENERATION_FIELDS.index(field)
+        value = max(previous[index] + 1, time.time_ns())
+        SessionMap.objects.filter(pk=map_id).update(**{field: value})
+    generation = list(previous)
+    generation[index] = value
+    return tuple(previous), tuple(generation)
+
+
+def tokens_changed(map_id, moved=(), removed=(), positions=True, flushed=False):
+    """
+    Registra alteração nos tokens do mapa. `moved` são (id, x, y) e
+    `removed` são ids, aplicados no índice deste processo quando possível;
+    sem eles (ex: após bulk_create/update) o índice é reconstruído.
+    positions=False: nada do índice mudou (visibilidade, dados do mapa).
+    flushed=True: só posições gravadas pelo MapState (não conta como edição).
+    Retorna (gerações anteriores, novas); (None, None) sem o mapa.
+    """
+    field = 'positions_generation' if flushed else 'tokens_generation'
+    previous, generation = _next_generation(map_id, field)
+
+    with _indexes_lock:
+        entry = _indexes.get(map_id)
+        if entry is None:
+            return previous, generation
+        if generation is None or entry[0] != previous or (positions and not (moved or removed)):
+            # Mudança desconhecida ou de outro processo: reconstrói na próxima consulta
+            del _indexes[map_id]
+            return previous, generation
+        grid = entry[1]
+        for pk, x, y in moved:
+            grid.insert(pk, x, y)
+        for pk in removed:
+            grid.remove(pk)
+        _indexes[map_id] = (generation, grid)
+    return previous, generation
+
+
+def token_index(session_map):
+    """UniformGrid com as posições dos tokens do mapa"""
+    map_id = session_map.pk
+    generation = _generations(map_id)
+    cell_size = max(session_map.grid_size or 0, 1) * CELL_SQUARES
+
+    with _indexes_lock:
+        entry = _indexes.get(map_id)
+        if entry is not None and entry[0] == generation and entry[1].cell_size == cell_size:
+            _indexes.move_to_end(map_id)
+            return entry[1]
+
+    grid = UniformGrid(cell_size)
+    for pk, x, y in MapToken.objects.filter(map_id=map_id).values_list('id', 'x', 'y').iterator():
+        grid.insert(pk, x, y)
+
+    with _indexes_lock:
+        _indexes[map_id] = (generation, grid)
+        _indexes.move_to_end(map_id)
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return grid
+
+
+@receiver(post_save, sender=MapToken)
+def map_token_saved(sender, instance, **kwargs):
+    tokens_changed(instance.map_id, moved=[(instance.pk, instance.x, instance.y)])
+
+
+@receiver(post_delete, sender=MapToken)
+def map_token_deleted(sender, instance, origin=None, **kwargs):
+    # Em cascata (mapa ou sessão apagados) o índice vai junto
+    if isinstance(origin, MapToken) or getattr(origin, 'model', None) is MapToken:
+        tokens_changed(instance.map_id, removed=[instance.pk])
+
+
+@receiver(post_save, sender=SessionMap)
+def session_map_saved(sender, instance, created, **kwargs):
+    # Grid, tamanho, névoa ou bloqueios alterados: os mapas abertos recarregam
+    if not created:
+        tokens_changed(instance.pk, positions=False)
+
+
+@receiver(post_save, sender=TokenVisibility)
+@receiver(post_delete, sender=TokenVisibility)
+def token_visibility_changed(sender, instance, origin=None, **kwargs):
+    # Apagadas junto com o token/mapa: a alteração do token já conta
+    if origin is not None and getattr(origin, 'model', type(origin)) is not TokenVisibility:
+        return
+    map_id = MapToken.objects.filter(pk=instance.token_id).values_list('map_id', flat=True).first()
+    if map_id is not None:
+        tokens_changed(map_id, positions=False)
@@ -1,8 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import SessionMapViewSet
+from .views import SessionMapViewSet, MapTokenViewSet
 
 router = DefaultRouter()
 router.register(r"maps", SessionMapViewSet, basename="maps")
+router.register(r"tokens", MapTokenViewSet, basename="tokens")
 
 urlpatterns = [path("", include(router.urls))]
\ No newline at end of file
@@ -1,25 +1,40 @@
+import math
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
 from django.db.models import Q
-from .models import SessionMap
+from core.conditional import ConditionalGetMixin
+from core.lean import LeanListMixin
+from core.sparse import SparseFieldsViewMixin
+from .models import SessionMap, MapToken, TokenVisibility
 from .serializers import (
     SessionMapSerializer, 
     SessionMapCreateSerializer,
-    SessionMapDetailSerializer
+    SessionMapDetailSerializer,
+    SessionMapLeanSerializer,
+    MapTokenSerializer,
+    MapTokenLeanSerializer,
+    TokenVisibilitySerializer,
 )
+from .fog import check_grid, decode_mask, encode_mask, grid_shape, mask_bytes
+from .pathfinding import MAX_BUDGET, decode_layer, encode_layer, movement_grid
+from .spatial import token_index, tokens_changed
 from .permissions import IsSessionMember, IsSessionGM
 from session.models import Session
+from session.roles import get_session_roles
 
 
-class SessionMapViewSet(viewsets.ModelViewSet):
+class SessionMapViewSet(SparseFieldsViewMixin, LeanListMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated, IsSessionMember]
+    lean_serializer_class = SessionMapLeanSerializer
     
     def get_queryset(self):
-        queryset = SessionMap.objects.filter(
-            session__members__user=self.request.user
-        ).select_related('session', 'session__master').distinct()
+        queryset = SessionMap.objects.accessible_to(
+            self.request.user
+        ).select_related('session', 'session__master')
         
         # Filtro por sessão
         session_id = self.request.query_params.get('session')
@@ -53,12 +68,12 @@ class SessionMapViewSet(viewsets.ModelViewSet):
 
     def perform_update(self, serializer):
         obj = self.get_object()
-        if obj.session.master != self.request.user:
+        if obj.session.master_id != self.request.user.id:
             raise PermissionDenied("Apenas o mestre pode editar mapas.")
         serializer.save()
 
     def perform_destroy(self, instance):
-        if instance.session.master != self.request.user:
+        if instance.session.master_id != self.request.user.id:
             raise PermissionDenied("Apenas o mestre pode remover mapas.")
         instance.delete()
 
@@ -71,7 +86,7 @@ class SessionMapViewSet(viewsets.ModelViewSet):
     def toggle_active(self, request, pk=None):
         """Ativa/desativa um mapa"""
         map_obj = self.get_object()
-        if map_obj.session.master != request.user:
+        if map_obj.session.master_id != request.user.id:
             raise PermissionDenied("Apenas o mestre pode ativar/desativar mapas.")
         
         map_obj.is_active = not map_obj.is_active
@@ -80,6 +95,71 @@ class SessionMapViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(map_obj)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['get', 'put'])
+    def blockers(self, request, pk=None):
+        """
+        Células que bloqueiam a visão na névoa de guerra. O bitset (bit
+        row * cols + col) vai comprimido com zlib em base64, no mesmo
+        formato das máscaras enviadas pelo WebSocket
+        """
+        map_obj = self.get_object()
+        if map_obj.session.master_id != request.user.id:
+            raise PermissionDenied("Apenas o mestre pode ver ou editar os bloqueios do mapa.")
+
+        try:
+            check_grid(map_obj.width, map_obj.height, map_obj.grid_size)
+        except ValueError as e:
+            raise ValidationError({'grid_size': str(e)})
+        cols, rows = grid_shape(map_obj.width, map_obj.height, map_obj.grid_size)
+        nbytes = mask_bytes(cols, rows)
+        if request.method == 'PUT':
+            if not cols:
+                raise ValidationError({'blockers': "Defina largura, altura e grid do mapa."})
+            try:
+                mask = decode_mask(request.data.get('blockers') or '', nbytes)
+            except ValueError as e:
+                raise ValidationError({'blockers': str(e)})
+            map_obj.blockers = mask.to_bytes(nbytes, 'little')
+            map_obj.save(update_fields=['blockers'])
+
+        mask = int.from_bytes(bytes(map_obj.blockers)[:nbytes], 'little')
+        return Response({
+            'cols': cols,
+            'rows': rows,
+            'blockers': encode_mask(mask, nbytes),
+        })
+
+    @action(detail=True, methods=['get', 'put'])
+    def terrain(self, request, pk=None):
+        """
+        Custo de movimento por célula (um byte: 0/1 normal, 2..254 multiplica
+        o custo, 255 intransponível), comprimido com zlib em base64. Só o
+        mestre edita
+        """
+        map_obj = self.get_object()
+        try:
+            check_grid(map_obj.width, map_obj.height, map_obj.grid_size)
+        except ValueError as e:
+            raise ValidationError({'grid_size': str(e)})
+        cols, rows = grid_shape(map_obj.width, map_obj.height, map_obj.grid_size)
+        size = cols * rows
+        if request.method == 'PUT':
+            if map_obj.session.master_id != request.user.id:
+                raise PermissionDenied("Apenas o mestre pode editar o terreno do mapa.")
+            if not cols:
+                raise ValidationError({'terrain': "Defina largura, altura e grid do mapa."})
+            try:
+                map_obj.terrain = decode_layer(request.data.get('terrain') or '', size)
+            except ValueError as e:
+                raise ValidationError({'terrain': str(e)})
+            map_obj.save(update_fields=['terrain'])
+
+        return Response({
+            'cols': cols,
+            'rows': rows,
+            'terrain': encode_layer(bytes(map_obj.terrain)[:size].ljust(size, b'\0')),
+        })
+
     @action(detail=False, methods=['get'])
     def by_session(self, request):
         """Lista mapas de uma sessão específica"""
@@ -99,9 +179,183 @@ class SessionMapViewSet(viewsets.ModelViewSet):
             )
         
         # Verifica se o usuário é membro da sessão
-        if not session.members.filter(user=request.user).exists():
+        if not get_session_roles(request).is_member(session.pk):
             raise PermissionDenied("Você não tem acesso a esta sessão.")
         
         maps = SessionMap.objects.filter(session=session).order_by('-created_at')
+        if self.uses_lean_list():
+            rows = SessionMapLeanSerializer.get_rows(maps)
+            return Response(self.get_lean_serializer(rows).data)
         serializer = self.get_serializer(maps, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+
+def _parse_numbers(value, count, name):
+    try:
+        numbers = [float(part) for part in value.split(',')]
+    except ValueError:
+        numbers = []
+    if len(numbers) != count or not all(map(math.isfinite, numbers)):
+        raise ValidationError({name: f"Informe {count} números separados por vírgula."})
+    return numbers
+
+
+class MapTokenViewSet(ConditionalGetMixin, SparseFieldsViewMixin, LeanListMixin, viewsets.ModelViewSet):
+    """
+    Tokens dos mapas. Com ?map=<id>, aceita consultas por região resolvidas
+    no índice espacial do mapa (maps/spatial.py):
+    ?bbox=x0,y0,x1,y1 (viewport/área) e ?near=x,y&radius=r.
+    """
+    serializer_class = MapTokenSerializer
+    lean_serializer_class = MapTokenLeanSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    # Campos que o dono do personagem pode alterar no próprio token
+    owner_fields = {"x", "y", "rotation"}
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = MapToken.objects.accessible_to(user)
+        if self.request.method in permissions.SAFE_METHODS:
+            queryset = queryset.visible_to(user)
+
+        map_id = self.request.query_params.get('map')
+        if map_id:
+            session_map = self.get_session_map(map_id)
+            queryset = queryset.filter(map=session_map)
+            region = self.get_region_ids(session_map)
+            if region is not None:
+                queryset = queryset.filter(pk__in=region)
+        elif self.action == 'list' and self.has_region_params():
+            raise ValidationError({'map': "map é obrigatório nas consultas por região."})
+        return queryset.order_by('-created_at')
+
+    def get_session_map(self, map_id):
+        try:
+            return SessionMap.objects.accessible_to(self.request.user).get(pk=map_id)
+        except (SessionMap.DoesNotExist, DjangoValidationError, ValueError):
+            raise NotFound("Mapa não encontrado.")
+
+    def has_region_params(self):
+        params = self.request.query_params
+        return 'bbox' in params or 'near' in params
+
+    def get_region_ids(self, session_map):
+        """Ids dos tokens da região pedida (None se não houver filtro de região)"""
+        params = self.request.query_params
+        if 'bbox' in params:
+            x0, y0, x1, y1 = _parse_numbers(params['bbox'], 4, 'bbox')
+            return token_index(session_map).in_rect(x0, y0, x1, y1)
+        if 'near' in params:
+            x, y = _parse_numbers(params['near'], 2, 'near')
+            (radius,) = _parse_numbers(params.get('radius', ''), 1, 'radius')
+            if radius < 0:
+                raise ValidationError({'radius': "O raio não pode ser negativo."})
+            return token_index(session_map).in_radius(x, y, radius)
+        return None
+
+    def perform_update(self, serializer):
+        token = serializer.instance
+        session = token.map.session
+        if session.master_id != self.request.user.id:
+            owner_id = token.character.user_id if token.character_id else None
+            if owner_id != self.request.user.id or not set(serializer.validated_data) <= self.owner_fields:
+                raise PermissionDenied("Apenas o mestre pode editar este token.")
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        if instance.map.session.master_id != self.request.user.id:
+            raise PermissionDenied("Apenas o mestre pode remover tokens.")
+        instance.delete()
+
+    @action(detail=True, methods=['get', 'put'])
+    def visibility(self, request, pk=None):
+        """
+        Exceções de visibilidade do token por usuário (só o mestre). O PUT
+        substitui a lista: [{"user": id, "can_see": true|false}, ...]
+        """
+        token = self.get_object()
+        session = token.map.session
+        if session.master_id != request.user.id:
+            raise PermissionDenied("Apenas o mestre pode definir quem vê o token.")
+
+        if request.method == 'PUT':
+            member_ids = set(session.members.values_list('user_id', flat=True))
+            serializer = TokenVisibilitySerializer(
+                data=request.data, many=True, context={'member_ids': member_ids}
+            )
+            serializer.is_valid(raise_exception=True)
+            users = [rule['user'].pk for rule in serializer.validated_data]
+            if len(set(users)) != len(users):
+                raise ValidationError({'user': "Cada usuário só pode aparecer uma vez."})
+            with transaction.atomic():
+                token.visibility.all().delete()
+                TokenVisibility.objects.bulk_create([
+                    TokenVisibility(token=token, **rule) for rule in serializer.validated_data
+                ])
+            # bulk_create não dispara signals: os mapas abertos recarregam por aqui
+            tokens_changed(token.map_id, positions=False)
+
+        rules = token.visibility.order_by('user_id')
+        return Response(TokenVisibilitySerializer(rules, many=True).data)
+
+    def get_movement(self, token):
+        """(MovementGrid do mapa, célula atual do token)"""
+        session_map = token.map
+        try:
+            check_grid(session_map.width, session_map.height, session_map.grid_size)
+        except ValueError as e:
+            raise ValidationError({'map': str(e)})
+        grid = movement_grid(session_map)
+        if grid is None:
+            raise ValidationError({'map': "Defina largura, altura e grid do mapa."})
+        return grid, grid.cell_at(token.x, token.y, session_map.grid_size)
+
+    def get_budget(self, required):
+        value = self.request.query_params.get('budget')
+        if value is None and not required:
+            return None
+        (budget,) = _parse_numbers(value or '', 1, 'budget')
+        if not 0 <= budget <= MAX_BUDGET:
+            raise ValidationError({'budget': f"O deslocamento deve estar entre 0 e {MAX_BUDGET}."})
+        return budget
+
+    @action(detail=True, methods=['get'])
+    def path(self, request, pk=None):
+        """
+        Menor caminho do token até ?to=x,y (pixels), em células [col, row].
+        ?budget=n descarta caminhos que custem mais que n. Sem caminho (ou
+        com a busca passando de MAX_PATH_NODES células) volta cost null
+        """
+        token = self.get_object()
+        grid, start = self.get_movement(token)
+        x, y = _parse_numbers(request.query_params.get('to', ''), 2, 'to')
+        goal = grid.cell_at(x, y, token.map.grid_size)
+        found = grid.path(start, goal, self.get_budget(required=False))
+        cost, cells = found if found is not None else (None, [])
+        return Response({
+            'cost': cost,
+            'path': [[cell % grid.cols, cell // grid.cols] for cell in cells],
+        })
+
+    @action(detail=True, methods=['get'])
+    def reachable(self, request, pk=None):
+        """
+        Células que o token alcança gastando até ?budget=n, como máscara no
+        formato da névoa (bit row * cols + col, zlib em base64)
+        """
+        token = self.get_object()
+        grid, start = self.get_movement(token)
+        budget = self.get_budget(required=True)
+        cells = grid.reachable(start, budget)
+        return Response({
+            'cols': grid.cols,
+            'rows': grid.rows,
+            'budget': budget,
+            'count': len(cells),
+            'reachable': grid.encode_reachable(cells),
+        })
+
+    def destroy(self, request, *args, **kwargs):
+        instance = self.get_object()
+        self.perform_destroy(instance)
+        return Response({"message": "Apagado com sucesso"}, status=200)
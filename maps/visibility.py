@@ -0,0 +1,113 @@
+"""
+Quem vê cada token de um mapa, pré-calculado em memória.
+
+A regra é a mesma de ``MapToken.objects.visible_to``: o mestre vê tudo, o
+dono do personagem vê o próprio token e, para os demais, vale o
+TokenVisibility (can_see) do usuário ou, sem ele, o ``is_hidden`` do token.
+
+Em vez de checar cada token para cada destinatário a cada movimento, os
+usuários são agrupados em audiências: a audiência é o conjunto de tokens
+restritos (ocultos ou com alguma regra) que o usuário vê. Quem tem a mesma
+audiência recebe exatamente os mesmos frames, então cada frame é montado e
+serializado uma vez por audiência (ou por conteúdo distinto), não por socket.
+"""
+
+# Audiência do mestre: vê todos os tokens
+EVERYTHING = None
+
+
+class TokenAudiences:
+
+    def __init__(self, master_id, tokens, rules=None, members=()):
+        """
+        `tokens`: {token_id: (owner_id, is_hidden)};
+        `rules`: {token_id: {user_id: can_see}}
+        """
+        self.master_id = master_id
+        self.tokens = tokens
+        self.rules = rules or {}
+        # Tokens restritos: todos os que não são simplesmente públicos
+        self.restricted = {
+            token_id
+            for token_id, (owner_id, is_hidden) in tokens.items()
+            if is_hidden or token_id in self.rules
+        }
+        self._audiences = {}
+        self._interned = {}
+        for user_id in members:
+            self.audience_of(user_id)
+
+    def can_see(self, user_id, token_id):
+        if user_id == self.master_id:
+            return True
+        token = self.tokens.get(token_id)
+        if token is None:
+            return False
+        owner_id, is_hidden = token
+        if owner_id is not None and owner_id == user_id:
+            return True
+        rule = self.rules.get(token_id, {}).get(user_id)
+        if rule is not None:
+            return rule
+        return not is_hidden
+
+    def audience_of(self, user_id):
+        """Audiência do usuário (frozenset de tokens restritos visíveis, ou EVERYTHING)"""
+        if user_id == self.master_id:
+            return EVERYTHING
+        audience = self._audiences.get(user_id)
+        if audience is None:
+            audience = frozenset(
+                token_id for token_id in self.restricted if self.can_see(user_id, token_id)
+            )
+            # Mesma audiência, mesmo objeto: comparações e hashes baratos
+            audience = self._interned.setdefault(audience, audience)
+            self._audiences[user_id] = audience
+        return audience
+
+    def audience_count(self):
+        return len(self._interned)
+
+    def sees(self, audience, token_id):
+        return audience is EVERYTHING or token_id not in self.restricted or token_id in audience
+
+
+class AudienceFrames:
+    """
+    Frames de um evento por audiência: `items` são entradas cujo primeiro
+    elemento é o token_id e `build(items)` monta o texto (None se vazio)
+    """
+
+    def __init__(self, audiences, items, build):
+        self.audiences = audiences
+        self.items = items
+        self.build = build
+        self._by_audience = {}
+        self._by_content = {}
+        self._restricted = any(item[0] in audiences.restricted for item in items)
+
+    def for_audience(self, audience):
+        try:
+            return self._by_audience[audience]
+        except KeyError:
+            pass
+        audiences = self.audiences
+        if audience is EVERYTHING or not self._restricted:
+            included = None  # tudo
+        else:
+            included = tuple(
+                index for index, item in enumerate(self.items) if audiences.sees(audience, item[0])
+            )
+            if len(included) == len(self.items):
+                included = None
+        # Audiências diferentes com o mesmo conteúdo dividem o texto
+        text = self._by_content.get(included, False)
+        if text is False:
+            if included is None:
+                items = self.items
+            else:
+                items = [self.items[index] for index in included]
+            text = self.build(items) if items else None
+            self._by_content[included] = text
+        self._by_audience[audience] = text
+        return text
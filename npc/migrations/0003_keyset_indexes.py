@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 07:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('npc', '0002_alter_npc_note'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='npc',
+            index=models.Index(fields=['session', 'created_at'], name='npc_npc_session_9cddb1_idx'),
+        ),
+    ]
@@ -38,6 +38,9 @@ class NPC(models.Model):
 		verbose_name = "NPC"
 		verbose_name_plural = "NPCs"
 		ordering = ["-created_at"]
+		indexes = [
+			models.Index(fields=["session", "created_at"]),
+		]
 
 	def __str__(self):
 		return f"{self.name} ({self.get_type_display()}) - {self.session.name}"
@@ -1,7 +1,8 @@
 from rest_framework import serializers
+from core.sparse import SparseFieldsMixin
 from .models import NPC
 
-class NPCSerializer(serializers.ModelSerializer):
+class NPCSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = NPC
         fields = [
@@ -1,5 +1,7 @@
 from rest_framework import viewsets, permissions, filters
 from rest_framework.response import Response
+from core.conditional import ConditionalGetMixin
+from core.sparse import SparseFieldsViewMixin
 from .models import NPC
 from .serializers import NPCSerializer
 
@@ -8,9 +10,9 @@ class IsSessionMaster(permissions.BasePermission):
     Permite acesso apenas ao mestre da sessão para criar/editar/remover NPCs.
     """
     def has_object_permission(self, request, view, obj):
-        return obj.session.master == request.user
+        return obj.session.master_id == request.user.id
 
-class NPCViewSet(viewsets.ModelViewSet):
+class NPCViewSet(ConditionalGetMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
     serializer_class = NPCSerializer
     permission_classes = [permissions.IsAuthenticated, IsSessionMaster]
     filter_backends = [filters.OrderingFilter, filters.SearchFilter]
@@ -1,19 +1,92 @@
-import json
+import uuid
+import time
+import asyncio
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.contrib.auth.models import AnonymousUser
+
+from core.renderers import dumps, loads
+
+from maps.live import MoveError, get_map_state, release_map_state
+from session.events import event_log
+from session.roles import SessionRoles
+from session.services import get_session_for_room
+
+from . import dice
+from .ratelimit import TokenBucket
+from .rooms import ROLL_ACTIONS, get_room, release_room
+
+# Ações de alta frequência (ex: arrastar token) que podem ser agrupadas.
+# Clientes em modo batch recebem só a última mensagem de cada chave a cada
+# COALESCE_INTERVAL segundos, em um único frame (lista JSON).
+COALESCED_ACTIONS = {'move_token', 'token_move', 'token_drag', 'cursor', 'ping'}
+COALESCE_INTERVAL = 0.05
+
+
+def coalesce_key(data, sender_name):
+    """Chave usada para agrupar mensagens de alta frequência (None = não agrupa)"""
+    action = data.get('action')
+    if action not in COALESCED_ACTIONS:
+        return None
+    target = data.get('token_id') or data.get('id') or sender_name
+    return f'{action}:{target}'
+
 
 class DiceConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.room_code = self.scope['url_route']['kwargs']['room_code']
         self.room_group_name = f'dice_{self.room_code}'
 
+        # ws/session/<sala>/?batch=1 ativa o agrupamento de mensagens
+        params = parse_qs(self.scope.get('query_string', b'').decode())
+        self.batch_mode = params.get('batch', ['0'])[0].lower() in ('1', 'true')
+        self._pending = {}
+        self._flush_task = None
+        self.room = get_room(self.room_code)
+
+        # Sessão dona da sala e papel do usuário nela, resolvidos uma vez
+        # por conexão (None = sala avulsa ou não membro)
+        self.session_id, self.session_role = await database_sync_to_async(self.load_session)()
+
         # Entra no grupo (canal)
         await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
         )
         await self.accept()
+        await self.send_initial_state(params)
+
+    def load_session(self):
+        session = get_session_for_room(self.room_code)
+        if session is None:
+            return None, None
+        roles = SessionRoles(self.scope.get('user') or AnonymousUser())
+        return session.pk, roles.role(session.pk)
+
+    async def send_initial_state(self, params):
+        """
+        Envia os deltas perdidos (?epoch=<epoch>&since=<seq>) ou, se não der
+        para retomar, um snapshot compacto do estado da sala
+        """
+        epoch = params.get('epoch', [None])[0]
+        try:
+            since = int(params['since'][0])
+        except (KeyError, ValueError):
+            since = None
+
+        deltas = self.room.deltas_since(epoch, since)
+        if deltas is None:
+            await self.send(text_data=dumps(self.room.snapshot()))
+            return
+        for text in deltas:
+            await self.send(text_data=text)
 
     async def disconnect(self, close_code):
+        if self._flush_task:
+            self._flush_task.cancel()
+        release_room(self.room)
+
         # Sai do grupo
         await self.channel_layer.group_discard(
             self.room_group_name,
@@ -26,28 +99,210 @@ class DiceConsumer(AsyncWebsocketConsumer):
 
         try:
             # Transforma o que veio do front em dicionário Python
-            data = json.loads(text_data)
-        except json.JSONDecodeError:
+            data = loads(text_data)
+        except ValueError:
+            return
+
+        if not isinstance(data, dict):
             return
 
         # Identifica quem enviou (opcional, mas útil para o front saber quem rolou)
         user = self.scope.get('user')
         sender_name = user.username if user and hasattr(user, 'username') and user.is_authenticated else 'Anônimo'
-        
+
         # Adiciona o remetente ao pacote de dados original
         data['sender_username'] = sender_name
 
-        # Manda o objeto INTEIRO (com qualquer action que você inventar no front)
-        # para todos os outros membros do grupo
+        # Rolagens com "expression" são feitas no servidor; o resultado
+        # enviado pelo cliente (se houver) é descartado
+        if data.get('action') in ROLL_ACTIONS and 'expression' in data:
+            try:
+                self.roll_dice(data)
+            except dice.DiceError as e:
+                await self.send(text_data=dumps({'action': 'roll_error', 'error': str(e)}))
+                return
+
+        # Só membros gravam no log; movimentos de alta frequência ficam de fora
+        if self.session_role and data.get('action') not in COALESCED_ACTIONS:
+            event_log.log(
+                self.session_id,
+                user.id if user and user.is_authenticated else None,
+                self.room_code,
+                data.get('action'),
+                data,
+            )
+
+        # O event_id permite que cada processo numere e serialize o evento
+        # uma única vez, repassando o texto pronto para todos os sockets
         await self.channel_layer.group_send(
             self.room_group_name,
             {
                 'type': 'broadcast_handler', # Chama a função abaixo
-                'payload': data
+                'event_id': uuid.uuid4().hex,
+                'payload': data,
+                'coalesce_key': coalesce_key(data, sender_name),
             }
         )
 
+    def roll_dice(self, data):
+        """Anexa ao payload o resultado verificado (ou vários, com "count")"""
+        data.pop('result', None)
+        data.pop('results', None)
+        count = data.get('count')
+        if count is None:
+            data['result'] = dice.roll(data['expression'])
+        else:
+            data['results'] = dice.roll_batch(data['expression'], count)
+
     # Função que efetivamente "empurra" a mensagem para os navegadores
     async def broadcast_handler(self, event):
-        # Pega o payload que veio do group_send e envia via socket
-        await self.send(text_data=json.dumps(event['payload']))
\ No newline at end of file
+        text = self.room.publish(event['event_id'], event['payload'])
+
+        key = event.get('coalesce_key')
+        if self.batch_mode and key:
+            self._pending[key] = text
+            if self._flush_task is None:
+                self._flush_task = asyncio.ensure_future(self._flush_later())
+            return
+
+        # Garante a ordem: o que estava acumulado sai antes da mensagem nova
+        if self._pending:
+            await self._flush()
+        await self.send(text_data=text)
+
+    async def _flush_later(self):
+        await asyncio.sleep(COALESCE_INTERVAL)
+        self._flush_task = None
+        await self._flush()
+
+    async def _flush(self):
+        pending, self._pending = self._pending, {}
+        if pending:
+            # Os textos já estão serializados: o frame é só a concatenação
+            await self.send(text_data='[' + ','.join(pending.values()) + ']')
+
+
+# Limite por conexão no MapConsumer: rajadas de até MOVE_BURST mensagens,
+# sustentado em MOVE_RATE por segundo
+MOVE_RATE = 30
+MOVE_BURST = 60
+MOVE_ACTIONS = {'m', 'move', 'move_token', 'token_move', 'token_drag'}
+
+
+def parse_move(data):
+    """
+    (token_id, x, y, rotation) de uma mensagem de movimento, compacta
+    (["m", id, x, y] ou ["m", id, x, y, rotação]) ou em objeto
+    ({"action": "move_token", "token_id", "x", "y", "rotation"}); None se não for movimento
+    """
+    if isinstance(data, list):
+        if len(data) not in (4, 5) or data[0] not in MOVE_ACTIONS:
+            return None
+        token_id, x, y = data[1:4]
+        rotation = data[4] if len(data) == 5 else None
+    elif isinstance(data, dict) and data.get('action') in MOVE_ACTIONS:
+        token_id, x, y, rotation = data.get('token_id'), data.get('x'), data.get('y'), data.get('rotation')
+    else:
+        return None
+
+    numbers = (x, y) if rotation is None else (x, y, rotation)
+    try:
+        token_id = str(uuid.UUID(token_id))
+    except (TypeError, ValueError, AttributeError):
+        raise MoveError('Token inválido.')
+    if not all(isinstance(n, (int, float)) and not isinstance(n, bool) for n in numbers):
+        raise MoveError('Movimento inválido.')
+    return token_id, float(x), float(y), None if rotation is None else float(rotation)
+
+
+class MapConsumer(AsyncWebsocketConsumer):
+    """
+    Movimento de tokens em tempo real: ws/map/<map_id>/.
+
+    Valida cada movimento (dono do token ou mestre, limites do mapa) no
+    estado em memória do mapa (maps/live.py), que transmite as posições
+    agrupadas e grava no banco em lote. Com névoa de guerra, cada jogador
+    recebe também os deltas da sua visão ({"action": "fog", ...}).
+    """
+
+    async def connect(self):
+        self.state = None
+        user = self.scope.get('user')
+        if not user or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+        try:
+            map_id = uuid.UUID(self.scope['url_route']['kwargs']['map_id'])
+        except ValueError:
+            await self.close(code=4404)
+            return
+
+        state = await get_map_state(map_id, self.channel_layer)
+        if state is None:
+            await self.close(code=4404)
+            return
+        role = await database_sync_to_async(SessionRoles(user).role)(state.session_id)
+        if role is None:
+            release_map_state(state)
+            await self.close(code=4403)
+            return
+
+        self.state = state
+        self.user_id = user.pk
+        self.is_master = user.pk == state.master_id
+        self.bucket = TokenBucket(MOVE_RATE, MOVE_BURST)
+        self._throttle_notified = 0.0
+
+        await self.channel_layer.group_add(state.group_name, self.channel_name)
+        await self.accept()
+        state.consumers.add(self)
+        await self.send_snapshot()
+
+    async def send_snapshot(self):
+        """Estado completo do mapa (tokens visíveis e névoa do usuário)"""
+        await self.send(text_data=dumps(self.state.snapshot(self.user_id)))
+
+    async def disconnect(self, close_code):
+        if self.state is not None:
+            self.state.consumers.discard(self)
+            release_map_state(self.state)
+            await self.channel_layer.group_discard(self.state.group_name, self.channel_name)
+            self.state = None
+
+    async def receive(self, text_data=None):
+        if not text_data or self.state is None:
+            return
+
+        if not self.bucket.consume():
+            # Mensagem descartada; avisa no máximo uma vez por segundo
+            now = time.monotonic()
+            if now - self._throttle_notified >= 1:
+                self._throttle_notified = now
+                await self.send(text_data=dumps({'action': 'rate_limited', 'retry_after': 1 / MOVE_RATE}))
+            return
+
+        try:
+            data = loads(text_data)
+        except ValueError:
+            return
+
+        move = None
+        try:
+            move = parse_move(data)
+            if move is None:
+                return
+            self.state.move(self.user_id, *move)
+        except MoveError as e:
+            token_id = move[0] if move else None
+            await self.send(text_data=dumps({'action': 'move_error', 'token_id': token_id, 'error': str(e)}))
+
+    async def map_moves(self, event):
+        if self.state is None:
+            return
+        frames, fog = self.state.publish(event['event_id'], event['moves'])
+        text = self.state.frame_for(frames, self.user_id)
+        if text is not None:
+            await self.send(text_data=text)
+        fog_text = None if self.is_master else fog.get(self.user_id)
+        if fog_text is not None:
+            await self.send(text_data=fog_text)
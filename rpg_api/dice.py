@@ -0,0 +1,208 @@
+"""
+Motor de dados do servidor.
+
+Interpreta expressões como ``8d6+4``, ``4d6kh3``, ``1d6!`` (explosivo),
+``adv``/``dis`` (2d20 ficando com o maior/menor) e ``d%``, e rola tudo no
+servidor para que o resultado enviado pelo DiceConsumer seja confiável.
+
+Os dados são gerados em lote: um único bloco de bytes aleatórios vira N
+resultados via ``bytes.translate`` (rejeição sem viés feita em C), o que
+permite rolar milhares de dados por chamada com ``roll_batch``. Os bytes vêm
+direto do gerador do sistema operacional (``secrets.token_bytes``): como os
+resultados são enviados para a sala, um PRNG comum poderia ter o estado
+reconstruído a partir das rolagens observadas e as próximas previstas.
+"""
+import re
+import secrets
+import threading
+
+MAX_DICE = 10000  # dados por termo, por rolagem
+MAX_SIDES = 1000
+MAX_TERMS = 20
+MAX_BATCH = 1000
+MAX_TOTAL_DICE = 200000  # dados por chamada de roll_batch
+MAX_EXPLOSIONS = 100  # rodadas de explosão por termo
+
+ALIASES = {
+    'adv': '2d20kh1',
+    'dis': '2d20kl1',
+}
+
+_TERM_RE = re.compile(
+    r'(?P<sign>[+-])?(?:'
+    r'(?P<count>\d*)d(?P<sides>\d+|%)(?P<explode>!)?(?:(?P<keep>kh|kl|k|dh|dl)(?P<keep_n>\d+))?'
+    r'|(?P<constant>\d+)'
+    r')'
+)
+
+
+class DiceError(ValueError):
+    """Expressão de dados inválida ou acima dos limites"""
+
+
+class _Generator:
+    """Gera dados em lote a partir de bytes do gerador do sistema (secrets)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables = {}
+
+    def _table(self, sides):
+        # Mapeia cada byte para 1..sides; bytes acima do maior múltiplo de
+        # `sides` viram 0 e são descartados (evita viés do módulo)
+        table = self._tables.get(sides)
+        if table is None:
+            limit = 256 - 256 % sides
+            table = bytes((b % sides) + 1 if b < limit else 0 for b in range(256))
+            self._tables[sides] = table
+        return table
+
+    def roll(self, sides, count):
+        """Retorna `count` resultados de um dado de `sides` faces"""
+        if count <= 0:
+            return []
+        if sides > 255:
+            return [secrets.randbelow(sides) + 1 for _ in range(count)]
+
+        with self._lock:
+            table = self._table(sides)
+        result = b''
+        while len(result) < count:
+            # Pede um pouco a mais para compensar os bytes rejeitados
+            missing = count - len(result)
+            chunk = secrets.token_bytes(missing + (missing >> 2) + 8)
+            result += chunk.translate(table).replace(b'\x00', b'')
+        return list(result[:count])
+
+
+_generator = _Generator()
+
+
+def parse(expression):
+    """Converte a expressão em uma lista de termos (dicts)"""
+    if not isinstance(expression, str):
+        raise DiceError('Expressão deve ser um texto')
+
+    text = expression.replace(' ', '').lower()
+    for alias, replacement in ALIASES.items():
+        text = text.replace(alias, replacement)
+    if not text:
+        raise DiceError('Expressão vazia')
+
+    terms = []
+    position = 0
+    while position < len(text):
+        match = _TERM_RE.match(text, position)
+        if not match or match.end() == position or (terms and not match.group('sign')):
+            raise DiceError(f'Expressão inválida: {expression}')
+        position = match.end()
+        terms.append(_build_term(match))
+        if len(terms) > MAX_TERMS:
+            raise DiceError(f'Máximo de {MAX_TERMS} termos por expressão')
+    return terms
+
+
+def _build_term(match):
+    sign = -1 if match.group('sign') == '-' else 1
+    if match.group('constant') is not None:
+        return {'sign': sign, 'constant': int(match.group('constant'))}
+
+    count = int(match.group('count') or 1)
+    sides = 100 if match.group('sides') == '%' else int(match.group('sides'))
+    if not 1 <= count <= MAX_DICE:
+        raise DiceError(f'Quantidade de dados deve estar entre 1 e {MAX_DICE}')
+    if not 2 <= sides <= MAX_SIDES:
+        raise DiceError(f'Número de faces deve estar entre 2 e {MAX_SIDES}')
+
+    keep = match.group('keep')
+    keep_n = int(match.group('keep_n')) if keep else None
+    if keep == 'k':
+        keep = 'kh'
+    if keep and keep_n > count:
+        raise DiceError('Não é possível manter/descartar mais dados do que os rolados')
+
+    return {
+        'sign': sign,
+        'count': count,
+        'sides': sides,
+        'explode': bool(match.group('explode')),
+        'keep': keep,
+        'keep_n': keep_n,
+        'notation': match.group(0).lstrip('+-'),
+    }
+
+
+def _explode(rolls, sides):
+    """Rola um dado extra para cada resultado máximo (em lotes)"""
+    pending = rolls.count(sides)
+    rounds = 0
+    while pending and rounds < MAX_EXPLOSIONS:
+        extra = _generator.roll(sides, pending)
+        rolls.extend(extra)
+        pending = extra.count(sides)
+        rounds += 1
+    return rolls
+
+
+def _kept(rolls, keep, keep_n):
+    if not keep:
+        return rolls
+    ordered = sorted(rolls, reverse=keep in ('kh', 'dh'))
+    if keep in ('kh', 'kl'):
+        return ordered[:keep_n]
+    return ordered[keep_n:]
+
+
+def _evaluate(terms, rolls_by_term, expression):
+    total = 0
+    detail = []
+    for term, rolls in zip(terms, rolls_by_term):
+        if 'constant' in term:
+            total += term['sign'] * term['constant']
+            detail.append({'constant': term['sign'] * term['constant']})
+            continue
+        if term['explode']:
+            rolls = _explode(rolls, term['sides'])
+        kept = _kept(rolls, term['keep'], term['keep_n'])
+        subtotal = term['sign'] * sum(kept)
+        total += subtotal
+        detail.append({
+            'dice': term['notation'],
+            'rolls': rolls,
+            'kept': kept,
+            'subtotal': subtotal,
+        })
+    return {'expression': expression, 'total': total, 'terms': detail}
+
+
+def roll(expression):
+    """Rola uma expressão e retorna o resultado detalhado"""
+    return roll_batch(expression, 1)[0]
+
+
+def roll_batch(expression, times):
+    """
+    Rola a mesma expressão `times` vezes (ex: ataque de uma horda de NPCs).
+    Cada termo gera os dados de todas as rolagens em uma única chamada.
+    """
+    if not isinstance(times, int) or not 1 <= times <= MAX_BATCH:
+        raise DiceError(f'Quantidade de rolagens deve estar entre 1 e {MAX_BATCH}')
+
+    terms = parse(expression)
+    total_dice = sum(term.get('count', 0) for term in terms) * times
+    if total_dice > MAX_TOTAL_DICE:
+        raise DiceError(f'Máximo de {MAX_TOTAL_DICE} dados por chamada')
+
+    generated = []
+    for term in terms:
+        if 'constant' in term:
+            generated.append([None] * times)
+            continue
+        count = term['count']
+        flat = _generator.roll(term['sides'], count * times)
+        generated.append([flat[i * count:(i + 1) * count] for i in range(times)])
+
+    return [
+        _evaluate(terms, [column[i] for column in generated], expression)
+        for i in range(times)
+    ]
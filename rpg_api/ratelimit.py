@@ -0,0 +1,28 @@
+"""
+Limite de taxa por conexão WebSocket (token bucket).
+
+Cada mensagem consome uma ficha; as fichas voltam a `rate` por segundo até
+o máximo de `burst`. Um cliente pode mandar rajadas curtas (arrastar um
+token) mas não sustentar mais que `rate` mensagens/s.
+"""
+import time
+
+
+class TokenBucket:
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.clock = clock
+        self.updated = clock()
+
+    def consume(self, amount=1):
+        """True se há fichas para a mensagem (e as consome)"""
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True
+        return False
@@ -0,0 +1,121 @@
+"""
+Estado em memória de cada sala do DiceConsumer.
+
+Cada sala guarda as últimas rolagens, a posição dos tokens e o mapa ativo,
+além de um log limitado de deltas numerados (seq). Quem conecta recebe um
+snapshot compacto; quem reconecta informando ?epoch=<epoch>&since=<seq>
+recebe só os deltas que perdeu, sem precisar recarregar a sessão via REST.
+
+O estado é por processo: o epoch muda quando a sala é recriada (ou quando o
+cliente cai em outro worker), e nesse caso o cliente recebe um snapshot novo.
+"""
+import time
+import uuid
+from collections import OrderedDict, deque
+
+from core.renderers import dumps
+
+MAX_RECENT_ROLLS = 50
+MAX_DELTAS = 500
+MAX_PUBLISHED_EVENTS = 200
+ROOM_IDLE_TTL = 300  # segundos que uma sala vazia fica em memória
+
+ROLL_ACTIONS = {'roll', 'dice_roll'}
+TOKEN_ACTIONS = {'move_token', 'token_move', 'token_drag'}
+MAP_ACTIONS = {'set_map', 'change_map'}
+
+
+class RoomState:
+    """Estado autoritativo (e limitado) de uma sala"""
+
+    def __init__(self, room_code):
+        self.room_code = room_code
+        self.epoch = uuid.uuid4().hex[:12]
+        self.seq = 0
+        self.recent_rolls = deque(maxlen=MAX_RECENT_ROLLS)
+        self.tokens = {}
+        self.active_map = None
+        self.deltas = deque(maxlen=MAX_DELTAS)
+        self.connections = 0
+        self.last_seen = time.monotonic()
+        # event_id -> texto já serializado; cada evento do grupo é numerado
+        # e serializado uma única vez por processo
+        self._published = OrderedDict()
+
+    def publish(self, event_id, data):
+        """Aplica o evento ao estado e retorna o texto (com seq) a ser enviado"""
+        text = self._published.get(event_id)
+        if text is not None:
+            return text
+
+        self.seq += 1
+        data['seq'] = self.seq
+        self._apply(data)
+
+        text = dumps(data)
+        self.deltas.append((self.seq, text))
+        self._published[event_id] = text
+        if len(self._published) > MAX_PUBLISHED_EVENTS:
+            self._published.popitem(last=False)
+        return text
+
+    def _apply(self, data):
+        action = data.get('action')
+        if action in ROLL_ACTIONS:
+            self.recent_rolls.append(data)
+        elif action in TOKEN_ACTIONS and data.get('token_id') is not None:
+            self.tokens[str(data['token_id'])] = data
+        elif action in MAP_ACTIONS:
+            self.active_map = data.get('map_id')
+
+    def snapshot(self):
+        return {
+            'action': 'snapshot',
+            'epoch': self.epoch,
+            'seq': self.seq,
+            'active_map': self.active_map,
+            'rolls': list(self.recent_rolls),
+            'tokens': list(self.tokens.values()),
+        }
+
+    def deltas_since(self, epoch, since):
+        """
+        Deltas com seq > since, ou None se não for possível retomar
+        (epoch diferente ou o log já descartou parte do intervalo)
+        """
+        if epoch != self.epoch or since is None or since > self.seq:
+            return None
+        if since == self.seq:
+            return []
+        if not self.deltas or self.deltas[0][0] > since + 1:
+            return None
+        return [text for seq, text in self.deltas if seq > since]
+
+
+_rooms = {}
+
+
+def get_room(room_code):
+    """Retorna (criando se preciso) o estado da sala e registra a conexão"""
+    _evict_idle_rooms()
+    room = _rooms.get(room_code)
+    if room is None:
+        room = _rooms[room_code] = RoomState(room_code)
+    room.connections += 1
+    room.last_seen = time.monotonic()
+    return room
+
+
+def release_room(room):
+    room.connections = max(room.connections - 1, 0)
+    room.last_seen = time.monotonic()
+
+
+def _evict_idle_rooms():
+    now = time.monotonic()
+    idle = [
+        code for code, room in _rooms.items()
+        if room.connections == 0 and now - room.last_seen > ROOM_IDLE_TTL
+    ]
+    for code in idle:
+        del _rooms[code]
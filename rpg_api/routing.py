@@ -2,6 +2,9 @@ from django.urls import re_path
 from . import consumers
 
 websocket_urlpatterns = [
-    # O código da sala vai na URL: ws/session/SALA123/
-    re_path(r'ws/session/(?P<room_code>\w+)/$', consumers.DiceConsumer.as_asgi()),
+    # O código da sala vai na URL: ws/session/SALA123/ (código de convite
+    # ou id da sessão, que liga a sala ao log de eventos)
+    re_path(r'ws/session/(?P<room_code>[\w-]+)/$', consumers.DiceConsumer.as_asgi()),
+    # Movimento de tokens de um mapa: ws/map/<id do mapa>/
+    re_path(r'ws/map/(?P<map_id>[0-9a-fA-F-]+)/$', consumers.MapConsumer.as_asgi()),
 ]
\ No newline at end of file
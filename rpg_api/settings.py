@@ -66,16 +66,59 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 ASGI_APPLICATION = 'rpg_api.asgi.application'
 
-# Para desenvolvimento, use o In-Memory Channel Layer
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer",
-    },
-}
+# Channel Layer
+# Com REDIS_URL definido os grupos dice_<sala> passam pelo Redis, permitindo
+# vários workers ASGI/hosts. Sem ele (desenvolvimento/testes) cai no
+# In-Memory Channel Layer, que só entrega para sockets do mesmo processo.
+if config_available:
+    REDIS_URL = config('REDIS_URL', default='')
+    CHANNEL_LAYER_BACKEND = config('CHANNEL_LAYER_BACKEND', default='')
+else:
+    REDIS_URL = os.environ.get('REDIS_URL', '')
+    CHANNEL_LAYER_BACKEND = os.environ.get('CHANNEL_LAYER_BACKEND', '')
+
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        "default": {
+            # Pode ser trocado por ex. channels_redis.pubsub.RedisPubSubChannelLayer
+            "BACKEND": CHANNEL_LAYER_BACKEND or "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {
+                "hosts": [REDIS_URL],
+                "capacity": 1500,
+                "expiry": 10,
+            },
+        },
+    }
+else:
+    # Sem serviço externo (dev e testes): só um processo. Para testar vários
+    # processos localmente, suba um redis-server e defina REDIS_URL
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": CHANNEL_LAYER_BACKEND or "channels.layers.InMemoryChannelLayer",
+        },
+    }
+
+# Cache
+# Com REDIS_URL o cache (templates dos sistemas de RPG, papéis nas sessões)
+# é compartilhado entre processos; sem ele cada processo tem o seu.
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+    }
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'core.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -166,11 +209,27 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # JSON via ujson (core/renderers.py), com o mesmo formato do DRF
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.UJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.renderers.UJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.OptionalCursorPagination',
     'PAGE_SIZE': 20,
 }
 
+# Listagens com serializers enxutos via .values() (core/lean.py)
+LEAN_LIST_SERIALIZERS = True
+
+# Respostas abaixo disso (bytes) saem sem compressão (core/compression.py)
+COMPRESSION_MIN_SIZE = 1024
+
 # DRF Spectacular (Swagger)
 SPECTACULAR_SETTINGS = {
     'TITLE': 'RPG Maker API',
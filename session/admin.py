@@ -5,7 +5,7 @@ from django.utils.html import format_html
 from django.utils import timezone
 from django.contrib.auth.models import User, Group
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import Session, SessionMember, SessionInvite, SessionCharacter, SessionNote
+from .models import Session, SessionMember, SessionInvite, SessionCharacter, SessionNote, SessionEvent
 from core.models import UserProfile
 
 
@@ -256,3 +256,20 @@ class SessionNoteAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('session', 'user')
+
+
+
+@admin.register(SessionEvent)
+class SessionEventAdmin(admin.ModelAdmin):
+    list_display = ['action', 'session', 'user', 'room_code', 'created_at']
+    list_filter = ['action', 'created_at']
+    search_fields = ['action', 'room_code', 'session__name', 'user__username']
+    readonly_fields = ['session', 'user', 'room_code', 'action', 'payload', 'created_at']
+    list_per_page = 50
+
+    def has_add_permission(self, request):
+        # Log append-only: eventos só são criados pelo WebSocket
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('session', 'user')
@@ -4,4 +4,8 @@ from django.apps import AppConfig
 class SessionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'session'
-    verbose_name = 'Sessões de RPG'
\ No newline at end of file
+    verbose_name = 'Sessões de RPG'
+
+    def ready(self):
+        # Registra os signals que invalidam o cache de papéis
+        from . import roles  # noqa: F401
\ No newline at end of file
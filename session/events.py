@@ -0,0 +1,70 @@
+"""
+Gravação em lote do log de eventos da sessão.
+
+O consumer só enfileira o evento (operação síncrona e barata); um task em
+segundo plano grava tudo com bulk_create quando o buffer chega a
+MAX_BATCH eventos ou a cada FLUSH_INTERVAL segundos, o que vier primeiro.
+"""
+import asyncio
+import logging
+
+from channels.db import database_sync_to_async
+
+from .models import SessionEvent
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH = 200
+MAX_BUFFER = 10000  # acima disso os eventos mais antigos são descartados
+FLUSH_INTERVAL = 1.0
+
+
+class EventLogWriter:
+
+    def __init__(self, max_batch=MAX_BATCH, flush_interval=FLUSH_INTERVAL, max_buffer=MAX_BUFFER):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer = []
+        self._timer = None
+        self._flushing = None
+
+    def log(self, session_id, user_id, room_code, action, payload):
+        """Enfileira um evento; nunca bloqueia o loop do consumer"""
+        self._buffer.append(SessionEvent(
+            session_id=session_id,
+            user_id=user_id,
+            room_code=room_code,
+            action=(action or '')[:50],
+            payload=payload,
+        ))
+        if len(self._buffer) > self.max_buffer:
+            dropped = len(self._buffer) - self.max_buffer
+            del self._buffer[:dropped]
+            logger.warning(f'Log de eventos cheio: {dropped} evento(s) descartado(s)')
+
+        if len(self._buffer) >= self.max_batch:
+            self._schedule_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.flush_interval, self._schedule_flush
+            )
+
+    def _schedule_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flushing is None or self._flushing.done():
+            self._flushing = asyncio.ensure_future(self.flush())
+
+    async def flush(self):
+        while self._buffer:
+            batch = self._buffer[:self.max_batch]
+            del self._buffer[:self.max_batch]
+            try:
+                await database_sync_to_async(SessionEvent.objects.bulk_create)(batch)
+            except Exception as e:
+                logger.error(f'Erro ao gravar {len(batch)} evento(s) da sessão: {str(e)}')
+
+
+event_log = EventLogWriter()
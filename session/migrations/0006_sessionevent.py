@@ -0,0 +1,38 @@
+# Generated by Django 4.2 on 2026-10-18 07:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('session', '0005_session_banner'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('room_code', models.CharField(max_length=100)),
+                ('action', models.CharField(blank=True, max_length=50)),
+                ('payload', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='session.session')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='session_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Evento da Sessão',
+                'verbose_name_plural': 'Eventos das Sessões',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='sessionevent',
+            index=models.Index(fields=['session', 'created_at'], name='session_ses_session_110e7e_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-18 07:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('session', '0006_sessionevent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['master', 'created_at'], name='session_ses_master__b365cb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sessionnote',
+            index=models.Index(fields=['session', 'created_at'], name='session_ses_session_acfe85_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sessionnote',
+            index=models.Index(fields=['user', 'created_at'], name='session_ses_user_id_e7b017_idx'),
+        ),
+    ]
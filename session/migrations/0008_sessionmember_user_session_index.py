@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-18 07:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('session', '0007_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sessionmember',
+            index=models.Index(fields=['user', 'session'], name='session_ses_user_id_be51c9_idx'),
+        ),
+    ]
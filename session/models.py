@@ -2,10 +2,38 @@ import uuid
 import string
 import secrets
 from django.db import models
+from django.db.models import Exists, OuterRef
+from django.db.models.signals import post_delete, post_save
 from django.conf import settings
+from django.utils import timezone
 from django.utils.text import slugify
 
 
+def member_exists(user, session_ref="pk"):
+    """
+    Subquery EXISTS que verifica se `user` é membro da sessão referenciada
+    por `session_ref` na query externa. Substitui o JOIN em
+    members__user + distinct(), que obriga o banco a deduplicar linhas.
+    """
+    return Exists(
+        SessionMember.objects.filter(session_id=OuterRef(session_ref), user=user)
+    )
+
+
+class SessionScopedQuerySet(models.QuerySet):
+    """QuerySet para modelos ligados a uma sessão pela FK `session`"""
+
+    session_ref = "session_id"
+
+    def accessible_to(self, user):
+        """Registros das sessões em que o usuário é membro"""
+        return self.filter(member_exists(user, self.session_ref))
+
+
+class SessionQuerySet(SessionScopedQuerySet):
+    session_ref = "pk"
+
+
 class Session(models.Model):
     STATUS_CHOICES = [
         ("ACTIVE", "Active"),
@@ -35,10 +63,15 @@ class Session(models.Model):
 
     banner = models.URLField(blank=True, null=True)  # depois você troca por storage/file
 
+    objects = SessionQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Sessão"
         verbose_name_plural = "Sessões"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=["master", "created_at"]),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.master.username} ({self.get_status_display()})"
@@ -66,6 +99,11 @@ class SessionMember(models.Model):
 
     class Meta:
         unique_together = ("session", "user")
+        # (session, user) atende o EXISTS; (user, session) atende a lista de
+        # sessões de um usuário
+        indexes = [
+            models.Index(fields=["user", "session"]),
+        ]
         verbose_name = "Membro da Sessão"
         verbose_name_plural = "Membros das Sessões"
         ordering = ['-joined_at']
@@ -91,10 +129,16 @@ class SessionNote(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = SessionScopedQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Anotação"
         verbose_name_plural = "Anotações"
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["session", "created_at"]),
+            models.Index(fields=["user", "created_at"]),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.session.name}) - {self.user.username}"
@@ -179,4 +223,67 @@ class SessionCharacter(models.Model):
     joined_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        unique_together = ("session", "user")
\ No newline at end of file
+        unique_together = ("session", "user")
+
+
+class SessionEvent(models.Model):
+    """Log append-only dos eventos enviados pelo WebSocket da sessão"""
+
+    session = models.ForeignKey(
+        Session,
+        on_delete=models.CASCADE,
+        related_name="events"
+    )
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="session_events"
+    )
+
+    room_code = models.CharField(max_length=100)
+    action = models.CharField(max_length=50, blank=True)
+    payload = models.JSONField(default=dict)
+
+    # Horário do evento (não do flush em lote), por isso não usa auto_now_add
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = SessionScopedQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Evento da Sessão"
+        verbose_name_plural = "Eventos das Sessões"
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["session", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.action or 'evento'} - {self.session_id} ({self.created_at})"
+
+
+# Partes do detalhe da sessão: mudanças nelas atualizam Session.updated_at,
+# usado nos validadores (ETag/Last-Modified) das leituras da sessão
+SESSION_PARTS = (
+    "session.SessionMember",
+    "session.SessionInvite",
+    "session.SessionCharacter",
+    "maps.SessionMap",
+    "items.Item",
+)
+
+
+def touch_session(session_id):
+    """Marca a sessão como alterada sem passar pelo save()"""
+    Session.objects.filter(pk=session_id).update(updated_at=timezone.now())
+
+
+def _touch_session(sender, instance, **kwargs):
+    touch_session(instance.session_id)
+
+
+for _part in SESSION_PARTS:
+    post_save.connect(_touch_session, sender=_part, dispatch_uid=f"touch_session:{_part}")
+    post_delete.connect(_touch_session, sender=_part, dispatch_uid=f"touch_session_delete:{_part}")
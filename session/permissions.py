@@ -1,13 +1,15 @@
 from rest_framework import permissions
 
+from .roles import get_session_roles
+
 
 class IsSessionMaster(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
-        return obj.master == request.user
+        return obj.master_id == request.user.id
 
 
 class IsSessionMember(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
-        return obj.members.filter(user=request.user).exists()
\ No newline at end of file
+        return get_session_roles(request).is_member(obj.pk)
\ No newline at end of file
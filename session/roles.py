@@ -0,0 +1,74 @@
+"""
+Resolução de papéis do usuário nas sessões.
+
+SessionRoles carrega o mapa session_id -> role do usuário em uma única
+query e responde todas as checagens de membro/mestre da requisição (ou da
+conexão WebSocket) em memória. Cada save/delete de SessionMember incrementa
+uma geração no cache; o resolver recarrega o mapa quando ela muda.
+"""
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import SessionMember
+
+
+def _generation_key(user_id):
+    return f'session_roles:{user_id}'
+
+
+def invalidate_session_roles(user_id):
+    key = _generation_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+class SessionRoles:
+    """Papéis (MASTER/PLAYER) do usuário em cada sessão"""
+
+    def __init__(self, user):
+        self.user = user
+        self._roles = None
+        self._generation = None
+
+    def _load(self):
+        if not self.user.is_authenticated:
+            return {}
+        generation = cache.get(_generation_key(self.user.pk), 0)
+        if self._roles is None or generation != self._generation:
+            self._roles = {
+                str(session_id): role
+                for session_id, role in SessionMember.objects.filter(
+                    user=self.user
+                ).values_list('session_id', 'role')
+            }
+            self._generation = generation
+        return self._roles
+
+    def role(self, session_id):
+        if session_id is None:
+            return None
+        return self._load().get(str(session_id))
+
+    def is_member(self, session_id):
+        return self.role(session_id) is not None
+
+    def session_ids(self):
+        return set(self._load())
+
+
+def get_session_roles(request):
+    """Resolver memoizado na requisição (DRF Request ou HttpRequest)"""
+    roles = getattr(request, '_session_roles', None)
+    if roles is None or roles.user != request.user:
+        roles = SessionRoles(request.user)
+        request._session_roles = roles
+    return roles
+
+
+@receiver(post_save, sender=SessionMember)
+@receiver(post_delete, sender=SessionMember)
+def session_member_changed(sender, instance, **kwargs):
+    invalidate_session_roles(instance.user_id)
@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from .models import Session, SessionMember, SessionInvite, SessionCharacter, SessionNote
+from core.lean import LeanSerializer, datetime_repr, uuid_repr
+from core.sparse import SparseFieldsMixin
+from .models import Session, SessionMember, SessionInvite, SessionCharacter, SessionNote, SessionEvent
 
 
 from rest_framework import serializers
@@ -9,13 +11,13 @@ from django.contrib.auth import get_user_model
 User = get_user_model()
 
 
-class UserBasicSerializer(serializers.ModelSerializer):
+class UserBasicSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
 
 
-class SessionMemberDetailSerializer(serializers.ModelSerializer):
+class SessionMemberDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = UserBasicSerializer(read_only=True)
     
     class Meta:
@@ -23,13 +25,14 @@ class SessionMemberDetailSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'role', 'joined_at']
 
 
-class SessionCharacterDetailSerializer(serializers.ModelSerializer):
+class SessionCharacterDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     character = serializers.SerializerMethodField()
     user = UserBasicSerializer(read_only=True)
     
     class Meta:
         model = SessionCharacter
         fields = ['id', 'user', 'character', 'joined_at']
+        field_sources = {'character': ('character',)}
     
     def get_character(self, obj):
         """Lazy import para evitar circular dependency"""
@@ -37,7 +40,7 @@ class SessionCharacterDetailSerializer(serializers.ModelSerializer):
         return CharacterSerializer(obj.character, context=self.context).data
 
 
-class SessionInviteDetailSerializer(serializers.ModelSerializer):
+class SessionInviteDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     is_valid = serializers.ReadOnlyField()
     invite_link = serializers.SerializerMethodField()
     
@@ -46,6 +49,10 @@ class SessionInviteDetailSerializer(serializers.ModelSerializer):
         fields = ['id', 'code', 'max_uses', 'uses_count', 'expires_at', 
                  'created_at', 'is_valid', 'invite_link']
         read_only_fields = ['id', 'code', 'uses_count', 'created_at', 'is_valid']
+        field_sources = {
+            'is_valid': ('expires_at', 'max_uses', 'uses_count'),
+            'invite_link': ('code',),
+        }
     
     def get_invite_link(self, obj):
         # Você pode ajustar este link conforme sua estrutura de frontend
@@ -56,7 +63,7 @@ class SessionInviteDetailSerializer(serializers.ModelSerializer):
         return f"/join/{obj.code}"
 
 
-class SessionDetailSerializer(serializers.ModelSerializer):
+class SessionDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     master = UserBasicSerializer(read_only=True)
     members = SessionMemberDetailSerializer(many=True, read_only=True)
     session_characters = SessionCharacterDetailSerializer(many=True, read_only=True)
@@ -73,6 +80,14 @@ class SessionDetailSerializer(serializers.ModelSerializer):
         fields = ['id', 'master', 'name', 'description', 'banner', 'status', 
              'created_at', 'updated_at', 'members', 'session_characters', 
              'invites', 'maps', 'items', 'total_members', 'total_characters', 'total_maps', 'total_items']
+        field_sources = {
+            'maps': ('maps',),
+            'items': ('items',),
+            'total_members': ('members',),
+            'total_characters': ('session_characters',),
+            'total_maps': ('maps',),
+            'total_items': ('items',),
+        }
     
     def get_maps(self, obj):
         """Retorna mapas da sessão - import lazy para evitar circular"""
@@ -86,13 +101,14 @@ class SessionDetailSerializer(serializers.ModelSerializer):
             return []
     
     def get_total_members(self, obj):
-        return obj.members.count()
+        # len() reaproveita o prefetch em vez de disparar um COUNT(*)
+        return len(obj.members.all())
     
     def get_total_characters(self, obj):
-        return obj.session_characters.count()
+        return len(obj.session_characters.all())
     
     def get_total_maps(self, obj):
-        return obj.maps.count()
+        return len(obj.maps.all())
     
     def get_items(self, obj):
         try:
@@ -103,15 +119,17 @@ class SessionDetailSerializer(serializers.ModelSerializer):
             return []
 
     def get_total_items(self, obj):
-        return obj.items.count()
+        return len(obj.items.all())
 
 
-class SessionSerializer(serializers.ModelSerializer):
+class SessionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     invites = SessionInviteDetailSerializer(many=True, read_only=True)
     class Meta:
         model = Session
         fields = ["id", "master", "name", "description", "banner", "status", "created_at", "updated_at", "invites"]
         read_only_fields = ("id", "master", "created_at", "updated_at")
+        # ?expand=master traz o mestre no lugar do id
+        expandable_fields = {"master": (UserBasicSerializer, {})}
 
 
 class SessionMemberSerializer(serializers.ModelSerializer):
@@ -134,7 +152,7 @@ class SessionCharacterSerializer(serializers.ModelSerializer):
 
 
 # Serializer para SessionNote
-class NoteSerializer(serializers.ModelSerializer):
+class NoteSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = UserBasicSerializer(read_only=True)
     # user = serializers.IntegerField(write_only=True)  # O usuário será definido no viewset
 
@@ -145,4 +163,55 @@ class NoteSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'session', 'user', 'title', 'content', 'created_at', 'updated_at'
         ]
-        read_only_fields = ('id', 'user', 'created_at', 'updated_at')
\ No newline at end of file
+        read_only_fields = ('id', 'user', 'created_at', 'updated_at')
+
+
+class NoteLeanSerializer(LeanSerializer):
+    """Listagem de anotações: mesma saída do NoteSerializer, via .values()"""
+
+    values = (
+        'id', 'session_id', 'user_id', 'user__username', 'user__email', 'user__first_name',
+        'user__last_name', 'title', 'content', 'created_at', 'updated_at',
+    )
+
+    def to_representation(self, row):
+        return {
+            'id': uuid_repr(row['id']),
+            'session': row['session_id'],
+            'user': {
+                'id': row['user_id'],
+                'username': row['user__username'],
+                'email': row['user__email'],
+                'first_name': row['user__first_name'],
+                'last_name': row['user__last_name'],
+            },
+            'title': row['title'],
+            'content': row['content'],
+            'created_at': datetime_repr(row['created_at']),
+            'updated_at': datetime_repr(row['updated_at']),
+        }
+
+
+class SessionEventSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = SessionEvent
+        fields = ['id', 'session', 'user', 'room_code', 'action', 'payload', 'created_at']
+        read_only_fields = fields
+        expandable_fields = {'user': (UserBasicSerializer, {})}
+
+
+class SessionEventLeanSerializer(LeanSerializer):
+    """Eventos para exportação: mesma saída do SessionEventSerializer, via .values()"""
+
+    values = ('id', 'session_id', 'user_id', 'room_code', 'action', 'payload', 'created_at')
+
+    def to_representation(self, row):
+        return {
+            'id': row['id'],
+            'session': row['session_id'],
+            'user': row['user_id'],
+            'room_code': row['room_code'],
+            'action': row['action'],
+            'payload': row['payload'],
+            'created_at': datetime_repr(row['created_at']),
+        }
@@ -1,6 +1,7 @@
+import uuid
 import random
 import string
-from .models import SessionMember
+from .models import Session, SessionMember, SessionInvite
 
 
 def generate_invite_code():
@@ -12,4 +13,47 @@ def add_user_to_session(session, user, role="PLAYER"):
         session=session,
         user=user,
         defaults={"role": role}
-    )
\ No newline at end of file
+    )
+
+def get_session_for_room(room_code):
+    """
+    Resolve a sessão de uma sala do WebSocket: o código da sala pode ser o
+    id da sessão (com ou sem hífens) ou o código de um convite
+    """
+    try:
+        session_id = uuid.UUID(room_code)
+    except ValueError:
+        invite = SessionInvite.objects.filter(code=room_code).select_related("session").first()
+        return invite.session if invite else None
+    return Session.objects.filter(pk=session_id).first()
+
+
+def session_export(session, context=None):
+    """
+    Documento de exportação da sessão. Personagens, itens, mapas e eventos
+    são RowStream: lidos do banco em blocos enquanto a resposta é enviada.
+    """
+    from characters.models import Character
+    from characters.serializers import CharacterLeanSerializer
+    from core.streaming import RowStream
+    from items.serializers import ItemLeanSerializer
+    from maps.serializers import SessionMapLeanSerializer
+    from .models import SessionEvent
+    from .serializers import SessionEventLeanSerializer, SessionMemberDetailSerializer, SessionSerializer
+
+    def rows(serializer_class, queryset):
+        serializer = serializer_class(None, context=context)
+        return RowStream(serializer_class.get_rows(queryset), serializer.to_representation)
+
+    members = session.members.select_related('user').order_by('joined_at')
+    return {
+        'session': SessionSerializer(session, exclude={'invites': {}}, context=context).data,
+        'members': SessionMemberDetailSerializer(members, many=True, context=context).data,
+        'characters': rows(
+            CharacterLeanSerializer,
+            Character.objects.filter(sessioncharacter__session=session).order_by('created_at'),
+        ),
+        'items': rows(ItemLeanSerializer, session.items.order_by('name')),
+        'maps': rows(SessionMapLeanSerializer, session.maps.order_by('created_at')),
+        'events': rows(SessionEventLeanSerializer, SessionEvent.objects.filter(session=session).order_by('created_at')),
+    }
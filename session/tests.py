@@ -0,0 +1,88 @@
+import json
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import AsyncClient, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from characters.cache import invalidate_systems
+from characters.models import Character
+from items.models import Item
+from maps.models import SessionMap
+from .models import Session, SessionCharacter, SessionInvite, SessionMember
+
+
+class SessionRetrieveQueriesTest(TestCase):
+    """O detalhe da sessão não pode voltar a fazer consultas por membro/mapa/item (N+1)"""
+
+    def setUp(self):
+        cache.clear()
+        invalidate_systems()
+        self.master = User.objects.create_user('mestre')
+        self.client = APIClient()
+        self.client.force_authenticate(self.master)
+        self.players = 0
+
+    def create_session(self, size):
+        session = Session.objects.create(master=self.master, name=f'Mesa {size}')
+        SessionMember.objects.create(session=session, user=self.master, role='MASTER')
+        for _ in range(size):
+            self.players += 1
+            user = User.objects.create_user(f'jogador{self.players}')
+            SessionMember.objects.create(session=session, user=user, role='PLAYER')
+            character = Character.objects.create(user=user, player_name=user.username)
+            SessionCharacter.objects.create(session=session, user=user, character=character)
+            SessionMap.objects.create(session=session, name='Mapa')
+            Item.objects.create(
+                session=session, name='Poção', category='consumível',
+                durability_current=1, durability_max=1, rarity='comum',
+            )
+            SessionInvite.objects.create(session=session)
+        return session
+
+    def count_retrieve_queries(self, session):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/v1/session/sessions/{session.pk}/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()
+
+    def test_query_count_does_not_grow_with_session_size(self):
+        small, small_data = self.count_retrieve_queries(self.create_session(1))
+        large, large_data = self.count_retrieve_queries(self.create_session(25))
+
+        self.assertEqual(small_data['total_members'], 2)
+        self.assertEqual(large_data['total_members'], 26)
+        self.assertEqual(small, large)
+        self.assertEqual(large, 7)
+
+
+class SessionExportStreamingTest(TestCase):
+    """A exportação sai por streaming também no ASGI (iterador assíncrono)"""
+
+    def setUp(self):
+        self.master = User.objects.create_user('mestre')
+        self.session = Session.objects.create(master=self.master, name='Mesa')
+        SessionMember.objects.create(session=self.session, user=self.master, role='MASTER')
+        self.url = f'/api/v1/session/sessions/{self.session.pk}/export/'
+        self.authorization = f'Bearer {AccessToken.for_user(self.master)}'
+
+    def test_wsgi_and_asgi_stream_the_same_json(self):
+        client = APIClient()
+        client.force_authenticate(self.master)
+        response = client.get(self.url)
+        self.assertFalse(response.is_async)
+        expected = b''.join(response.streaming_content)
+
+        async def export():
+            response = await AsyncClient().get(self.url, headers={'Authorization': self.authorization})
+            return response, b''.join([part async for part in response.streaming_content])
+
+        response, content = async_to_sync(export)()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        self.assertEqual(content, expected)
+        self.assertEqual(json.loads(content)['session']['name'], 'Mesa')
@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import SessionViewSet, JoinSessionByCodeView, SelectCharacterView, NoteViewSet, PlayerSessionsListView, MasterSessionsListView
+from .views import SessionViewSet, JoinSessionByCodeView, SelectCharacterView, NoteViewSet, PlayerSessionsListView, MasterSessionsListView, SessionEventViewSet
 
 
 router = DefaultRouter()
 router.register(r"sessions", SessionViewSet, basename="sessions")
 router.register(r"notes", NoteViewSet, basename="notes")
+router.register(r"events", SessionEventViewSet, basename="events")
 
 urlpatterns = [
     path("", include(router.urls)),
@@ -1,44 +1,55 @@
+import uuid
+from rest_framework import viewsets, permissions, filters, generics
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
+from django.db.models import Max, Prefetch
+
+from core.conditional import ConditionalGetMixin
+from core.lean import LeanListMixin
+from core.pagination import CreatedAtCursorPagination
+from core.sparse import SparseFieldsViewMixin
+from core.streaming import StreamingJSONResponse
+from .models import Session, SessionMember, SessionInvite, SessionCharacter, SessionNote, SessionEvent
+from .serializers import SessionSerializer, SessionDetailSerializer, NoteSerializer, NoteLeanSerializer, SessionEventSerializer
+
 
-class PlayerSessionsListView(APIView):
+class PlayerSessionsListView(ConditionalGetMixin, SparseFieldsViewMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated]
+    serializer_class = SessionSerializer
+    pagination_class = None
 
-    def get(self, request):
+    def get_queryset(self):
         # Sessões em que o usuário é membro, mas não é o mestre
-        sessions = Session.objects.filter(members__user=request.user).exclude(master=request.user).distinct()
-        serializer = SessionSerializer(sessions, many=True, context={"request": request})
-        return Response(serializer.data)
+        return Session.objects.accessible_to(self.request.user).exclude(
+            master=self.request.user
+        ).prefetch_related('invites')
 
 
-class MasterSessionsListView(APIView):
+class MasterSessionsListView(ConditionalGetMixin, SparseFieldsViewMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated]
+    serializer_class = SessionSerializer
+    pagination_class = None
 
-    def get(self, request):
+    def get_queryset(self):
         # Sessões em que o usuário é o mestre
-        sessions = Session.objects.filter(master=request.user)
-        serializer = SessionSerializer(sessions, many=True, context={"request": request})
-        return Response(serializer.data)
-from rest_framework import viewsets, permissions, filters
-from rest_framework.decorators import action
-from rest_framework.response import Response
-from rest_framework.views import APIView
+        return Session.objects.filter(master=self.request.user).prefetch_related('invites')
 
-from .models import Session, SessionInvite, SessionCharacter, SessionNote
-from .serializers import SessionSerializer, SessionDetailSerializer, NoteSerializer
 
-class NoteViewSet(viewsets.ModelViewSet):
+class NoteViewSet(ConditionalGetMixin, SparseFieldsViewMixin, LeanListMixin, viewsets.ModelViewSet):
     serializer_class = NoteSerializer
+    lean_serializer_class = NoteLeanSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.OrderingFilter, filters.SearchFilter]
     ordering = ['-created_at']
     search_fields = ['title', 'content']
 
     def get_queryset(self):
-        return SessionNote.objects.filter(
-            session__members__user=self.request.user,
+        return SessionNote.objects.accessible_to(self.request.user).filter(
             user=self.request.user
-        ).distinct()
+        ).select_related('user')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -49,35 +60,73 @@ class NoteViewSet(viewsets.ModelViewSet):
         return Response({"message": "Apagado com sucesso"}, status=200)
 
 
-from .services import add_user_to_session
+class SessionEventViewSet(ConditionalGetMixin, SparseFieldsViewMixin, viewsets.ReadOnlyModelViewSet):
+    """Log de eventos (rolagens, ações) das sessões do usuário"""
+    serializer_class = SessionEventSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+    # Eventos não são editados
+    last_modified_field = 'created_at'
 
+    def get_queryset(self):
+        queryset = SessionEvent.objects.accessible_to(self.request.user)
 
-class SessionViewSet(viewsets.ModelViewSet):
+        session_id = self.request.query_params.get('session')
+        if session_id:
+            try:
+                session_id = uuid.UUID(session_id)
+            except ValueError:
+                raise ValidationError({'session': "Id de sessão inválido."})
+            queryset = queryset.filter(session_id=session_id)
+
+        action = self.request.query_params.get('action')
+        if action:
+            queryset = queryset.filter(action=action)
+
+        return queryset
+
+
+from .services import add_user_to_session, session_export
+from .roles import get_session_roles
+
+
+class SessionViewSet(ConditionalGetMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
     serializer_class = SessionSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Session.objects.filter(
-            members__user=self.request.user
-        ).distinct()
+        queryset = Session.objects.accessible_to(self.request.user)
+
+        if self.action == 'retrieve':
+            # Carrega tudo que o SessionDetailSerializer usa em um número fixo
+            # de queries, independente do tamanho da mesa
+            queryset = queryset.select_related('master').prefetch_related(
+                Prefetch('members', queryset=SessionMember.objects.select_related('user')),
+                Prefetch(
+                    'session_characters',
+                    queryset=SessionCharacter.objects.select_related(
+                        'user', 'character__user', 'character__rpg_system'
+                    )
+                ),
+                'invites',
+                'maps',
+                'items',
+            )
+        elif self.action == 'list':
+            queryset = queryset.prefetch_related('invites')
+        return queryset
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return SessionDetailSerializer
         return SessionSerializer
 
-    def get_object(self):
-        obj = super().get_object()
+    def get_validator_aggregates(self):
+        # Membros, convites, mapas e itens atualizam Session.updated_at (ver
+        # SESSION_PARTS); as fichas dos personagens entram por aqui
         if self.action == 'retrieve':
-            obj = Session.objects.prefetch_related(
-                'members__user',
-                'session_characters__character',
-                'session_characters__user',
-                'invites',
-                    'maps',
-                    'items'
-            ).get(pk=obj.pk)
-        return obj
+            return {'characters_updated_at': Max('session_characters__character__updated_at')}
+        return {}
 
     def perform_create(self, serializer):
         session = serializer.save(master=self.request.user)
@@ -88,12 +137,22 @@ class SessionViewSet(viewsets.ModelViewSet):
         self.perform_destroy(instance)
         return Response({"message": "Apagado com sucesso"}, status=200)
 
+    @action(detail=True, methods=["get"])
+    def export(self, request, pk=None):
+        """Sessão completa (membros, personagens, itens, mapas e eventos) em JSON"""
+        session = self.get_object()
+        return StreamingJSONResponse(
+            session_export(session, context=self.get_serializer_context()),
+            filename=f"sessao-{session.pk}.json",
+            request=request,
+        )
+
     @action(detail=True, methods=["post"])
     def create_invite(self, request, pk=None):
         try:
             session = self.get_object()
 
-            if session.master != request.user:
+            if session.master_id != request.user.id:
                 return Response({"error": "Apenas o mestre pode criar convites"}, status=403)
 
             max_uses = request.data.get("max_uses")
@@ -169,7 +228,7 @@ class SelectCharacterView(APIView):
         except Session.DoesNotExist:
             return Response({"error": "Sessão não encontrada"}, status=404)
 
-        if not session.members.filter(user=request.user).exists():
+        if not get_session_roles(request).is_member(session.pk):
             return Response({"error": "Você não é membro desta sessão"}, status=403)
 
         try: